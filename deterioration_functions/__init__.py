@@ -15,7 +15,20 @@
 # Author: Maria Maistro (mm@di.ku.dk)
 
 # Functions to deteriorate runs
-from deterioration_functions.deteriorate_run import deteriorate_run
+from deterioration_functions.trec_reader import DocVocabulary, TrecRun, read_run, read_qrels
+from deterioration_functions.run_archive import pack_runs, RunArchive
+from deterioration_functions.prepared_run import PreparedRun
+from deterioration_functions.deteriorated_run import DeterioratedRun
+from deterioration_functions.deteriorate_run import deteriorate_run, cell_rng
+from deterioration_functions.deteriorate_run_batch import deteriorate_run_batch, batch_run
+from deterioration_functions.ratio_sweep import RatioSweep
+from deterioration_functions.incremental_evaluator import IncrementalEvaluator
+from deterioration_functions.measures import MeasureEvaluator
+from deterioration_functions.sweep import SweepStore, RESULT_KINDS, STANDARD_ERROR_KINDS, RepeatedCell, placement_run_name, run_sweep
+from deterioration_functions.sweep_plan import plan_cells
+from deterioration_functions.adaptive_grid import refine_grid, interpolate_grid
+from deterioration_functions.quadrant_matrix import build_quadrant_matrix
+from deterioration_functions.heatmap import build_heatmaps, render_heatmaps
 from deterioration_functions.colormap_ktu import colormap_ktu
 from deterioration_functions.colormap_rbo import colormap_rbo
 from deterioration_functions.colormap_rmse import colormap_rmse
@@ -0,0 +1,191 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import numpy
+
+from deterioration_functions.deteriorate_run import MODES
+
+
+def _initial_points(num_values, initial_step):
+    # Indexes of the coarse grid, the last value of the sweep is always included
+    return sorted(set(range(0, num_values, initial_step)) | {num_values - 1})
+
+
+def _initial_blocks(num_values, initial_step):
+    # Blocks (i0, i1, j0, j1) of the coarse grid, i are swaps indexes and j replacements indexes
+    points = _initial_points(num_values, initial_step)
+    intervals = list(zip(points[:-1], points[1:])) or [(0, 0)]
+    return [(i0, i1, j0, j1) for i0, i1 in intervals for j0, j1 in intervals]
+
+
+def _split(block):
+    # Indexes of the grid of a block split in four (or two, if a side cannot be split)
+    i0, i1, j0, j1 = block
+    split_i = (i0, (i0 + i1) // 2, i1) if i1 - i0 > 1 else (i0, i1)
+    split_j = (j0, (j0 + j1) // 2, j1) if j1 - j0 > 1 else (j0, j1)
+    sub_blocks = [(a0, a1, b0, b1) for a0, a1 in zip(split_i[:-1], split_i[1:]) for b0, b1 in zip(split_j[:-1], split_j[1:])]
+    points = [(i, j) for i in split_i for j in split_j]
+    return sub_blocks, points
+
+
+def default_summary(results):
+    """Values compared between neighbouring cells: mean KTU, mean RBO and RMSE of each measure.
+
+    Args:
+        results: dictionary, key one of RESULT_KINDS and value the result of a cell
+
+    Returns:
+        summary: numpy array
+    """
+    return numpy.array([numpy.nanmean(list(results['ktu']['baseline'].values())),
+                        numpy.nanmean(list(results['rbo']['baseline'].values()))]
+                       + [results['rmse']['baseline'][measure] for measure in sorted(results['rmse']['baseline'])])
+
+
+def refine_grid(swaps_replacement_values, compute_cells, tolerance, summarize = default_summary, initial_step = 16, modes = MODES):
+    """Adaptive sweep over numbers of swaps and replacements.
+
+    The sweep starts from a coarse grid, with a step of initial_step values, and splits a
+    block of the grid in four only when the summaries of its corner cells differ by more than
+    tolerance, until blocks cannot be split any further. Smooth regions are therefore computed
+    with a few cells, which can be interpolated with interpolate_grid.
+
+    Args:
+        swaps_replacement_values: values of swaps and replacements of the full grid
+        compute_cells: function taking a list of cells (number_swaps, number_replacements, mode)
+            and returning a dictionary, key cell and value the results of the cell
+            (a dictionary, key result kind and value the result of the cell)
+        tolerance: blocks whose corners differ by more than tolerance in any value of the summary are split
+        summarize: function taking the results of a cell and returning the array of values to compare
+        initial_step: step, in number of values, of the coarse grid
+        modes: modes of the sweep
+
+    Returns:
+        results: dictionary, key cell and value the results of the cell, for all the computed cells
+    """
+    num_values = len(swaps_replacement_values)
+
+    def cell(mode, i, j):
+        return (swaps_replacement_values[i], swaps_replacement_values[j], mode)
+
+    # Coarse grid
+    points = _initial_points(num_values, initial_step)
+    results = compute_cells([cell(mode, i, j) for mode in modes for i in points for j in points])
+    blocks = [(mode, block) for mode in modes for block in _initial_blocks(num_values, initial_step)]
+
+    summaries = {}
+    while blocks:
+        new_blocks = []
+        new_cells = set()
+        for mode, block in blocks:
+            i0, i1, j0, j1 = block
+            if (i1 - i0 <= 1) and (j1 - j0 <= 1):
+                # All the cells of the block are computed
+                continue
+
+            # Compare the corners of the block
+            corners = [cell(mode, i, j) for i in (i0, i1) for j in (j0, j1)]
+            for corner in corners:
+                if corner not in summaries:
+                    summaries[corner] = summarize(results[corner])
+            corner_summaries = numpy.array([summaries[corner] for corner in corners])
+            if not numpy.any(numpy.max(corner_summaries, axis = 0) - numpy.min(corner_summaries, axis = 0) > tolerance):
+                continue
+
+            # Split the block
+            sub_blocks, sub_points = _split(block)
+            new_blocks.extend((mode, sub_block) for sub_block in sub_blocks)
+            new_cells.update(cell(mode, i, j) for i, j in sub_points if cell(mode, i, j) not in results)
+
+        if new_cells:
+            results.update(compute_cells(sorted(new_cells)))
+        blocks = new_blocks
+
+    return results
+
+
+def _corner_float(value):
+    # Missing values (None) are NaN
+    return numpy.nan if value is None else float(value)
+
+
+def _interpolate_value(corner_values, t, u):
+    # Bilinear interpolation of nested dictionaries {run_type: {key: value}}, NaN if any corner is NaN
+    v00, v01, v10, v11 = corner_values
+    interpolated = {}
+    for run_type in v00:
+        interpolated[run_type] = {}
+        for key in v00[run_type]:
+            values = [_corner_float(v[run_type][key]) for v in (v00, v01, v10, v11)]
+            if any(numpy.isnan(value) for value in values):
+                interpolated[run_type][key] = numpy.nan
+                continue
+            interpolated[run_type][key] = ((1 - t) * (1 - u) * values[0] + (1 - t) * u * values[1]
+                                           + t * (1 - u) * values[2] + t * u * values[3])
+    return interpolated
+
+
+def interpolate_grid(measure_score, swaps_replacement_values, initial_step = 16, modes = MODES):
+    """Interpolate the results of an adaptive sweep onto the full grid.
+
+    The blocks refined by refine_grid are recovered from the computed cells: a block is
+    split if all the cells of its split are computed. The cells that are not computed
+    are bilinearly interpolated from the corners of their block.
+
+    Args:
+        measure_score: dictionary, key (number_swaps, number_replacements, mode) and value the
+            result of the cell, with the format used by the colormap functions, e.g. as
+            returned by SweepStore.load
+        swaps_replacement_values: values of swaps and replacements of the full grid
+        initial_step: step of the coarse grid used by refine_grid
+        modes: modes of the sweep
+
+    Returns:
+        measure_score: dictionary with the same format, with all the cells of the full grid.
+        Blocks whose corners are not computed yet, e.g. of a sweep still running, are not interpolated
+    """
+    num_values = len(swaps_replacement_values)
+
+    def cell(mode, i, j):
+        return (swaps_replacement_values[i], swaps_replacement_values[j], mode)
+
+    full_measure_score = dict(measure_score)
+    for mode in modes:
+        blocks = _initial_blocks(num_values, initial_step)
+        while blocks:
+            new_blocks = []
+            for block in blocks:
+                i0, i1, j0, j1 = block
+                if (i1 - i0 <= 1) and (j1 - j0 <= 1):
+                    continue
+
+                sub_blocks, sub_points = _split(block)
+                if all(cell(mode, i, j) in measure_score for i, j in sub_points):
+                    new_blocks.extend(sub_blocks)
+                    continue
+
+                # Leaf block: interpolate the cells which are not computed
+                corner_values = [measure_score.get(cell(mode, i, j)) for i in (i0, i1) for j in (j0, j1)]
+                if any(corner_value is None for corner_value in corner_values):
+                    # The sweep is running or was interrupted, the block is not computed yet
+                    continue
+                for i in range(i0, i1 + 1):
+                    for j in range(j0, j1 + 1):
+                        if cell(mode, i, j) not in full_measure_score:
+                            full_measure_score[cell(mode, i, j)] = _interpolate_value(corner_values, (i - i0) / (i1 - i0), (j - j0) / (j1 - j0))
+            blocks = new_blocks
+
+    return full_measure_score
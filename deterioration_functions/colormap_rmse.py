@@ -14,11 +14,11 @@
 
 # Author: Maria Maistro (mm@di.ku.dk)
 
-import numpy
-import pandas as pd
-import seaborn as sns
 import matplotlib as plt
 
+from deterioration_functions.quadrant_matrix import build_quadrant_matrix
+from deterioration_functions.heatmap import draw_heatmap, heatmap_file_path
+
 # Function to print colormaps for RMSE
 def colormap_rmse(swaps_replacement_values, max_label, label_step, rmse, min_value, max_value, run_name, run_type, measure, ouput_path, show_plot = False):
     # Input parameters:
@@ -34,79 +34,17 @@ def colormap_rmse(swaps_replacement_values, max_label, label_step, rmse, min_val
     # - ouput_path: path to the directory where the figure will be saved
     # - show_plot: boolean variable, true to show the plots
     
-    # Number of iterations, needed to compute the colormap size
-    n_iterations = len(swaps_replacement_values)
-    # n_iterations = int(round(len(swaps_replacement_values)/2, 0))
-    # Define the size of the heatmap
-    size = ((n_iterations) * 2) - 1
-    # Initialize the matrix for the heatmap
-    data_base = numpy.empty((size, size))
-    # Fill the matrix with NaN values
-    data_base[:] = numpy.NaN
-    
-    
-    # Get the values and map them to the corresponding index of the colormap
-    for swap_idx in range(0, n_iterations):
-        for replacement_idx in range(0, n_iterations):
-            # First quadrant, positive swaps and positive replacements
-            data_base[n_iterations - swap_idx - 1, n_iterations + replacement_idx - 1] = rmse[(swaps_replacement_values[swap_idx], swaps_replacement_values[replacement_idx], 'better')].get(run_type)[measure]
-    
-            # Third quadrant: negative swaps and negative replacements
-            data_base[n_iterations + swap_idx - 1, n_iterations - replacement_idx - 1] = rmse[(swaps_replacement_values[swap_idx], swaps_replacement_values[replacement_idx], 'worse')].get(run_type)[measure]
-
-            # Second quadrant: positive swaps and negative replacements
-            data_base[n_iterations - swap_idx - 1, n_iterations - replacement_idx - 1] = rmse[(swaps_replacement_values[swap_idx], swaps_replacement_values[replacement_idx], 'betterworse')].get(run_type)[measure]        
-    
-            # Fourth quadrant: negative swaps and positive replacements
-            data_base[n_iterations + swap_idx - 1 , n_iterations + replacement_idx - 1] = rmse[(swaps_replacement_values[swap_idx], swaps_replacement_values[replacement_idx], 'worsebetter')].get(run_type)[measure]        
-    
-    # Type of color-grading 
-    COLORMAP = "rocket_r"
+    # Matrix with one quadrant for each mode
+    data_base = build_quadrant_matrix(swaps_replacement_values, rmse, measure, run_type = run_type)
     
-    # Convert the numpy array in a data frame
-    data_base = pd.DataFrame(data_base)
-    
-    # Null values will be replaced by white color
-    # This is not needed for the final version
-    mask = data_base.isnull()
+    # Plot the heatmap with given labels
+    draw_heatmap('rmse', data_base, max_label, label_step, min_value, max_value, measure)
     
     # Maximum number of swaps and replacements applied
     max_n_iterations = swaps_replacement_values[-1]
     
-    # Set the labels to appear in the heatmap
-    xlabels = list(range(-max_label, max_label + 1, label_step))
-    ylabels = list(reversed(range(-max_label, max_label + 1, label_step)))
-    
-    # Plot the heatmap with given labels
-    ax = sns.heatmap(data_base, mask = mask, cmap = COLORMAP, vmin = min_value, vmax = max_value,
-                     xticklabels = xlabels, yticklabels = ylabels, cbar_kws = {'label': 'RMSE'})
-    # Set the labels in the correct positions
-    tick_locator = plt.ticker.LinearLocator(len(xlabels))
-    ax.xaxis.set_major_locator(tick_locator)
-    ax.yaxis.set_major_locator(tick_locator)
-    # Set labels corresponding to ticks
-    ax.set_xticklabels(xlabels)
-    ax.set_yticklabels(ylabels, rotation = 0)
-    # Print horizontal and vertical lines
-    ax.axhline(data_base.shape[0] / 2, color = 'k', linewidth = 0.5)
-    ax.axvline(data_base.shape[1] / 2, color = 'k', linewidth = 0.5) 
-    
-    # get proper measure names for figure titels
-    if measure == 'map':
-        measure_name = 'MAP'
-    elif measure == 'ndcg':
-        measure_name = 'nDCG'
-    elif measure == 'P_10':
-        measure_name = 'P@10'
-    
-    # Figure title
-    plt.pyplot.title('RMSE with %s' % measure_name)
-    # Set x and y axis labels
-    plt.pyplot.ylabel('Swaps')
-    plt.pyplot.xlabel('Replacements')
-    
     # Define the name of the output file
-    ouput_file_path = ouput_path + '_'.join(['RMSE', run_name, run_type, measure, str(max_n_iterations)]) + '.pdf'
+    ouput_file_path = heatmap_file_path(ouput_path, 'rmse', run_name, max_n_iterations, run_type, measure)
     # Save the figure    
     plt.pyplot.savefig(ouput_file_path, bbox_inches='tight')
     if show_plot:
@@ -15,13 +15,471 @@
 # Author: Maria Maistro (mm@di.ku.dk)
 
 import numpy
-import pytrec_eval
 import collections
-import operator
+
+from deterioration_functions.prepared_run import PreparedRun, swap_documents
+from deterioration_functions.deteriorated_run import DeterioratedRun
+
+
+MODES = ('worse', 'better', 'betterworse', 'worsebetter')
+
+
+def cell_rng(seed, number_swaps, number_replacements, mode, repetition = 0):
+    """Random number generator of a cell of a sweep.
+
+    Each (number_swaps, number_replacements, mode, repetition) cell gets its own stream,
+    derived from the seed of the sweep with a SeedSequence. The stream does not depend on
+    the order in which cells are computed, or on the process computing them, therefore
+    a single cell can be recomputed and gives the same deteriorated run.
+
+    Args:
+        seed: non negative integer, seed of the whole sweep
+        number_swaps: number of swaps of the cell
+        number_replacements: number of replacements of the cell
+        mode: mode of the cell {worse, better, betterworse, worsebetter}
+        repetition: index of the repetition of the cell
+
+    Returns:
+        rng: numpy.random.Generator
+    """
+    seed_sequence = numpy.random.SeedSequence(seed, spawn_key = (number_swaps, number_replacements, MODES.index(mode), repetition))
+    return numpy.random.default_rng(seed_sequence)
+
+
+def prepare_intervals(source, destination):
+    """Sort the source and destination intervals and convert them to rank positions starting from 0.
+
+    Args:
+        source: interval where documents are replaced or taken to be swapped, rank positions start from 1
+        destination: interval where documents are moved when swapped, rank positions start from 1
+
+    Returns:
+        source: numpy array, sorted source interval, rank positions start from 0
+        destination: numpy array, sorted destination interval, rank positions start from 0
+    """
+
+    # Convert source and destination lists to numpy arrays
+    source = numpy.array(source)
+    destination = numpy.array(destination)
+
+    # Sort the start and end indexes of source and destination
+    source.sort()
+    destination.sort()
+
+    # Check that the source and the destination do not overlap, otherwise retun an error
+    # Note that source and destination can be swapped, i.e. source can be closer to the bottom of the ranking
+    # and destination can be closer to the top of the ranking
+    if min(source[1], destination[1]) - max(source[0], destination[0]) >= 0:
+        print('Source and destination intervals can not overlap. Change the source and destination intervals.')
+
+    # Subtract -1 to source and destination, since the index are expressed starting from 1
+    # while in python arrays we start from 0
+    return source - 1, destination - 1
+
+
+def topic_actions(prepared_topic, source, destination, mode, number_swaps, number_replacements, verbose = False):
+    """Number of swaps and replacements that can actually be performed on a topic.
+
+    The requested number of swaps and replacements is decreased when the source or the
+    destination interval do not contain enough documents to move or replace.
+
+    Args:
+        prepared_topic: PreparedTopic, sorted and assessed ranking of the topic
+        source: numpy array, interval where documents are replaced or taken to be swapped,
+            sorted and with rank positions starting from 0
+        destination: numpy array, interval where documents are moved when swapped,
+            sorted and with rank positions starting from 0
+        mode: tipe of swaps and replacements to be performed {worse, better, betterworse, worsebetter}
+        number_swaps: number of swaps to perform
+        number_replacements: number of replacements to perform
+        verbose: extra text messages that are printed out
+
+    Returns:
+        actions: tuple (current_swaps, current_replacements), or None if there are no
+        documents to move or replace in the source interval
+    """
+
+    # Quantity: number of documents to replace plus number of documents to swaps
+    quantity = number_swaps + number_replacements
+    # Topic id, used in the text messages
+    current_topic_id = prepared_topic.topic_id
+
+    # Set the current quantity to the specified quantity
+    current_quantity = quantity
+    # Set the current number of swaps and replacements to the current quantities
+    current_swaps = number_swaps
+    current_replacements = number_replacements
+
+    # 1) Worse mode means that:
+    # Swap: relevant documents at the beginning of the ranking (source) are swapped 
+    # with non relevant documents at the end of the ranking (destination)
+    # Replacement: relevant documents in the source are replaced with non relevant documents
+    if (mode == 'worse'):
+
+        # Check if there are enough document to move
+        # Number of relevant documents in the source range
+        num_relevant_source = prepared_topic.num_relevant(source)
+        # Number of not relevant documents in the destination
+        num_notrel_destination = prepared_topic.num_not_relevant(destination)
+
+        # Check if there are relevant documents in the source range
+        # if there are no relevant documents, there is nothing to do
+        if num_relevant_source <= 0:
+            if verbose:
+                print('\tTopic %s: no relevant documents in [%i, %i].' % (current_topic_id, source[0], source[1]))
+            return None
+
+        # 1) Check if there are enough not relevant documents to be swapped with the relevant documents
+        if (current_swaps > num_notrel_destination):
+            if verbose:
+                print('\tTopic %s: there are less than %i not relevant documents in [%i, %i], decrease the number of swaps to %i.' % (current_topic_id, number_swaps, (destination[0] + 1), (destination[1] + 1), num_notrel_destination))
+            # The number of relevant documents I can move is equal to the number of not relevant documents
+            current_swaps = num_notrel_destination
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements   
+
+        # 2) Check if there are not enough relevant document to move and replace
+        if (num_relevant_source < current_quantity):
+            if verbose:
+                print('\tTopic %s: there are %i relevant documents in [%i, %i], decrease the number of documents to swap and replace.' % (current_topic_id, num_relevant_source, (source[0] + 1), (source[1] + 1)))
+            # The maximum number of documents that can be moved and replaced
+            # I want to keep the ratio of swaps/replacements fixed
+            # Given that the number of swaps should be less than num_notrel_destination
+            # Coefficient to keep the same ratio
+            coefficient_ratio = int(round((number_swaps * num_relevant_source) / (number_swaps + number_replacements)))
+            # Get the minimum bewteen the number which gives the correct ratio and 
+            # the maximum number of swaps which can be done
+            current_swaps = min(coefficient_ratio, num_notrel_destination)
+            # All the other actions will be replacements actions (can not do otherwise)
+            current_replacements = num_relevant_source - current_swaps
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements
+
+    # 2) Better mode means that:
+    # Swap: non relevant documents at the beginning of the ranking (source) are swapped 
+    # with relevant documents at the end of the ranking (destination)
+    # Replacement: non relevant documents in the source are replaced with relevant documents
+    elif (mode == 'better'):
+
+        # For swap I just need to swap source and destination
+        # Check if there are enough document to move
+        # Number of relevant documents in the destination range
+        num_relevant_destination = prepared_topic.num_relevant(destination)
+        # Number of not relevant documents in the source
+        num_notrel_source = prepared_topic.num_not_relevant(source)
+
+        # Check if there are not relevant documents in the source range
+        # if there are no not relevant documents, there is nothing to do
+        if num_notrel_source <= 0:
+            if verbose:
+                print('\tTopic %s: no non-relevant documents in [%i, %i].' % (current_topic_id, source[0], source[1]))
+            return None
+
+        # 1) Check if there are enough relevant documents to be swapped with the non relevant documents
+        if (current_swaps > num_relevant_destination):
+            if verbose:
+                print('\tTopic %s: there are less than %i relevant documents in [%i, %i], decrease the number of swaps to %i.' % (current_topic_id, number_swaps, (destination[0] + 1), (destination[1] + 1), num_relevant_destination))
+            # The number of relevant documents I can move is equal to the number of not relevant documents
+            current_swaps = num_relevant_destination
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements
+
+        # 2) Check if there are enough relevant documents that were not retrieved
+        # We need to check if we have enough relevant documents (not retrieved) to replace the not relevant ones
+        # Number of relevant documents not retrieved
+        num_rel_doc_not_retrieved = len(prepared_topic.rel_doc_not_retrieved)
+        # Check if the number of replacements is smaller than the number relevant not retrieved
+        if (current_replacements > num_rel_doc_not_retrieved):
+            if verbose:
+                print('\tTopic %s: there are just %i relevant documents not retrieved. Decrease the number of replacements.' % (current_topic_id, num_rel_doc_not_retrieved))
+            # Decrease the number of replacements to the greatest possible number
+            current_replacements = num_rel_doc_not_retrieved
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements                
+
+        # 3) Check if there are not enough non-relevant documents to move and replace
+        if (num_notrel_source < current_quantity):
+            if verbose:
+                print('\tTopic %s: there are %i non relevant documents in [%i, %i], decrease the number of documents to swap and replace.' % (current_topic_id, num_notrel_source, (source[0] + 1), (source[1] + 1)))
+            # The maximum number of documents that can be moved and replaced
+            # I want to keep the ratio of swaps/replacements fixed
+            # Given that the number of swaps should be less than num_relevant_destination
+            # And the number of replacements should be less than the number of not retrieved relevant documents
+            # Coefficient to keep the same ratio
+            coefficient_ratio = int(round((number_swaps * num_notrel_source) / (number_swaps + number_replacements)))
+            # Get the minimum bewteen the number which gives the correct ratio and 
+            # the maximum number of swaps which can be done
+            current_swaps = min(coefficient_ratio, num_relevant_destination)
+            # All the other actions will be replacements actions (can not do otherwise)
+            current_replacements = num_notrel_source - current_swaps
+            # Get the maximum number of replacements that can be done
+            current_replacements = min(current_replacements, num_rel_doc_not_retrieved)
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements
+
+    # 3) Betterworse mode means that:
+    # Swap (better): non relevant documents at the beginning of the ranking (source) are swapped 
+    # with relevant documents at the end of the ranking (destination)
+    # Replacement (worse): relevant documents in the source are replaced with non relevant documents
+    elif (mode == 'betterworse'):
+
+        # For swap I just need to swap source and destination
+        # Check if there are enough documents to move
+        # Number of relevant documents in the destination range
+        num_relevant_destination = prepared_topic.num_relevant(destination)
+        # Number of not relevant documents in the source
+        num_notrel_source = prepared_topic.num_not_relevant(source)
+        # Number of relevant documents in the source interval
+        num_relevant_source = prepared_topic.num_relevant(source)
+
+        # Check if there are not relevant documents in the source range
+        # and if there are relevant documents in the source reange
+        if not ((num_notrel_source > 0) or (num_relevant_source > 0)):
+            if verbose:
+                print('\tTopic %s: no non-relevant documents in [%i, %i].' % (current_topic_id, source[0], source[1]))
+            return None
+
+        # 1) Check if there are enough relevant documents to be swapped with the non relevant documents
+        if (current_swaps > num_relevant_destination):
+            if verbose:
+                print('\tTopic %s: there are less than %i relevant documents in [%i, %i], decrease the number of swaps to %i.' % (current_topic_id, number_swaps, (destination[0] + 1), (destination[1] + 1), num_relevant_destination))
+            # The number of relevant documents I can move is equal to the number of not relevant documents
+            current_swaps = num_relevant_destination
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements            
+
+        # 3) Check if there are not enough non-relevant documents to move
+        if (num_notrel_source < current_swaps):
+            if verbose:
+                print('\tTopic %s: there are %i non relevant documents in [%i, %i], decrease the number of documents to swap.' % (current_topic_id, num_notrel_source, (source[0] + 1), (source[1] + 1)))
+            # The maximum number of documents that can be swapped
+            # corresponds to the number of not relevant documents in the source interval
+            current_swaps = num_notrel_source
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements
+            
+        # 3) Check if there are not enough relevant document to replace
+        if (num_relevant_source < current_replacements):
+            if verbose:
+                print('\tTopic %s: there are %i relevant documents in [%i, %i], decrease the number of documents to replace.' % (current_topic_id, num_relevant_source, (source[0] + 1), (source[1] + 1)))
+            # The maximum number of documents that can be replaced
+            # corresponds to the number of relevant documents
+            current_replacements = num_relevant_source
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements
+
+    # 4) Worsebetter mode means that:
+    # Swap (worse): relevant documents at the beginning of the ranking (source) are swapped 
+    # with not relevant documents at the end of the ranking (destination)
+    # Replacement (better): not relevant documents in the source are replaced with relevant documents
+    elif (mode == 'worsebetter'):
+
+        # Check if there are enough document to move
+        # Number of relevant documents in the source range
+        num_relevant_source = prepared_topic.num_relevant(source)
+        # Number of not relevant documents in the source
+        num_notrel_source = prepared_topic.num_not_relevant(source)
+        # Number of not relevant documents in the destination
+        num_notrel_destination = prepared_topic.num_not_relevant(destination)
+
+        # Check if there are relevant documents in the source range
+        if not ((num_relevant_source > 0) or (num_notrel_source > 0)):
+            if verbose:
+                print('\tTopic %s: no relevant documents in [%i, %i].' % (current_topic_id, source[0], source[1]))
+            return None
+            
+        # 1) Check if there are enough not relevant documents to be swapped with the relevant documents
+        if (current_swaps > num_notrel_destination):
+            if verbose:
+                print('\tTopic %s: there are less than %i not relevant documents in [%i, %i], decrease the number of swaps to %i.' % (current_topic_id, number_swaps, (destination[0] + 1), (destination[1] + 1), num_notrel_destination))
+            # The number of relevant documents I can move is equal to the number of not relevant documents
+            current_swaps = num_notrel_destination
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements   
+
+        # 2) Check if there are not enough relevant document to move
+        if (num_relevant_source < current_swaps):
+            if verbose:
+                print('\tTopic %s: there are %i relevant documents in [%i, %i], decrease the number of documents to swap.' % (current_topic_id, num_relevant_source, (source[0] + 1), (source[1] + 1)))
+            # The maximum number of documents that can be moved and replaced
+            # is the number of relevant documents in the source interval
+            current_swaps = num_relevant_source
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements
+        
+        # 3) Check if there are enough relevant documents in the source interval
+        if (num_notrel_source < current_replacements):
+            if verbose:
+                print('\tTopic %s: there are %i relevant documents in [%i, %i], decrease the number of documents to replace.' % (current_topic_id, num_relevant_source, (source[0] + 1), (source[1] + 1)))
+            # The maximum number of documents that can be replaced
+            # corresponds to the number of not relevant documents
+            current_replacements = num_notrel_source
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements
+        
+        # 4) Check if there are enough relevant documents that were not retrieved
+        # We need to check if we have enough relevant documents (not retrieved) to replace the not relevant ones
+        # Number of relevant documents not retrieved
+        num_rel_doc_not_retrieved = len(prepared_topic.rel_doc_not_retrieved)
+        # Check if the number of replacements is smaller than the number relevant not retrieved
+        if (current_replacements > num_rel_doc_not_retrieved):
+            if verbose:
+                print('\tTopic %s: there are just %i relevant documents not retrieved. Decrease the number of replacements.' % (current_topic_id, num_rel_doc_not_retrieved))
+            # Decrease the number of replacements to the greatest possible number
+            current_replacements = num_rel_doc_not_retrieved
+            # Update the current quantity
+            current_quantity = current_swaps + current_replacements
+
+    # Unknown mode, there is nothing to do
+    else:
+        return None
+
+    if verbose:
+        # Print the 'true' number of swaps and replacements
+        print('\tNumber of Swaps: %i, Number of Replacement: %i'% (current_swaps, current_replacements))
+
+    return current_swaps, current_replacements
+
+
+def deteriorate_topic(prepared_topic, source, destination, mode, current_swaps, current_replacements, rng = None):
+    """Randomly choose the documents to move and replace and deteriorate a topic.
+
+    Args:
+        prepared_topic: PreparedTopic, sorted and assessed ranking of the topic
+        source: numpy array, interval where documents are replaced or taken to be swapped,
+            sorted and with rank positions starting from 0
+        destination: numpy array, interval where documents are moved when swapped,
+            sorted and with rank positions starting from 0
+        mode: tipe of swaps and replacements to be performed {worse, better, betterworse, worsebetter}
+        current_swaps: number of swaps to perform, as returned by topic_actions
+        current_replacements: number of replacements to perform, as returned by topic_actions
+        rng: numpy.random.Generator used to choose the documents, None to use the global numpy.random state
+
+    Returns:
+        permutation: integer array, element i is the (original) rank position of the
+            document now at rank position i
+        replacements: integer array, element i is 0 if the document at rank position i is not replaced,
+            -1 if it is replaced with a fake not relevant document,
+            k > 0 if it is replaced with the k-th relevant document not retrieved
+    """
+
+    # Random shuffles are drawn from the given generator or from the global state
+    shuffle = numpy.random.shuffle if rng is None else rng.shuffle
+
+    # Integer representation of the modified ranking
+    permutation = numpy.arange(len(prepared_topic), dtype = numpy.int32)
+    replacements = numpy.zeros(len(prepared_topic), dtype = numpy.int32)
+
+    # Number of documents to swap and replace
+    current_quantity = current_swaps + current_replacements
+
+    # 1) Worse mode: relevant documents in the source are swapped with not relevant documents in the destination
+    # and replaced with fake not relevant documents
+    if (mode == 'worse'):
+
+        # Rank positions of relevant documents (source)
+        rel_doc_rank_source = prepared_topic.relevant_in(source)
+        # Get a random shuffle of rank positions of relevant documents
+        shuffle(rel_doc_rank_source)
+
+        # 1) Start with swap
+        if current_swaps > 0:
+            # rank positions of not relevant documents (destination)
+            notrel_doc_rank_destination = prepared_topic.not_relevant_in(destination)
+            # get a random subset with the size equal to current_quantity
+            shuffle(notrel_doc_rank_destination)
+            # swap the documents, all at once
+            swap_documents(permutation, rel_doc_rank_source[0:current_swaps], notrel_doc_rank_destination[0:current_swaps])
+
+        # 2) Replace documents
+        if current_replacements > 0:
+            # replace the relevant documents with fake non relevant documents, all at once
+            replacements[rel_doc_rank_source[current_swaps:current_quantity]] = -1
+
+    # 2) Better mode: not relevant documents in the source are swapped with relevant documents in the destination
+    # and replaced with relevant documents not retrieved
+    elif (mode == 'better'):
+
+        # Rank positions of non relevant documents (source)
+        notrel_doc_rank_source = prepared_topic.not_relevant_in(source)
+        # Get a random shuffle of rank positions of non relevant documents
+        shuffle(notrel_doc_rank_source)
+
+        # 1) Start with swap
+        if current_swaps > 0:
+            # rank positions of relevant documents (destination)
+            rel_doc_rank_destination = prepared_topic.relevant_in(destination)
+            # get a random subset with the size equal to current_quantity
+            shuffle(rel_doc_rank_destination)
+            # swap the documents, all at once
+            swap_documents(permutation, notrel_doc_rank_source[0:current_swaps], rel_doc_rank_destination[0:current_swaps])
+
+        # 2) Replace documents
+        if current_replacements > 0:
+            # replace the non relevant documents with the first relevant documents not retrieved, all at once
+            notrel_doc_replace = notrel_doc_rank_source[current_swaps:current_quantity]
+            replacements[notrel_doc_replace] = numpy.arange(1, len(notrel_doc_replace) + 1)
+
+    # 3) Betterworse mode: not relevant documents in the source are swapped with relevant documents in the destination,
+    # relevant documents in the source are replaced with fake not relevant documents
+    elif (mode == 'betterworse'):
+
+        # Rank positions of non relevant documents (source)
+        notrel_doc_rank_source = prepared_topic.not_relevant_in(source)
+        # Get a random shuffle of rank positions of non relevant documents
+        shuffle(notrel_doc_rank_source)
+
+        # 1) Start with swap
+        if current_swaps > 0:
+            # rank positions of relevant documents (destination)
+            rel_doc_rank_destination = prepared_topic.relevant_in(destination)
+            # get a random subset with the size equal to current_quantity
+            shuffle(rel_doc_rank_destination)
+            # swap the documents, all at once
+            swap_documents(permutation, notrel_doc_rank_source[0:current_swaps], rel_doc_rank_destination[0:current_swaps])
+
+        # 2) Replace documents
+        if current_replacements > 0:
+            # Rank positions of relevant documents (source)
+            rel_doc_rank_source = prepared_topic.relevant_in(source)
+            # Get a random shuffle of rank positions of relevant documents
+            shuffle(rel_doc_rank_source)
+            # replace the relevant documents with fake non relevant documents, all at once
+            replacements[rel_doc_rank_source[0:current_replacements]] = -1
+
+    # 4) Worsebetter mode: relevant documents in the source are swapped with not relevant documents in the destination,
+    # not relevant documents in the source are replaced with relevant documents not retrieved
+    elif (mode == 'worsebetter'):
+
+        # Rank positions of relevant documents (source)
+        rel_doc_rank_source = prepared_topic.relevant_in(source)
+        # Get a random shuffle of rank positions of relevant documents
+        shuffle(rel_doc_rank_source)
+
+        # 1) Start with swap
+        if current_swaps > 0:
+            # rank positions of not relevant documents (destination)
+            notrel_doc_rank_destination = prepared_topic.not_relevant_in(destination)
+            # get a random subset with the size equal to current_quantity
+            shuffle(notrel_doc_rank_destination)
+            # swap the documents, all at once
+            swap_documents(permutation, rel_doc_rank_source[0:current_swaps], notrel_doc_rank_destination[0:current_swaps])
+
+        # 2) Replace documents
+        if current_replacements > 0:
+            # Rank positions of non relevant documents (source)
+            notrel_doc_rank_source = prepared_topic.not_relevant_in(source)
+            # Get a random shuffle of rank positions of non relevant documents
+            shuffle(notrel_doc_rank_source)
+            # replace the non relevant documents with the first relevant documents not retrieved, all at once
+            notrel_doc_replace = notrel_doc_rank_source[0:current_replacements]
+            replacements[notrel_doc_replace] = numpy.arange(1, len(notrel_doc_replace) + 1)
+
+    return permutation, replacements
 
 
 def deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination, 
-                                mode, number_swaps, number_replacements, verbose):
+                                mode, number_swaps, number_replacements, verbose, compact = False, rng = None):
     
     
     """Deteriorate a run with the given parameters.
@@ -30,8 +488,10 @@ def deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination,
         of the documents to modify, we proceed with swaps and replacements. 
 
     Args:
-        run_file_path: path to the run file in TREC format
-        qrels_file_path: path to the qrels file in TREC format
+        run_file_path: path to the run file in TREC format, or a PreparedRun object;
+            a sweep should prepare the run once and pass it to every call
+        qrels_file_path: path to the qrels file in TREC format, ignored (it can be None)
+            when run_file_path is a PreparedRun
         ratio: float in [0, 1], percentage of topics to deteriorate
         source: interval where documents are replaced or taken to be swapped
         destination: interval where documents are moved when swapped
@@ -39,11 +499,17 @@ def deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination,
         number_swaps: number of swaps to perform
         number_replacements: number of replacements to perform
         verbose: extra text messages that are printed out 
+        compact: if True, return a DeterioratedRun instead of a dictionary
+        rng: numpy.random.Generator used to select topics and documents, see cell_rng.
+            None to use the global numpy.random state
 
     Returns:
         modified_run: is a two level nested dictionary where on the first level 
         keys are topic id, on the second level keys are document ids and values are
-        score and rank position.
+        score and rank position. Topics which are not modified are shared with the original run,
+        or with the dictionaries built once from it if it is a TrecRun, see PreparedRun.original_ranking.
+        If compact is True, modified_run is a DeterioratedRun, which stores the modified
+        topics as permutations of the original rankings.
     """
 
     # Quantity: number of documents to replace plus number of documents to swaps
@@ -55,19 +521,9 @@ def deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination,
     if (ratio < 0) or (ratio > 1):
         print('Ratio should be a number in [0, 1]')
 
-    # Convert source and destination lists to numpy arrays
-    source = numpy.array(source)
-    destination = numpy.array(destination)
-
-    # Sort the start and end indexes of source and destination
-    source.sort()
-    destination.sort()
-
-    # Check that the source and the destination do not overlap, otherwise retun an error
-    # Note that source and destination can be swapped, i.e. source can be closer to the bottom of the ranking
-    # and destination can be closer to the top of the ranking
-    if min(source[1], destination[1]) - max(source[0], destination[0]) >= 0:
-        print('Source and destination intervals can not overlap. Change the source and destination intervals.')
+    # Sort source and destination, check that they do not overlap and
+    # express the rank positions starting from 0
+    source, destination = prepare_intervals(source, destination)
 
     # Check that quantity is either 'all' or an integer greater than 0
     if (quantity != 'all'):
@@ -80,11 +536,6 @@ def deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination,
             print('Quantity should be an integer >= 1.')
 
 
-    # Subtract -1 to source and destination, since the index are expressed starting from 1
-    # while in python arrays we start from 0
-    source = numpy.array(source) - 1
-    destination = numpy.array(destination) - 1 
-
     # Quantity: number of documents to move/replace, or move/replace all of them
     # either an int (number of swaps) or 'all'
     # quantity = 'all'
@@ -99,26 +550,26 @@ def deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination,
         if quantity > (destination[1] - destination[0] + 1):
             print('Destination interval does not contain enough documents to be moved. Reduce the quantity or increase the destination range.')
 
-    # Import the run
-    # The run is a nested dictionary with: key: topic ids, value: a dictionary
+    # Parse and assess the run, unless it has already been prepared
+    if isinstance(run_file_path, PreparedRun):
+        prepared_run = run_file_path
+    else:
+        prepared_run = PreparedRun.from_files(run_file_path, qrels_file_path)
+
+    # The original run is a nested dictionary with: key: topic ids, value: a dictionary
     # The nested dictionary has: key: doc ids, value: doc scores
-    with open(run_file_path, 'r') as f_run:
-        run_orig = pytrec_eval.parse_run(f_run)
-
-    # Import the qrels
-    # The qrels is a nested dictionary with: key: topic ids, value: a dictionary
-    # The nested dictionary has: key: doc ids, value: relevance labels
-    with open(qrels_file_path, 'r') as f_qrel:
-        qrels = pytrec_eval.parse_qrel(f_qrel)
+    run_orig = prepared_run.run_orig
         
-    # Initialize the modified run
-    modified_run = collections.defaultdict(dict)
+    # Modified topics, as permutations and replacements of the original rankings
+    # key topic id, value (permutation, replacements) or None if the ranking is not modified
+    deteriorated_topics = {}
     
     # Get the list of topic ids
     topic_ids = numpy.array(list(run_orig.keys()))
     # Select a random subset of topics to be modified
     # shuffle the array
-    numpy.random.shuffle(topic_ids)
+    shuffle = numpy.random.shuffle if rng is None else rng.shuffle
+    shuffle(topic_ids)
     # compute the number of topics to modify
     num_topics_mod = round(numpy.size(topic_ids, 0) * ratio)
     
@@ -128,588 +579,36 @@ def deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination,
         if verbose:
             print('Processing topic: %s - modified' % current_topic_id)
 
-        # Get the list of document ids and scores for the given topic id
-        # This is represented as a list of tuples (doc_id, score)
-        current_ranking = list(run_orig[current_topic_id].items())
-
-        # Sort the ranking as trec_eval
-        # sort the tuples, score descending, doc_id descending
-        # this is the same ordering used by trec_eval
-        current_ranking.sort(key = operator.itemgetter(0), reverse = True)         # doc_id descending
-        current_ranking.sort(key = operator.itemgetter(1), reverse = True)         # score descending
-
-        # Assess the run:
-        # Create a numpy array, where each element corresponds to the relvance label of the document in that rank position
-        # -1 stands for unjudged documents
-        # Length of the ranking
-        ranking_length = len(current_ranking)
-        # Initialize and empty array
-        assessed_ranking = numpy.empty((ranking_length, ))
-        # Populate the assessed ranking
-        # For each rank position
-        for r in range(ranking_length):
-            # get the doc id at this rank position
-            current_doc_id = current_ranking[r][0]
-            # get the relevance grade for this documents
-            # returns -1 if a document is unjudged
-            current_doc_label = qrels[current_topic_id].get(current_doc_id, -1)
-            # print(qrels.get(current_doc_id, -1))
-            # populate the arrey
-            assessed_ranking[r] = int(current_doc_label)
-
-        # Find the position of relevant documents in the ranking
-        bool_rel_doc_position = (assessed_ranking > 0)
-        # vector of 0 and 1, where 1 means relevant and 0 everything else
-        rel_doc_position = bool_rel_doc_position.astype(int)
-        # actual rank position of relevant documents
-        rel_doc_rank = numpy.argwhere(bool_rel_doc_position)[:, 0]
-        # actual rank position of not relevant documents
-        notrel_doc_rank = numpy.argwhere(~bool_rel_doc_position)[:, 0]
-
-        # Create a copy of the current ranking
-        # The score is copied as a string
-        modified_ranking = numpy.array(current_ranking)
-
-        # 1) Worse mode means that:
-        # Swap: relevant documents at the beginning of the ranking (source) are swapped 
-        # with non relevant documents at the end of the ranking (destination)
-        # Replacement: relevant documents in the source are replaced with non relevant documents
-        if (mode == 'worse'):
-
-            # Check if there are enough document to move
-            # Number of relevant documents in the source range
-            num_relevant_source = numpy.sum(rel_doc_position[source[0]:(source[1] + 1)])
-            # Number of not relevant documents in the destination
-            num_notrel_destination = (destination[1] - destination[0] + 1) - numpy.sum(rel_doc_position[destination[0]:(destination[1] + 1)])
-
-            # Set the current quantity to the specified quantity
-            current_quantity = quantity
-            # Set the current number of swaps and replacements to the current quantities
-            current_swaps = number_swaps
-            current_replacements = number_replacements
-
-
-            # Check if there are relevant documents in the source range
-            if num_relevant_source > 0:
-
-                # 1) Check if there are enough not relevant documents to be swapped with the relevant documents
-                if (current_swaps > num_notrel_destination):
-                    if verbose:
-                        print('\tTopic %s: there are less than %i not relevant documents in [%i, %i], decrease the number of swaps to %i.' % (current_topic_id, number_swaps, (destination[0] + 1), (destination[1] + 1), num_notrel_destination))
-                    # The number of relevant documents I can move is equal to the number of not relevant documents
-                    current_swaps = num_notrel_destination
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements   
-
-                # 2) Check if there are not enough relevant document to move and replace
-                if (num_relevant_source < current_quantity):
-                    if verbose:
-                        print('\tTopic %s: there are %i relevant documents in [%i, %i], decrease the number of documents to swap and replace.' % (current_topic_id, num_relevant_source, (source[0] + 1), (source[1] + 1)))
-                    # The maximum number of documents that can be moved and replaced
-                    # I want to keep the ratio of swaps/replacements fixed
-                    # Given that the number of swaps should be less than num_notrel_destination
-                    # Coefficient to keep the same ratio
-                    coefficient_ratio = int(round((number_swaps * num_relevant_source) / (number_swaps + number_replacements)))
-                    # Get the minimum bewteen the number which gives the correct ratio and 
-                    # the maximum number of swaps which can be done
-                    current_swaps = min(coefficient_ratio, num_notrel_destination)
-                    # All the other actions will be replacements actions (can not do otherwise)
-                    current_replacements = num_relevant_source - current_swaps
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements
-
-                if verbose:
-                    # Print the 'true' number of swaps and replacements
-                    print('\tNumber of Swaps: %i, Number of Replacement: %i'% (current_swaps, current_replacements))
-
-                # Rank positions of relevant documents (source)
-                rel_doc_rank_source = rel_doc_rank[numpy.logical_and(rel_doc_rank >= source[0], rel_doc_rank <= source[1])]
-                # Get a random shuffle of rank positions of relevant documents
-                numpy.random.shuffle(rel_doc_rank_source)
-
-                # Swap documents and replace documents
-                # 1) Start with swap
-                # If the number of swaps is > 0
-                if current_swaps > 0:
-
-                    # select the relevant documents to swap
-                    rel_doc_swap = rel_doc_rank_source[0:current_swaps]
-
-                    # rank positions of not relevant documents (destination)
-                    notrel_doc_rank_destination = notrel_doc_rank[numpy.logical_and(notrel_doc_rank >= destination[0], notrel_doc_rank <= destination[1])]
-                    # get a random subset with the size equal to current_quantity
-                    numpy.random.shuffle(notrel_doc_rank_destination)
-                    # select the not relevant documents to swap
-                    notrel_doc_swap = notrel_doc_rank_destination[0:current_swaps]
-
-                    # swap the documents
-                    for k in range(current_swaps):
-                        # Document id of the document to be swapped in the source interval
-                        source_doc_id = current_ranking[rel_doc_swap[k]][0]
-                        # Document id of the document to be swapped in the destination interval
-                        destination_doc_id = current_ranking[notrel_doc_swap[k]][0]
-                        # Modify the ranking, move the destination document (not relevant)
-                        modified_ranking[rel_doc_swap[k]][0] = destination_doc_id
-                        # Modify the ranking, move the source document (relevant)
-                        modified_ranking[notrel_doc_swap[k]][0] = source_doc_id
-
-                # 2) Replace documents
-                # Replace documents
-                # If the number of repacements is > 0
-                if current_replacements > 0:
-                    # Select the relevant documents to replace
-                    rel_doc_replace = rel_doc_rank_source[current_swaps:current_quantity]
-
-                    # replace the documents
-                    for k in range(current_replacements):
-                        # Document id of the document to be replaced in the location interval
-                        location_doc_id = current_ranking[rel_doc_replace[k]][0]
-                        # Modify the ranking, replace the relevant document with a fake non relevant
-                        modified_ranking[rel_doc_replace[k]][0] = 'fake' + location_doc_id
-
-            # if there are no relevant documents, there is nothing to do
-            else:
-                if verbose:
-                    print('\tTopic %s: no relevant documents in [%i, %i].' % (current_topic_id, source[0], source[1]))
-
-            # Add the modified ranking to the dictionary
-            # for each element of the new ranking
-            for row in modified_ranking:
-                # get the current document id
-                current_doc_id = row[0]
-                # get the current document score
-                current_score = row[1]
-                # add the element (doc_id, score) to the run dictionary
-                # the score has to be converted to float
-                modified_run[current_topic_id][current_doc_id] = float(current_score)
-
-
-        # 2) Better mode means that:
-        # Swap: non relevant documents at the beginning of the ranking (source) are swapped 
-        # with relevant documents at the end of the ranking (destination)
-        # Replacement: non relevant documents in the source are replaced with relevant documents
-        elif (mode == 'better'):
-
-            # For swap I just need to swap source and destination
-            # Check if there are enough document to move
-            # Number of relevant documents in the destination range
-            num_relevant_destination = numpy.sum(rel_doc_position[destination[0]:(destination[1] + 1)])
-            # Number of not relevant documents in the source
-            num_notrel_source = (source[1] - source[0] + 1) - numpy.sum(rel_doc_position[source[0]:(source[1] + 1)])
-
-            # Set the current quantity to the specified quantity
-            current_quantity = quantity
-            # Set the current number of swaps and replacements to the current quantities
-            current_swaps = number_swaps
-            current_replacements = number_replacements
-
-            # Check if there are not relevant documents in the source range
-            if num_notrel_source > 0:
-
-                # 1) Check if there are enough relevant documents to be swapped with the non relevant documents
-                if (current_swaps > num_relevant_destination):
-                    if verbose:
-                        print('\tTopic %s: there are less than %i relevant documents in [%i, %i], decrease the number of swaps to %i.' % (current_topic_id, number_swaps, (destination[0] + 1), (destination[1] + 1), num_relevant_destination))
-                    # The number of relevant documents I can move is equal to the number of not relevant documents
-                    current_swaps = num_relevant_destination
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements
-
-
-                # 2) Check if there are enough relevant documents that were not retrieved
-                # We need to check if we have enough relevant documents (not retrieved) to replace the not relevant ones
-                # rank positions of relevant documents (in the whole ranking) rel_doc_rank
-                # Get doc ids of the relevant documents retreived in the ranking
-                rel_doc_retrieved = [current_ranking[k][0] for k in rel_doc_rank]
-                # List of relevant documents ids in the qrels
-                rel_doc_qrels = [doc_id for doc_id, label in qrels[current_topic_id].items() if label > 0]
-                # List of relevant documents that are not retrieved
-                # Note the the difference between sets is not symmetric
-                # Anyway rel_doc_qrels always includes rel_doc_retrieved
-                rel_doc_not_retrieved = list(set(rel_doc_qrels) - set(rel_doc_retrieved))
-                # Number of relevant documents not retrieved
-                num_rel_doc_not_retrieved = len(rel_doc_not_retrieved)
-                # Check if the number of replacements is smaller than the number relevant not retrieved
-                if (current_replacements > num_rel_doc_not_retrieved):
-                    if verbose:
-                        print('\tTopic %s: there are just %i relevant documents not retrieved. Decrease the number of replacements.' % (current_topic_id, num_rel_doc_not_retrieved))
-                    # Decrease the number of replacements to the greatest possible number
-                    current_replacements = num_rel_doc_not_retrieved
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements                
-
-
-                # 3) Check if there are not enough non-relevant documents to move and replace
-                if (num_notrel_source < current_quantity):
-                    if verbose:
-                        print('\tTopic %s: there are %i non relevant documents in [%i, %i], decrease the number of documents to swap and replace.' % (current_topic_id, num_notrel_source, (source[0] + 1), (source[1] + 1)))
-                    # The maximum number of documents that can be moved and replaced
-                    # I want to keep the ratio of swaps/replacements fixed
-                    # Given that the number of swaps should be less than num_relevant_destination
-                    # And the number of replacements should be less than the number of not retrieved relevant documents
-                    # Coefficient to keep the same ratio
-                    coefficient_ratio = int(round((number_swaps * num_notrel_source) / (number_swaps + number_replacements)))
-                    # Get the minimum bewteen the number which gives the correct ratio and 
-                    # the maximum number of swaps which can be done
-                    current_swaps = min(coefficient_ratio, num_relevant_destination)
-                    # All the other actions will be replacements actions (can not do otherwise)
-                    current_replacements = num_notrel_source - current_swaps
-                    # Get the maximum number of replacements that can be done
-                    current_replacements = min(current_replacements, num_rel_doc_not_retrieved)
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements
-
-                if verbose:
-                    # Print the 'true' number of swaps and replacements
-                    print('\tNumber of Swaps: %i, Number of Replacement: %i'% (current_swaps, current_replacements))
-
-                # Rank positions of non relevant documents (source)
-                # not_rel_doc_rank_source = rel_doc_rank[numpy.logical_and(rel_doc_rank >= source[0], rel_doc_rank <= source[1])]
-                notrel_doc_rank_source = notrel_doc_rank[numpy.logical_and(notrel_doc_rank >= source[0], notrel_doc_rank <= source[1])]
-
-                # Get a random shuffle of rank positions of non relevant documents
-                numpy.random.shuffle(notrel_doc_rank_source)
-
-                # Swap documents and replace documents
-                # 1) Start with swap
-                # If the number of swaps is > 0
-                if current_swaps > 0:
-
-                    # select the relevant documents to swap
-                    notrel_doc_swap = notrel_doc_rank_source[0:current_swaps]
-                    # rank positions of relevant documents (destination)
-                    #notrel_doc_rank_destination = notrel_doc_rank[numpy.logical_and(notrel_doc_rank >= destination[0], notrel_doc_rank <= destination[1])]
-                    rel_doc_rank_destination = rel_doc_rank[numpy.logical_and(rel_doc_rank >= destination[0], rel_doc_rank <= destination[1])]
-                    # get a random subset with the size equal to current_quantity
-                    numpy.random.shuffle(rel_doc_rank_destination)
-                    # select the not relevant documents to swap
-                    rel_doc_swap = rel_doc_rank_destination[0:current_swaps]
-
-                    # swap the documents
-                    for k in range(current_swaps):
-                        # Document id of the document to be swapped in the source interval
-                        source_doc_id = current_ranking[notrel_doc_swap[k]][0]
-                        # Document id of the document to be swapped in the destination interval
-                        destination_doc_id = current_ranking[rel_doc_swap[k]][0]
-                        # Modify the ranking, move the destination document (not relevant)
-                        modified_ranking[notrel_doc_swap[k]][0] = destination_doc_id
-                        # Modify the ranking, move the source document (relevant)
-                        modified_ranking[rel_doc_swap[k]][0] = source_doc_id
-
-                # 2) Replace documents
-                # Replace documents
-                # If the number of repacements is > 0
-                if current_replacements > 0:
-
-                    # select the not relevant documents to replace
-                    notrel_doc_replace = notrel_doc_rank_source[current_swaps:current_quantity]
-
-                    # replace the documents
-                    for k in range(current_replacements):
-                        # Document id of the document to be replaced in the location interval
-                        # source_doc_id = current_ranking[notrel_doc_replace[k]][0]
-                        # Modify the ranking, replace the non relevant document with a relevant document
-                        modified_ranking[notrel_doc_replace[k]][0] = rel_doc_not_retrieved[k]
-
-            # if there are no relevant documents, there is nothing to do
-            else:
-                if verbose:
-                    print('\tTopic %s: no non-relevant documents in [%i, %i].' % (current_topic_id, source[0], source[1]))
-
-            # Add the modified ranking to the dictionary
-            # for each element of the new ranking
-            for row in modified_ranking:
-                # get the current document id
-                current_doc_id = row[0]
-                # get the current document score
-                current_score = row[1]
-                # add the element (doc_id, score) to the run dictionary
-                # the score has to be converted to float
-                modified_run[current_topic_id][current_doc_id] = float(current_score)
-
-        # 3) Betterworse mode means that:
-        # Swap (better): non relevant documents at the beginning of the ranking (source) are swapped 
-        # with relevant documents at the end of the ranking (destination)
-        # Replacement (worse): relevant documents in the source are replaced with non relevant documents
-        elif (mode == 'betterworse'):
-
-            # For swap I just need to swap source and destination
-            # Check if there are enough documents to move
-            # Number of relevant documents in the destination range
-            num_relevant_destination = numpy.sum(rel_doc_position[destination[0]:(destination[1] + 1)])
-            # Number of not relevant documents in the source
-            num_notrel_source = (source[1] - source[0] + 1) - numpy.sum(rel_doc_position[source[0]:(source[1] + 1)])
-            # Number of relevant documents in the source interval
-            num_relevant_source = numpy.sum(rel_doc_position[source[0]:(source[1] + 1)])
-            
-            # Set the current quantity to the specified quantity
-            current_quantity = quantity
-            # Set the current number of swaps and replacements to the current quantities
-            current_swaps = number_swaps
-            current_replacements = number_replacements
-
-            # Check if there are not relevant documents in the source range
-            # and if there are relevant documents in the source reange
-            if (num_notrel_source > 0) or (num_relevant_source > 0):
-
-                # 1) Check if there are enough relevant documents to be swapped with the non relevant documents
-                if (current_swaps > num_relevant_destination):
-                    if verbose:
-                        print('\tTopic %s: there are less than %i relevant documents in [%i, %i], decrease the number of swaps to %i.' % (current_topic_id, number_swaps, (destination[0] + 1), (destination[1] + 1), num_relevant_destination))
-                    # The number of relevant documents I can move is equal to the number of not relevant documents
-                    current_swaps = num_relevant_destination
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements            
-
-                # 3) Check if there are not enough non-relevant documents to move
-                if (num_notrel_source < current_swaps):
-                    if verbose:
-                        print('\tTopic %s: there are %i non relevant documents in [%i, %i], decrease the number of documents to swap.' % (current_topic_id, num_notrel_source, (source[0] + 1), (source[1] + 1)))
-                    # The maximum number of documents that can be swapped
-                    # corresponds to the number of not relevant documents in the source interval
-                    current_swaps = num_notrel_source
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements
-                    
-                # 3) Check if there are not enough relevant document to replace
-                if (num_relevant_source < current_replacements):
-                    if verbose:
-                        print('\tTopic %s: there are %i relevant documents in [%i, %i], decrease the number of documents to replace.' % (current_topic_id, num_relevant_source, (source[0] + 1), (source[1] + 1)))
-                    # The maximum number of documents that can be replaced
-                    # corresponds to the number of relevant documents
-                    current_replacements = num_relevant_source
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements
-
-                if verbose:
-                    # Print the 'true' number of swaps and replacements
-                    print('\tNumber of Swaps: %i, Number of Replacement: %i'% (current_swaps, current_replacements))
-
-                # Rank positions of non relevant documents (source)
-                notrel_doc_rank_source = notrel_doc_rank[numpy.logical_and(notrel_doc_rank >= source[0], notrel_doc_rank <= source[1])]
-
-                # Get a random shuffle of rank positions of non relevant documents
-                numpy.random.shuffle(notrel_doc_rank_source)
-
-                # Swap documents and replace documents
-                # 1) Start with swap
-                # If the number of swaps is > 0
-                if current_swaps > 0:
-
-                    # select the relevant documents to swap
-                    notrel_doc_swap = notrel_doc_rank_source[0:current_swaps]
-                    # rank positions of relevant documents (destination)
-                    #notrel_doc_rank_destination = notrel_doc_rank[numpy.logical_and(notrel_doc_rank >= destination[0], notrel_doc_rank <= destination[1])]
-                    rel_doc_rank_destination = rel_doc_rank[numpy.logical_and(rel_doc_rank >= destination[0], rel_doc_rank <= destination[1])]
-                    # get a random subset with the size equal to current_quantity
-                    numpy.random.shuffle(rel_doc_rank_destination)
-                    # select the not relevant documents to swap
-                    rel_doc_swap = rel_doc_rank_destination[0:current_swaps]
-
-                    # swap the documents
-                    for k in range(current_swaps):
-                        # Document id of the document to be swapped in the source interval
-                        source_doc_id = current_ranking[notrel_doc_swap[k]][0]
-                        # Document id of the document to be swapped in the destination interval
-                        destination_doc_id = current_ranking[rel_doc_swap[k]][0]
-                        # Modify the ranking, move the destination document (not relevant)
-                        modified_ranking[notrel_doc_swap[k]][0] = destination_doc_id
-                        # Modify the ranking, move the source document (relevant)
-                        modified_ranking[rel_doc_swap[k]][0] = source_doc_id
-
-                # 2) Replace documents
-                # Replace documents
-                # If the number of repacements is > 0
-                if current_replacements > 0:
-                    # Rank positions of relevant documents (source)
-                    rel_doc_rank_source = rel_doc_rank[numpy.logical_and(rel_doc_rank >= source[0], rel_doc_rank <= source[1])]
-                    # Get a random shuffle of rank positions of relevant documents
-                    numpy.random.shuffle(rel_doc_rank_source)
-                    # Select the relevant documents to replace
-                    rel_doc_replace = rel_doc_rank_source[0:current_replacements]
-
-                    # replace the documents
-                    for k in range(current_replacements):
-                        # Document id of the document to be replaced in the location interval
-                        location_doc_id = current_ranking[rel_doc_replace[k]][0]
-                        # Modify the ranking, replace the relevant document with a fake non relevant
-                        modified_ranking[rel_doc_replace[k]][0] = 'fake' + location_doc_id
-
-            # if there are no relevant documents, there is nothing to do
-            else:
-                if verbose:
-                    print('\tTopic %s: no non-relevant documents in [%i, %i].' % (current_topic_id, source[0], source[1]))
-
-            # Add the modified ranking to the dictionary
-            # for each element of the new ranking
-            for row in modified_ranking:
-                # get the current document id
-                current_doc_id = row[0]
-                # get the current document score
-                current_score = row[1]
-                # add the element (doc_id, score) to the run dictionary
-                # the score has to be converted to float
-                modified_run[current_topic_id][current_doc_id] = float(current_score)
-                
-
-        # 4) Worsebetter mode means that:
-        # Swap (worse): relevant documents at the beginning of the ranking (source) are swapped 
-        # with not relevant documents at the end of the ranking (destination)
-        # Replacement (better): not relevant documents in the source are replaced with relevant documents
-        elif (mode == 'worsebetter'):
-
-            # Check if there are enough document to move
-            # Number of relevant documents in the source range
-            num_relevant_source = numpy.sum(rel_doc_position[source[0]:(source[1] + 1)])
-            # Number of not relevant documents in the source
-            num_notrel_source = (source[1] - source[0] + 1) - numpy.sum(rel_doc_position[source[0]:(source[1] + 1)])
-            # Number of not relevant documents in the destination
-            num_notrel_destination = (destination[1] - destination[0] + 1) - numpy.sum(rel_doc_position[destination[0]:(destination[1] + 1)])
-
-            # Set the current quantity to the specified quantity
-            current_quantity = quantity
-            # Set the current number of swaps and replacements to the current quantities
-            current_swaps = number_swaps
-            current_replacements = number_replacements
-            
+        # Get the sorted and assessed ranking of the topic
+        prepared_topic = prepared_run[current_topic_id]
+
+        # Number of swaps and replacements that can be performed on this topic
+        actions = topic_actions(prepared_topic, source, destination, mode, number_swaps, number_replacements, verbose)
+
+        if actions is not None:
+            # Swap and replace documents
+            permutation, replacements = deteriorate_topic(prepared_topic, source, destination, mode, *actions, rng = rng)
+            # Do not store the replacements if no document is replaced
+            if not replacements.any():
+                replacements = None
+            deteriorated_topics[current_topic_id] = (permutation, replacements)
+        elif mode in MODES:
+            # There is nothing to do, the ranking is not modified
+            deteriorated_topics[current_topic_id] = None
 
-            # Check if there are relevant documents in the source range
-            if (num_relevant_source > 0) or (num_notrel_source > 0):
-                
-                # 1) Check if there are enough not relevant documents to be swapped with the relevant documents
-                if (current_swaps > num_notrel_destination):
-                    if verbose:
-                        print('\tTopic %s: there are less than %i not relevant documents in [%i, %i], decrease the number of swaps to %i.' % (current_topic_id, number_swaps, (destination[0] + 1), (destination[1] + 1), num_notrel_destination))
-                    # The number of relevant documents I can move is equal to the number of not relevant documents
-                    current_swaps = num_notrel_destination
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements   
-
-                # 2) Check if there are not enough relevant document to move
-                if (num_relevant_source < current_swaps):
-                    if verbose:
-                        print('\tTopic %s: there are %i relevant documents in [%i, %i], decrease the number of documents to swap.' % (current_topic_id, num_relevant_source, (source[0] + 1), (source[1] + 1)))
-                    # The maximum number of documents that can be moved and replaced
-                    # is the number of relevant documents in the source interval
-                    current_swaps = num_relevant_source
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements
-                
-                # 3) Check if there are enough relevant documents in the source interval
-                if (num_notrel_source < current_replacements):
-                    if verbose:
-                        print('\tTopic %s: there are %i relevant documents in [%i, %i], decrease the number of documents to replace.' % (current_topic_id, num_relevant_source, (source[0] + 1), (source[1] + 1)))
-                    # The maximum number of documents that can be replaced
-                    # corresponds to the number of not relevant documents
-                    current_replacements = num_notrel_source
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements
-                
-                # 4) Check if there are enough relevant documents that were not retrieved
-                # We need to check if we have enough relevant documents (not retrieved) to replace the not relevant ones
-                # rank positions of relevant documents (in the whole ranking) rel_doc_rank
-                # Get doc ids of the relevant documents retreived in the ranking
-                rel_doc_retrieved = [current_ranking[k][0] for k in rel_doc_rank]
-                # List of relevant documents ids in the qrels
-                rel_doc_qrels = [doc_id for doc_id, label in qrels[current_topic_id].items() if label > 0]
-                # List of relevant documents that are not retrieved
-                # Note the the difference between sets is not symmetric
-                # Anyway rel_doc_qrels always includes rel_doc_retrieved
-                rel_doc_not_retrieved = list(set(rel_doc_qrels) - set(rel_doc_retrieved))
-                # Number of relevant documents not retrieved
-                num_rel_doc_not_retrieved = len(rel_doc_not_retrieved)
-                # Check if the number of replacements is smaller than the number relevant not retrieved
-                if (current_replacements > num_rel_doc_not_retrieved):
-                    if verbose:
-                        print('\tTopic %s: there are just %i relevant documents not retrieved. Decrease the number of replacements.' % (current_topic_id, num_rel_doc_not_retrieved))
-                    # Decrease the number of replacements to the greatest possible number
-                    current_replacements = num_rel_doc_not_retrieved
-                    # Update the current quantity
-                    current_quantity = current_swaps + current_replacements
-
-                if verbose:
-                    # Print the 'true' number of swaps and replacements
-                    print('\tNumber of Swaps: %i, Number of Replacement: %i'% (current_swaps, current_replacements))
-
-                # Rank positions of relevant documents (source)
-                rel_doc_rank_source = rel_doc_rank[numpy.logical_and(rel_doc_rank >= source[0], rel_doc_rank <= source[1])]
-                # Get a random shuffle of rank positions of relevant documents
-                numpy.random.shuffle(rel_doc_rank_source)
-
-                # Swap documents and replace documents
-                # 1) Start with swap
-                # If the number of swaps is > 0
-                if current_swaps > 0:
-
-                    # select the relevant documents to swap
-                    rel_doc_swap = rel_doc_rank_source[0:current_swaps]
-
-                    # rank positions of not relevant documents (destination)
-                    notrel_doc_rank_destination = notrel_doc_rank[numpy.logical_and(notrel_doc_rank >= destination[0], notrel_doc_rank <= destination[1])]
-                    # get a random subset with the size equal to current_quantity
-                    numpy.random.shuffle(notrel_doc_rank_destination)
-                    # select the not relevant documents to swap
-                    notrel_doc_swap = notrel_doc_rank_destination[0:current_swaps]
-
-                    # swap the documents
-                    for k in range(current_swaps):
-                        # Document id of the document to be swapped in the source interval
-                        source_doc_id = current_ranking[rel_doc_swap[k]][0]
-                        # Document id of the document to be swapped in the destination interval
-                        destination_doc_id = current_ranking[notrel_doc_swap[k]][0]
-                        # Modify the ranking, move the destination document (not relevant)
-                        modified_ranking[rel_doc_swap[k]][0] = destination_doc_id
-                        # Modify the ranking, move the source document (relevant)
-                        modified_ranking[notrel_doc_swap[k]][0] = source_doc_id
-
-                # 2) Replace documents
-                # Replace documents
-                # If the number of repacements is > 0
-                if current_replacements > 0:
-                    
-                    # Rank positions of non relevant documents (source)
-                    notrel_doc_rank_source = notrel_doc_rank[numpy.logical_and(notrel_doc_rank >= source[0], notrel_doc_rank <= source[1])]
-                    # Get a random shuffle of rank positions of non relevant documents
-                    numpy.random.shuffle(notrel_doc_rank_source)
-                    # select the not relevant documents to replace
-                    notrel_doc_replace = notrel_doc_rank_source[0:current_replacements]
-
-                    # replace the documents
-                    for k in range(current_replacements):
-                        # Document id of the document to be replaced in the location interval
-                        # source_doc_id = current_ranking[notrel_doc_replace[k]][0]
-                        # Modify the ranking, replace the non relevant document with a relevant document
-                        modified_ranking[notrel_doc_replace[k]][0] = rel_doc_not_retrieved[k]
-
-            # if there are no relevant documents, there is nothing to do
-            else:
-                if verbose:
-                    print('\tTopic %s: no relevant documents in [%i, %i].' % (current_topic_id, source[0], source[1]))
-
-            # Add the modified ranking to the dictionary
-            # for each element of the new ranking
-            for row in modified_ranking:
-                # get the current document id
-                current_doc_id = row[0]
-                # get the current document score
-                current_score = row[1]
-                # add the element (doc_id, score) to the run dictionary
-                # the score has to be converted to float
-                modified_run[current_topic_id][current_doc_id] = float(current_score)                
-                
-                
-                
-        
-        
     # topics which do not need to be modified
     for current_topic_id in topic_ids[num_topics_mod:]:
         
         if verbose:
             print('Processing topic: %s - copied' % current_topic_id)
 
-        # Copy the original ranking
-        modified_run[current_topic_id] = run_orig[current_topic_id]
+        # Share the original ranking
+        deteriorated_topics[current_topic_id] = None
+
+    # Compact representation of the modified run
+    deteriorated_run = DeterioratedRun(prepared_run, deteriorated_topics)
+    if compact:
+        return deteriorated_run
     
     # Return the modified run
-    return modified_run
-    
\ No newline at end of file
+    return collections.defaultdict(dict, deteriorated_run.to_dict())
@@ -0,0 +1,168 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import numpy
+
+from deterioration_functions.prepared_run import PreparedRun
+from deterioration_functions.deteriorate_run import prepare_intervals, topic_actions
+from deterioration_functions.deteriorated_run import DeterioratedRun
+
+
+def _prefix_indexes(rows, lengths, offsets):
+    # For each configuration (row) k, enumerate the candidate indexes offsets[k], ..., offsets[k] + lengths[k] - 1
+    # Returns the row of each element, its position in the prefix and its index in the candidate array
+    row_idx = numpy.repeat(rows, lengths)
+    starts = numpy.cumsum(lengths) - lengths
+    prefix_idx = numpy.arange(numpy.sum(lengths)) - numpy.repeat(starts, lengths)
+    candidate_idx = prefix_idx + numpy.repeat(offsets, lengths)
+    return row_idx, prefix_idx, candidate_idx
+
+
+def deteriorate_run_batch(run, qrels, configs, ratio = 1, source = (1, 500), destination = (501, 1000), verbose = False, rng = None):
+    """Deteriorate a run with many configurations in one pass.
+
+    All the configurations share the random subset of topics to modify and, for each topic,
+    the shuffled rank positions of relevant and not relevant documents in the source and
+    destination intervals. Configuration k swaps and replaces the first documents of these
+    shuffled arrays, as deteriorate_run does, so the variants of a topic are nested and
+    computed with a few array operations, instead of one call to deteriorate_run each.
+
+    Args:
+        run: path to the run file in TREC format, or a PreparedRun object
+        qrels: path to the qrels file in TREC format, ignored (it can be None) when run is a PreparedRun
+        configs: list of tuples (number_swaps, number_replacements, mode)
+        ratio: float in [0, 1], percentage of topics to deteriorate
+        source: interval where documents are replaced or taken to be swapped
+        destination: interval where documents are moved when swapped
+        verbose: extra text messages that are printed out
+        rng: numpy.random.Generator shared by all the configurations, None to use the global numpy.random state
+
+    Returns:
+        modified_topics: dictionary, key topic id and value a tuple (permutations, replacements)
+        of int32 arrays with shape (len(configs), ranking length). Row k describes the topic
+        deteriorated with configs[k], with the same encoding used by PreparedTopic.deteriorated_ranking.
+        Topics that are not in the dictionary are not modified.
+    """
+
+    # Check that ratio is a float in [0, 1]
+    if (ratio < 0) or (ratio > 1):
+        print('Ratio should be a number in [0, 1]')
+
+    # Sort source and destination and express the rank positions starting from 0
+    source, destination = prepare_intervals(source, destination)
+
+    # Parse and assess the run, unless it has already been prepared
+    if isinstance(run, PreparedRun):
+        prepared_run = run
+    else:
+        prepared_run = PreparedRun.from_files(run, qrels)
+
+    # Random shuffles are drawn from the given generator or from the global state
+    shuffle = numpy.random.shuffle if rng is None else rng.shuffle
+
+    # Select a random subset of topics to be modified, shared by all the configurations
+    topic_ids = numpy.array(list(prepared_run.run_orig.keys()))
+    shuffle(topic_ids)
+    num_topics_mod = round(numpy.size(topic_ids, 0) * ratio)
+
+    # Modes of the configurations
+    config_modes = numpy.array([mode for _, _, mode in configs])
+
+    modified_topics = {}
+    for current_topic_id in topic_ids[0:num_topics_mod]:
+
+        if verbose:
+            print('Processing topic: %s - modified' % current_topic_id)
+
+        prepared_topic = prepared_run[current_topic_id]
+        ranking_length = len(prepared_topic)
+
+        # Shuffled candidate rank positions, shared by all the configurations
+        rel_doc_rank_source = prepared_topic.relevant_in(source)
+        notrel_doc_rank_source = prepared_topic.not_relevant_in(source)
+        rel_doc_rank_destination = prepared_topic.relevant_in(destination)
+        notrel_doc_rank_destination = prepared_topic.not_relevant_in(destination)
+        for candidates in (rel_doc_rank_source, notrel_doc_rank_source, rel_doc_rank_destination, notrel_doc_rank_destination):
+            shuffle(candidates)
+
+        # Number of swaps and replacements that can be performed with each configuration
+        current_swaps = numpy.zeros(len(configs), dtype = int)
+        current_replacements = numpy.zeros(len(configs), dtype = int)
+        for k, (number_swaps, number_replacements, mode) in enumerate(configs):
+            actions = topic_actions(prepared_topic, source, destination, mode, number_swaps, number_replacements, verbose)
+            if actions is not None:
+                current_swaps[k], current_replacements[k] = actions
+
+        # Stack of permutations and replacements, one row for each configuration
+        permutations = numpy.tile(numpy.arange(ranking_length, dtype = numpy.int32), (len(configs), 1))
+        replacements = numpy.zeros((len(configs), ranking_length), dtype = numpy.int32)
+
+        for mode in numpy.unique(config_modes):
+            # Configurations with this mode
+            rows = numpy.flatnonzero(config_modes == mode)
+
+            # Documents swapped, replaced and what they are replaced with, for each mode
+            if (mode == 'worse'):
+                swap_source, swap_destination = rel_doc_rank_source, notrel_doc_rank_destination
+                replace_source, replace_offsets, fake = rel_doc_rank_source, current_swaps[rows], True
+            elif (mode == 'better'):
+                swap_source, swap_destination = notrel_doc_rank_source, rel_doc_rank_destination
+                replace_source, replace_offsets, fake = notrel_doc_rank_source, current_swaps[rows], False
+            elif (mode == 'betterworse'):
+                swap_source, swap_destination = notrel_doc_rank_source, rel_doc_rank_destination
+                replace_source, replace_offsets, fake = rel_doc_rank_source, numpy.zeros(len(rows), dtype = int), True
+            elif (mode == 'worsebetter'):
+                swap_source, swap_destination = rel_doc_rank_source, notrel_doc_rank_destination
+                replace_source, replace_offsets, fake = notrel_doc_rank_source, numpy.zeros(len(rows), dtype = int), False
+            else:
+                print('Mode %s is not supported.' % mode)
+                continue
+
+            # Swap the first current_swaps candidates of every configuration, all at once
+            row_idx, _, candidate_idx = _prefix_indexes(rows, current_swaps[rows], numpy.zeros(len(rows), dtype = int))
+            permutations[row_idx, swap_source[candidate_idx]] = swap_destination[candidate_idx]
+            permutations[row_idx, swap_destination[candidate_idx]] = swap_source[candidate_idx]
+
+            # Replace the following current_replacements candidates of every configuration, all at once
+            row_idx, prefix_idx, candidate_idx = _prefix_indexes(rows, current_replacements[rows], replace_offsets)
+            replacements[row_idx, replace_source[candidate_idx]] = -1 if fake else prefix_idx + 1
+
+        modified_topics[current_topic_id] = (permutations, replacements)
+
+    return modified_topics
+
+
+def batch_run(prepared_run, modified_topics, index):
+    """One of the runs deteriorated by deteriorate_run_batch.
+
+    Args:
+        prepared_run: PreparedRun object used to deteriorate the run
+        modified_topics: output of deteriorate_run_batch
+        index: index of the configuration in the list of configurations
+
+    Returns:
+        modified_run: DeterioratedRun object, the permutations and replacements are views
+        on the rows of the stacks returned by deteriorate_run_batch. Use to_dict() to get
+        the two level nested dictionary used by pytrec_eval.
+    """
+    topics = {}
+    for topic_id in prepared_run.run_orig:
+        if topic_id in modified_topics:
+            permutations, replacements = modified_topics[topic_id]
+            topics[topic_id] = (permutations[index], replacements[index])
+        else:
+            topics[topic_id] = None
+    return DeterioratedRun(prepared_run, topics)
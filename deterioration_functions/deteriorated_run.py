@@ -0,0 +1,80 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import collections.abc
+
+
+class DeterioratedRun(collections.abc.Mapping):
+    """Deteriorated run stored as permutations of a prepared run.
+
+    A deteriorated ranking only moves and replaces documents of the original ranking,
+    therefore it is stored as an int32 permutation of the rank positions and an int32
+    vector of replacements, instead of a copy of every document id and score.
+    The object is a read-only dictionary-like view with the same format of pytrec_eval:
+    the ranking of a topic is built when the topic is accessed. pytrec_eval and repro_eval
+    need actual dictionaries, use to_dict() before passing the run to them.
+
+    Attributes:
+        prepared_run: PreparedRun object with the original run
+        topics: dictionary, key topic id and value a tuple (permutation, replacements),
+            see PreparedTopic.deteriorated_doc_ids, or None if the topic is not modified
+    """
+
+    def __init__(self, prepared_run, topics):
+        self.prepared_run = prepared_run
+        self.topics = topics
+
+    def __getitem__(self, topic_id):
+        # Raise a KeyError if the topic is not in the run
+        actions = self.topics[topic_id]
+
+        # Topics which are not modified are shared with the original run
+        if actions is None:
+            return self.prepared_run.run_orig[topic_id]
+
+        permutation, replacements = actions
+        return self.prepared_run[topic_id].deteriorated_ranking(permutation, replacements)
+
+    def __iter__(self):
+        return iter(self.topics)
+
+    def __len__(self):
+        return len(self.topics)
+
+    def is_modified(self, topic_id):
+        """True if the ranking of the topic differs from the original one."""
+        return self.topics[topic_id] is not None
+
+    def modified_topics(self):
+        """List of topic ids whose ranking differs from the original one."""
+        return [topic_id for topic_id, actions in self.topics.items() if actions is not None]
+
+    def to_dict(self):
+        """Two level nested dictionary with the format of pytrec_eval.
+
+        Returns:
+            run: on the first level keys are topic ids, on the second level keys are
+            document ids and values are scores. Topics which are not modified are shared
+            with the original run, see PreparedRun.original_ranking.
+        """
+        run = {}
+        for topic_id, actions in self.topics.items():
+            if actions is None:
+                run[topic_id] = self.prepared_run.original_ranking(topic_id)
+            else:
+                permutation, replacements = actions
+                run[topic_id] = self.prepared_run[topic_id].deteriorated_ranking(permutation, replacements)
+        return run
@@ -0,0 +1,222 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import numpy
+
+
+# Same defaults of repro_eval
+TRIM_THRESH = 1000
+PHI = 0.8
+
+
+def count_inversions(values):
+    """Number of inversions in each row of values, with a bottom-up merge sort.
+
+    Args:
+        values: non negative integer array with shape (number of rows, row length)
+
+    Returns:
+        inversions: array with the number of pairs i < j with values[i] > values[j] in each row
+    """
+    values = numpy.asarray(values, dtype = numpy.int64)
+    num_rows, length = values.shape
+    inversions = numpy.zeros(num_rows, dtype = numpy.int64)
+    if length < 2:
+        return inversions
+
+    # Pad the rows to a power of two with increasing values larger than all the others,
+    # they do not add any inversion
+    size = 1 << (length - 1).bit_length()
+    max_value = numpy.max(values) + 1
+    sorted_blocks = numpy.empty((num_rows, size), dtype = numpy.int64)
+    sorted_blocks[:, :length] = values
+    sorted_blocks[:, length:] = max_value + numpy.arange(size - length)
+    value_span = max_value + size
+
+    block = 1
+    while block < size:
+        # Pairs of adjacent sorted blocks, of all the rows
+        pairs = sorted_blocks.reshape(-1, 2, block)
+        num_pairs = len(pairs)
+
+        # Shift each pair by a different offset, so that all the left blocks form a single sorted array
+        offsets = numpy.arange(num_pairs, dtype = numpy.int64)[:, numpy.newaxis] * value_span
+        position = numpy.searchsorted((pairs[:, 0, :] + offsets).ravel(), (pairs[:, 1, :] + offsets).ravel(), side = 'right')
+
+        # For each element of the right block, the number of elements of the left block greater than it
+        left_end = (numpy.arange(1, num_pairs + 1) * block)[:, numpy.newaxis]
+        greater = left_end - position.reshape(num_pairs, block)
+        inversions += numpy.sum(greater.reshape(num_rows, -1), axis = 1)
+
+        # Merge the pairs of blocks
+        sorted_blocks = numpy.sort(pairs.reshape(num_pairs, 2 * block), axis = 1)
+        block *= 2
+
+    return inversions
+
+
+def topic_ktau_union(prepared_topic, permutations, replacements, trim_thresh = TRIM_THRESH):
+    """Kendall's tau Union between the original and many deteriorated rankings of a topic.
+
+    Same as repro_eval: documents of the two rankings are mapped to their index in the
+    sorted union of the two rankings and Kendall's tau is computed between the two
+    sequences of indexes. Documents are distinct within a ranking, so there are no ties
+    and tau is (concordant - discordant) / number of pairs, where the discordant pairs
+    are the inversions of the deteriorated sequence sorted by the original one.
+
+    Args:
+        prepared_topic: PreparedTopic object
+        permutations: integer array with shape (number of rankings, ranking length),
+            see PreparedTopic.deteriorated_doc_ids
+        replacements: integer array with the same shape of permutations, or None
+        trim_thresh: number of documents to compare
+
+    Returns:
+        ktu: array with one value for each ranking, rounded to 14 digits as repro_eval
+    """
+    depth = min(len(prepared_topic), trim_thresh)
+    num_rankings = numpy.shape(permutations)[0]
+    if depth < 2:
+        return numpy.full(num_rankings, numpy.nan)
+
+    # Only the relative order of the doc ids matters, it is given by their keys
+    order = prepared_topic.effective_order(permutations, replacements)[:, :depth]
+    doc_keys = numpy.take_along_axis(prepared_topic.deteriorated_doc_keys(permutations, replacements), order, axis = 1)
+    orig_doc_keys = prepared_topic.doc_id_keys()[:depth]
+
+    # Discordant pairs
+    discordant = count_inversions(doc_keys[:, numpy.argsort(orig_doc_keys)])
+
+    # Same operations of scipy.stats.kendalltau, to get the same floating point result
+    total = (depth * (depth - 1)) // 2
+    tau = (total - 2 * discordant).astype(float) / numpy.sqrt(total) / numpy.sqrt(total)
+    tau = numpy.minimum(1., numpy.maximum(-1., tau))
+    return numpy.round(tau, 14)
+
+
+def topic_rbo(prepared_topic, permutations, replacements, phi = PHI, trim_thresh = TRIM_THRESH):
+    """Rank-Biased Overlap between the original and many deteriorated rankings of a topic.
+
+    Same as the implementation of the TREC Health Misinformation Track used by repro_eval.
+    The overlap at each depth is the number of documents whose rank position, in the
+    worse of the two rankings, is not deeper than depth: it is computed with a cumulative
+    count instead of growing two sets. Sums are sequential, as in repro_eval.
+
+    Args:
+        prepared_topic: PreparedTopic object
+        permutations: see topic_ktau_union
+        replacements: see topic_ktau_union
+        phi: parameter for top-heaviness of the RBO
+        trim_thresh: number of documents to compare
+
+    Returns:
+        rbo: array with one value for each ranking
+    """
+    depth = min(len(prepared_topic), trim_thresh)
+    num_rankings = numpy.shape(permutations)[0]
+
+    # Original rank position of the documents in each deteriorated ranking, in the order used by trec_eval
+    order = prepared_topic.effective_order(permutations, replacements)[:, :depth]
+    orig_position = numpy.take_along_axis(numpy.asarray(permutations), order, axis = 1)
+
+    # Replaced documents and documents below the trimmed original ranking are not shared
+    shared = (orig_position < depth)
+    if replacements is not None:
+        shared &= (numpy.take_along_axis(numpy.asarray(replacements), order, axis = 1) == 0)
+
+    # A shared document is in both rankings from the deeper of its two rank positions
+    rows, positions = numpy.nonzero(shared)
+    first_shared = numpy.maximum(positions, orig_position[rows, positions])
+    overlap = numpy.bincount(rows * trim_thresh + first_shared, minlength = num_rankings * trim_thresh)
+    overlap = numpy.cumsum(overlap.reshape(num_rankings, trim_thresh), axis = 1)
+
+    # Weights phi^i computed by repeated multiplication, as in repro_eval
+    weights = numpy.cumprod(numpy.concatenate(([1.0], numpy.full(trim_thresh - 1, phi))))
+    score = numpy.cumsum(weights * overlap / numpy.arange(1, trim_thresh + 1), axis = 1)[:, -1]
+    normalizer = numpy.cumsum(weights)[-1]
+    return score / normalizer
+
+
+def _run_measure(topic_measure, deteriorated_run, **kwargs):
+    # Apply a per-topic measure to all the topics of a DeterioratedRun
+    prepared_run = deteriorated_run.prepared_run
+    run_measure = {}
+    for topic_id, actions in deteriorated_run.topics.items():
+        prepared_topic = prepared_run[topic_id]
+        if actions is None:
+            permutation, replacements = numpy.arange(len(prepared_topic)), None
+        else:
+            permutation, replacements = actions
+        run_measure[topic_id] = topic_measure(prepared_topic, permutation[numpy.newaxis, :],
+                                              None if replacements is None else replacements[numpy.newaxis, :],
+                                              **kwargs)[0].item()
+    return run_measure
+
+
+def ktau_union(deteriorated_run, trim_thresh = TRIM_THRESH):
+    """Kendall's tau Union between the original run and a deteriorated run, for each topic.
+
+    Args:
+        deteriorated_run: DeterioratedRun object
+        trim_thresh: number of documents to compare
+
+    Returns:
+        ktu: dictionary, key topic id and value KTU, the same of repro_eval ktau_union
+        when the original run is sorted by score, as in run files written by search engines
+    """
+    return _run_measure(topic_ktau_union, deteriorated_run, trim_thresh = trim_thresh)
+
+
+def rbo(deteriorated_run, phi = PHI, trim_thresh = TRIM_THRESH):
+    """Rank-Biased Overlap between the original run and a deteriorated run, for each topic.
+
+    Args:
+        deteriorated_run: DeterioratedRun object
+        phi: parameter for top-heaviness of the RBO
+        trim_thresh: number of documents to compare
+
+    Returns:
+        rbo: dictionary, key topic id and value RBO, the same of repro_eval RBO
+        when the original run is sorted by score, as in run files written by search engines
+    """
+    return _run_measure(topic_rbo, deteriorated_run, phi = phi, trim_thresh = trim_thresh)
+
+
+def batch_measure(topic_measure, prepared_run, modified_topics, num_configs, **kwargs):
+    """Per-topic values of a measure for all the runs deteriorated by deteriorate_run_batch.
+
+    Args:
+        topic_measure: topic_ktau_union or topic_rbo
+        prepared_run: PreparedRun object used to deteriorate the run
+        modified_topics: output of deteriorate_run_batch
+        num_configs: number of configurations passed to deteriorate_run_batch
+        kwargs: extra arguments of topic_measure
+
+    Returns:
+        run_measures: list with a dictionary for each configuration, key topic id and value the measure
+    """
+    topic_values = {}
+    for topic_id in prepared_run.run_orig:
+        prepared_topic = prepared_run[topic_id]
+        if topic_id in modified_topics:
+            permutations, replacements = modified_topics[topic_id]
+            topic_values[topic_id] = topic_measure(prepared_topic, permutations, replacements, **kwargs).tolist()
+        else:
+            # Topics which are not modified have the same value in all the configurations
+            identity = numpy.arange(len(prepared_topic))[numpy.newaxis, :]
+            topic_values[topic_id] = topic_measure(prepared_topic, identity, None, **kwargs).tolist() * num_configs
+
+    return [{topic_id: values[k] for topic_id, values in topic_values.items()} for k in range(num_configs)]
@@ -0,0 +1,188 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+from multiprocessing import Pool
+
+import pandas as pd
+import seaborn as sns
+import matplotlib as plt
+
+from deterioration_functions.quadrant_matrix import build_quadrant_matrix
+
+
+# Style of the heatmap of each result kind:
+# (prefix of the output file, type of color-grading, colorbar label, figure title, min value, max value)
+HEATMAP_KINDS = {
+    'ktu': ('KTU', 'coolwarm', 'KTU', 'Kendall\'s Tau Union', -1, 1),
+    'rbo': ('RBO', 'rocket', 'RBO', 'Rank Biased Overlap', 0, 1),
+    'rmse': ('RMSE', 'rocket_r', 'RMSE', 'RMSE with %s', 0, 1),
+    'nrmse': ('n_RMSE', 'rocket_r', 'n_RMSE', 'Normalized RMSE with %s', 0, 1),
+    'pvalue': ('p_value', 'rocket', 'p-value', 'p-value with %s', None, None),
+}
+# Result kinds with one value for each topic, averaged in the heatmaps, the others have one heatmap for each measure
+TOPIC_KINDS = ('ktu', 'rbo')
+# Proper measure names for figure titles
+MEASURE_NAMES = {'map': 'MAP', 'ndcg': 'nDCG', 'P_10': 'P@10'}
+
+# Figure reused by all the heatmaps drawn by a rendering process
+worker_figure = None
+
+
+def heatmap_file_path(ouput_path, kind, run_name, max_n_iterations, run_type = 'baseline', measure = None):
+    """Path of the pdf file of a heatmap, the same used by the colormap functions."""
+    prefix = HEATMAP_KINDS[kind][0]
+    if kind in TOPIC_KINDS:
+        return ouput_path + '_'.join([prefix, run_name, str(max_n_iterations)]) + '.pdf'
+    return ouput_path + '_'.join([prefix, run_name, run_type, measure, str(max_n_iterations)]) + '.pdf'
+
+
+def draw_heatmap(kind, data_base, max_label, label_step, min_value = None, max_value = None, measure = None, ax = None, cbar_ax = None,
+                 rasterized = False):
+    """Draw the heatmap of a matrix built by build_quadrant_matrix.
+
+    Args:
+        kind: one of HEATMAP_KINDS
+        data_base: numpy array returned by build_quadrant_matrix
+        max_label: maximum value of swap/replacements to be shown as a label
+        label_step: steps for labels in the heatmap
+        min_value: minimum value for the heatmap, None for the range of the data
+        max_value: maximum value for the heatmap, None for the range of the data
+        measure: measure shown in the title, for RMSE, nRMSE and p-values
+        ax: axes where the heatmap is drawn, None for the current axes
+        cbar_ax: axes where the colorbar is drawn, None to take space from ax
+        rasterized: if True, the cells of the heatmap are saved as an image also in vector formats,
+            labels and lines are still vectors; large heatmaps are saved much faster
+
+    Returns:
+        ax: axes with the heatmap
+    """
+    _, colormap, colorbar_label, title, _, _ = HEATMAP_KINDS[kind]
+
+    # Convert the numpy array in a data frame
+    data_base = pd.DataFrame(data_base)
+
+    # Null values will be replaced by white color
+    mask = data_base.isnull()
+
+    # Set the labels to appear in the heatmap
+    xlabels = list(range(-max_label, max_label + 1, label_step))
+    ylabels = list(reversed(range(-max_label, max_label + 1, label_step)))
+
+    # Plot the heatmap with given labels
+    ax = sns.heatmap(data_base, mask = mask, cmap = colormap, vmin = min_value, vmax = max_value,
+                     xticklabels = xlabels, yticklabels = ylabels, cbar_kws = {'label': colorbar_label},
+                     ax = ax, cbar_ax = cbar_ax, rasterized = rasterized)
+    # Set the labels in the correct positions
+    ax.xaxis.set_major_locator(plt.ticker.LinearLocator(numticks = len(xlabels)))
+    ax.yaxis.set_major_locator(plt.ticker.LinearLocator(numticks = len(xlabels)))
+    # Set labels corresponding to ticks
+    ax.set_xticklabels(xlabels)
+    ax.set_yticklabels(ylabels, rotation = 0)
+    # Print horizontal and vertical lines
+    ax.axhline(data_base.shape[0] / 2, color = 'k', linewidth = 0.5)
+    ax.axvline(data_base.shape[1] / 2, color = 'k', linewidth = 0.5)
+
+    # Figure title
+    ax.set_title(title % MEASURE_NAMES[measure] if kind not in TOPIC_KINDS else title)
+    # Set x and y axis labels
+    ax.set_ylabel('Swaps')
+    ax.set_xlabel('Replacements')
+
+    return ax
+
+
+def build_heatmaps(swaps_replacement_values, run_results, measures, run_type = 'baseline'):
+    """Matrices of all the heatmaps of many runs.
+
+    Args:
+        swaps_replacement_values: array with the values of swap/replacements to be used
+        run_results: dictionary, key run name and value a dictionary, key one of HEATMAP_KINDS and
+            value the results of the sweep of the run, e.g. as returned by SweepStore.load
+        measures: measures of the RMSE, nRMSE and p-value heatmaps, use trec_eval names
+        run_type: string, baseline or advanced
+
+    Returns:
+        heatmaps: list of tuples (kind, run_name, measure, data_base), measure is None for KTU and RBO
+    """
+    heatmaps = []
+    for run_name, results in run_results.items():
+        for kind, measure_score in results.items():
+            if kind in TOPIC_KINDS:
+                heatmaps.append((kind, run_name, None, build_quadrant_matrix(swaps_replacement_values, measure_score)))
+            else:
+                for measure in measures:
+                    heatmaps.append((kind, run_name, measure, build_quadrant_matrix(swaps_replacement_values, measure_score, measure, run_type = run_type)))
+    return heatmaps
+
+
+def init_renderer():
+    # Non-interactive backend, figure and axes are created once and cleared for each heatmap
+    global worker_figure
+    plt.use('Agg')
+    import matplotlib.pyplot
+    worker_figure, _ = matplotlib.pyplot.subplots(1, 2, gridspec_kw = {'width_ratios': (20, 1)})
+
+
+def render_heatmap(arguments):
+    """Draw a heatmap on the figure of the process and save it.
+
+    Args:
+        arguments: tuple (heatmap, max_label, label_step, ouput_path, max_n_iterations, run_type, rasterized),
+            heatmap is one of the tuples returned by build_heatmaps
+
+    Returns:
+        ouput_file_path: path of the saved figure
+    """
+    (kind, run_name, measure, data_base), max_label, label_step, ouput_path, max_n_iterations, run_type, rasterized = arguments
+    if worker_figure is None:
+        init_renderer()
+
+    ax, cbar_ax = worker_figure.axes[:2]
+    ax.clear()
+    cbar_ax.clear()
+    _, _, _, _, min_value, max_value = HEATMAP_KINDS[kind]
+    draw_heatmap(kind, data_base, max_label, label_step, min_value, max_value, measure, ax, cbar_ax, rasterized)
+
+    ouput_file_path = heatmap_file_path(ouput_path, kind, run_name, max_n_iterations, run_type, measure)
+    worker_figure.savefig(ouput_file_path, bbox_inches = 'tight')
+    return ouput_file_path
+
+
+def render_heatmaps(heatmaps, swaps_replacement_values, max_label, label_step, ouput_path, run_type = 'baseline', processes = None,
+                    rasterized = False):
+    """Render many heatmaps in parallel, with a non-interactive backend.
+
+    Each process creates a single figure and reuses it for all the heatmaps it draws.
+
+    Args:
+        heatmaps: list returned by build_heatmaps
+        swaps_replacement_values: array with the values of swap/replacements used to build the heatmaps
+        max_label: maximum value of swap/replacements to be shown as a label
+        label_step: steps for labels in the heatmap
+        ouput_path: path to the directory where the figures will be saved
+        run_type: string, baseline or advanced
+        processes: number of rendering processes, None for the number of CPUs, 1 to render in this process
+        rasterized: see draw_heatmap
+
+    Returns:
+        ouput_file_paths: list with the paths of the saved figures
+    """
+    max_n_iterations = swaps_replacement_values[-1]
+    arguments = [(heatmap, max_label, label_step, ouput_path, max_n_iterations, run_type, rasterized) for heatmap in heatmaps]
+    if processes == 1:
+        return list(map(render_heatmap, arguments))
+    with Pool(processes = processes, initializer = init_renderer) as pool:
+        return pool.map(render_heatmap, arguments)
@@ -0,0 +1,113 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import pytrec_eval
+
+from deterioration_functions.deteriorated_run import DeterioratedRun
+from deterioration_functions.prepared_run import PreparedRun
+
+
+def as_dict(ranking):
+    # pytrec_eval needs actual dictionaries, rankings of a TrecRun are read-only views
+    return ranking if isinstance(ranking, dict) else dict(ranking.items())
+
+
+def trim_ranking(ranking, trim_thresh):
+    """Break score ties and keep the first trim_thresh documents, as repro_eval does.
+
+    Args:
+        ranking: dictionary, key document ids and values scores
+        trim_thresh: number of documents to keep
+
+    Returns:
+        ranking: the same dictionary if it is not longer than trim_thresh, otherwise a new
+        dictionary with the first trim_thresh documents, score descending, doc_id descending
+    """
+    if len(ranking) <= trim_thresh:
+        return as_dict(ranking)
+    return dict(sorted(ranking.items(), key = lambda item: (item[1], item[0]), reverse = True)[:trim_thresh])
+
+
+class IncrementalEvaluator(object):
+    """Evaluate deteriorated runs re-evaluating only the modified topics.
+
+    The per-topic scores of the original run are computed once, a deteriorated run is
+    evaluated by re-running pytrec_eval only on the topics that were modified and reusing
+    the original scores for all the others. A single RelevanceEvaluator is built and
+    shared by all the evaluations.
+
+    The original run can be a run parsed by pytrec_eval or the PreparedRun passed to
+    deteriorate_run. A PreparedRun is needed when its run is a TrecRun, e.g. read by
+    PreparedRun.from_files: the deteriorated runs share the dictionaries returned by
+    PreparedRun.original_ranking, not the rankings of the TrecRun.
+
+    Attributes:
+        rel_eval: pytrec_eval.RelevanceEvaluator built on the qrels
+        run_orig: shallow copy of the original run, with the rankings shared by the deteriorated runs
+        run_orig_score: per-topic scores of the original run, as returned by pytrec_eval
+        trim_thresh: rankings are trimmed to this number of documents, as done by
+            RpdEvaluator.trim(), None to evaluate the whole rankings
+    """
+
+    def __init__(self, qrels, run_orig, measures = pytrec_eval.supported_measures, trim_thresh = 1000):
+        self.rel_eval = pytrec_eval.RelevanceEvaluator(qrels, measures)
+        self.trim_thresh = trim_thresh
+        # Keep the references to the original rankings, to recognise the topics which are
+        # shared (not modified) by the deteriorated runs
+        if isinstance(run_orig, PreparedRun):
+            self.run_orig = {topic_id: run_orig.original_ranking(topic_id) for topic_id in run_orig.run_orig}
+        else:
+            self.run_orig = dict(run_orig)
+        self.run_orig_score = self.rel_eval.evaluate(self._trim(self.run_orig))
+
+    def _trim(self, run):
+        if self.trim_thresh is None:
+            return {topic_id: as_dict(ranking) for topic_id, ranking in run.items()}
+        return {topic_id: trim_ranking(ranking, self.trim_thresh) for topic_id, ranking in run.items()}
+
+    def modified_topics(self, deteriorated_run):
+        """Topics of a deteriorated run whose ranking differs from the original one.
+
+        Args:
+            deteriorated_run: DeterioratedRun, or a two level nested dictionary where
+                topics which are not modified are shared with the original run (as returned by deteriorate_run)
+
+        Returns:
+            topic_ids: list of topic ids to re-evaluate
+        """
+        if isinstance(deteriorated_run, DeterioratedRun):
+            return deteriorated_run.modified_topics()
+        return [topic_id for topic_id, ranking in deteriorated_run.items() if ranking is not self.run_orig.get(topic_id)]
+
+    def evaluate(self, deteriorated_run):
+        """Per-topic scores of a deteriorated run.
+
+        Args:
+            deteriorated_run: DeterioratedRun, or a two level nested dictionary where
+                topics which are not modified are shared with the original run (as returned by deteriorate_run)
+
+        Returns:
+            run_score: dictionary with the same format of pytrec_eval.RelevanceEvaluator.evaluate,
+            with topics in the same order of run_orig_score, so that the scores of the
+            original and deteriorated run are paired topic by topic
+        """
+
+        # Evaluate only the modified topics
+        modified_run = {topic_id: deteriorated_run[topic_id] for topic_id in self.modified_topics(deteriorated_run)}
+        modified_score = self.rel_eval.evaluate(self._trim(modified_run)) if modified_run else {}
+
+        # Reuse the scores of the original run for all the other topics
+        return {topic_id: modified_score.get(topic_id, score) for topic_id, score in self.run_orig_score.items()}
@@ -0,0 +1,206 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import numpy
+
+from deterioration_functions.deteriorated_run import DeterioratedRun
+
+
+# Measures used by the heatmaps and the tables
+MEASURES = ('P_10', 'map', 'ndcg')
+
+
+def precision_at(labels, cutoff):
+    """Precision at cutoff of each row of labels, as trec_eval P_cutoff.
+
+    Args:
+        labels: array with shape (number of rankings, ranking length), relevance labels in rank order
+        cutoff: rank position where precision is computed
+
+    Returns:
+        precision: array with one value for each ranking
+    """
+    # Missing rank positions count as not relevant
+    return numpy.sum(labels[:, :cutoff] > 0, axis = 1) / cutoff
+
+
+def average_precision(labels, num_rel):
+    """Average precision of each row of labels, as trec_eval map.
+
+    Args:
+        labels: see precision_at
+        num_rel: number of relevant documents in the qrels
+
+    Returns:
+        average_precision: array with one value for each ranking
+    """
+    if num_rel == 0:
+        return numpy.zeros(labels.shape[0])
+
+    relevant = (labels > 0)
+    # Precision at the rank position of each relevant document
+    precision = numpy.cumsum(relevant, axis = 1) / numpy.arange(1, labels.shape[1] + 1)
+    return numpy.sum(precision * relevant, axis = 1) / num_rel
+
+
+def ndcg(labels, ideal_dcg):
+    """Normalized discounted cumulated gain of each row of labels, as trec_eval ndcg.
+
+    Args:
+        labels: see precision_at, the gain of a document is its relevance label
+        ideal_dcg: discounted cumulated gain of the ideal ranking
+
+    Returns:
+        ndcg: array with one value for each ranking
+    """
+    if ideal_dcg == 0:
+        return numpy.zeros(labels.shape[0])
+
+    gains = numpy.maximum(labels, 0)
+    discounts = numpy.log2(numpy.arange(2, labels.shape[1] + 2))
+    return numpy.sum(gains / discounts, axis = 1) / ideal_dcg
+
+
+class MeasureEvaluator(object):
+    """Evaluate many deteriorated runs at once with NumPy.
+
+    P_10, map and ndcg are computed from the relevance labels of the deteriorated
+    rankings, which are obtained from the permutations and the replacements of the
+    prepared run, without building any dictionary. All the variants of a topic are
+    evaluated with a few array operations. Scores are the ones of pytrec_eval, up to
+    floating point rounding, on rankings trimmed as RpdEvaluator.trim() does.
+
+    Attributes:
+        prepared_run: PreparedRun object with the original run
+        measures: list of measures to compute
+        trim_thresh: rankings are trimmed to this number of documents, None to evaluate the whole rankings
+        num_rel: dictionary, key topic id and value the number of relevant documents in the qrels
+        ideal_dcg: dictionary, key topic id and value the discounted cumulated gain of the ideal ranking
+        run_orig_score: per-topic scores of the original run, with the format of pytrec_eval
+    """
+
+    def __init__(self, prepared_run, measures = MEASURES, trim_thresh = 1000):
+        self.prepared_run = prepared_run
+        self.trim_thresh = trim_thresh
+
+        self.measures = []
+        for measure in measures:
+            if measure in MEASURES:
+                self.measures.append(measure)
+            else:
+                print('Measure %s is not supported.' % measure)
+
+        # Like pytrec_eval, topics without qrels are not evaluated
+        self.num_rel = {}
+        self.ideal_dcg = {}
+        for topic_id in prepared_run.run_orig:
+            if topic_id not in prepared_run.qrels:
+                continue
+            qrels_labels = numpy.array(sorted(prepared_run.qrels[topic_id].values(), reverse = True), dtype = float)
+            self.num_rel[topic_id] = numpy.sum(qrels_labels > 0)
+            self.ideal_dcg[topic_id] = ndcg(qrels_labels[numpy.newaxis, :], 1)[0]
+
+        # The original run is the identity permutation without replacements
+        self.run_orig_score = {}
+        for topic_id in self.num_rel:
+            identity = numpy.arange(len(prepared_run[topic_id]))[numpy.newaxis, :]
+            topic_score = self.evaluate_topic(topic_id, identity, None)
+            self.run_orig_score[topic_id] = {measure: values[0] for measure, values in topic_score.items()}
+
+    def evaluate_topic(self, topic_id, permutations, replacements):
+        """Scores of many deteriorated rankings of a topic.
+
+        Args:
+            topic_id: topic id
+            permutations: integer array with shape (number of rankings, ranking length),
+                see PreparedTopic.deteriorated_doc_ids
+            replacements: integer array with the same shape of permutations, or None
+
+        Returns:
+            topic_score: dictionary, key measure and value a numpy array with one score for each ranking
+        """
+        prepared_topic = self.prepared_run[topic_id]
+
+        # Relevance labels in the order used by trec_eval
+        order = prepared_topic.effective_order(permutations, replacements)
+        if self.trim_thresh is not None:
+            order = order[:, :self.trim_thresh]
+        labels = numpy.take_along_axis(prepared_topic.deteriorated_labels(permutations, replacements), order, axis = 1)
+
+        topic_score = {}
+        for measure in self.measures:
+            if measure == 'P_10':
+                topic_score[measure] = precision_at(labels, 10)
+            elif measure == 'map':
+                topic_score[measure] = average_precision(labels, self.num_rel[topic_id])
+            elif measure == 'ndcg':
+                topic_score[measure] = ndcg(labels, self.ideal_dcg[topic_id])
+        return topic_score
+
+    def evaluate_batch(self, modified_topics, num_configs):
+        """Per-topic scores of all the runs deteriorated by deteriorate_run_batch.
+
+        Args:
+            modified_topics: output of deteriorate_run_batch
+            num_configs: number of configurations passed to deteriorate_run_batch
+
+        Returns:
+            run_scores: list with the scores of each configuration, with the same format of
+            pytrec_eval.RelevanceEvaluator.evaluate and topics in the order of run_orig_score
+        """
+
+        # Evaluate all the variants of each modified topic at once
+        modified_score = {}
+        for topic_id, (permutations, replacements) in modified_topics.items():
+            if topic_id in self.num_rel:
+                modified_score[topic_id] = self.evaluate_topic(topic_id, permutations, replacements)
+
+        run_scores = []
+        for k in range(num_configs):
+            run_score = {}
+            for topic_id, score in self.run_orig_score.items():
+                if topic_id in modified_score:
+                    run_score[topic_id] = {measure: values[k] for measure, values in modified_score[topic_id].items()}
+                else:
+                    run_score[topic_id] = score
+            run_scores.append(run_score)
+        return run_scores
+
+    def evaluate(self, deteriorated_run):
+        """Per-topic scores of a deteriorated run.
+
+        Args:
+            deteriorated_run: DeterioratedRun object built on the same prepared run
+
+        Returns:
+            run_score: dictionary with the same format of pytrec_eval.RelevanceEvaluator.evaluate,
+            with topics in the order of run_orig_score
+        """
+        if not isinstance(deteriorated_run, DeterioratedRun):
+            raise TypeError('deteriorated_run should be a DeterioratedRun, use deteriorate_run with compact = True')
+
+        run_score = {}
+        for topic_id, score in self.run_orig_score.items():
+            actions = deteriorated_run.topics[topic_id]
+            if actions is None:
+                run_score[topic_id] = score
+                continue
+
+            permutation, replacements = actions
+            topic_score = self.evaluate_topic(topic_id, permutation[numpy.newaxis, :],
+                                              None if replacements is None else replacements[numpy.newaxis, :])
+            run_score[topic_id] = {measure: values[0] for measure, values in topic_score.items()}
+        return run_score
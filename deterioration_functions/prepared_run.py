@@ -0,0 +1,340 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import numpy
+import operator
+
+from deterioration_functions.trec_reader import read_run, read_qrels
+
+
+class PreparedTopic(object):
+    """Sorted and assessed ranking of a single topic.
+
+    Attributes:
+        topic_id: topic id
+        ranking: list of tuples (doc_id, score) sorted as trec_eval
+        doc_ids: numpy array with the document ids in rank order
+        scores: numpy array with the document scores in rank order
+        assessed_ranking: numpy array with the relevance label of the document in
+            each rank position, -1 stands for unjudged documents
+        rel_doc_position: vector of 0 and 1, where 1 means relevant and 0 everything else
+        rel_doc_count: cumulative number of relevant documents, element i is the number of
+            relevant documents in the first i rank positions
+        rel_doc_rank: sorted rank positions of relevant documents
+        notrel_doc_rank: sorted rank positions of not relevant documents
+        rel_doc_not_retrieved: list of relevant documents in the qrels that are not retrieved
+        rel_doc_not_retrieved_labels: numpy array with the relevance labels of rel_doc_not_retrieved
+        score_groups: numpy array with the index of the group of tied scores of each rank position
+        has_ties: True if at least two documents have the same score
+    """
+
+    def __init__(self, topic_id, docs, topic_qrels):
+
+        self.topic_id = topic_id
+
+        # Get the list of document ids and scores for the given topic id
+        # This is represented as a list of tuples (doc_id, score)
+        ranking = list(docs.items())
+
+        # Sort the ranking as trec_eval
+        # sort the tuples, score descending, doc_id descending
+        # this is the same ordering used by trec_eval
+        ranking.sort(key = operator.itemgetter(0), reverse = True)         # doc_id descending
+        ranking.sort(key = operator.itemgetter(1), reverse = True)         # score descending
+        self.ranking = ranking
+
+        # Document ids and scores in rank order
+        self.doc_ids = numpy.array([doc_id for doc_id, _ in ranking], dtype = object)
+        self.scores = numpy.array([score for _, score in ranking], dtype = float)
+
+        # Assess the run:
+        # Create a numpy array, where each element corresponds to the relvance label of the document in that rank position
+        # -1 stands for unjudged documents
+        self.assessed_ranking = numpy.array([topic_qrels.get(doc_id, -1) for doc_id, _ in ranking], dtype = float)
+
+        # Find the position of relevant documents in the ranking
+        bool_rel_doc_position = (self.assessed_ranking > 0)
+        # vector of 0 and 1, where 1 means relevant and 0 everything else
+        self.rel_doc_position = bool_rel_doc_position.astype(int)
+        # prefix sums of rel_doc_position, the number of relevant documents in any interval is a difference of two elements
+        self.rel_doc_count = numpy.concatenate(([0], numpy.cumsum(self.rel_doc_position)))
+        # actual rank position of relevant documents
+        self.rel_doc_rank = numpy.argwhere(bool_rel_doc_position)[:, 0]
+        # actual rank position of not relevant documents
+        self.notrel_doc_rank = numpy.argwhere(~bool_rel_doc_position)[:, 0]
+
+        # Relevant documents that were not retrieved, used to replace not relevant documents
+        # Get doc ids of the relevant documents retreived in the ranking
+        rel_doc_retrieved = [ranking[k][0] for k in self.rel_doc_rank]
+        # List of relevant documents ids in the qrels
+        rel_doc_qrels = [doc_id for doc_id, label in topic_qrels.items() if label > 0]
+        # Note the the difference between sets is not symmetric
+        # Anyway rel_doc_qrels always includes rel_doc_retrieved
+        # Sorted, so that the replacements drawn from a random stream do not depend on the hash seed
+        self.rel_doc_not_retrieved = sorted(set(rel_doc_qrels) - set(rel_doc_retrieved))
+        self.rel_doc_not_retrieved_labels = numpy.array([topic_qrels[doc_id] for doc_id in self.rel_doc_not_retrieved], dtype = float)
+
+        # Rank positions with the same score belong to the same group, groups are numbered in rank order
+        # Within a group trec_eval sorts documents by doc_id descending
+        self.score_groups = numpy.concatenate(([0], numpy.cumsum(self.scores[1:] != self.scores[:-1]))).astype(numpy.int64)
+        self.has_ties = (len(ranking) > 0) and (self.score_groups[-1] + 1 < len(ranking))
+        self._doc_id_keys = None
+
+    def __len__(self):
+        return len(self.ranking)
+
+    def num_relevant(self, interval):
+        """Number of relevant documents in the interval [interval[0], interval[1]], rank positions start from 0."""
+        # Rank positions after the end of the ranking contain no relevant document
+        ranking_length = len(self.ranking)
+        start = min(max(int(interval[0]), 0), ranking_length)
+        end = min(max(int(interval[1]) + 1, start), ranking_length)
+        return self.rel_doc_count[end] - self.rel_doc_count[start]
+
+    def num_not_relevant(self, interval):
+        """Number of not relevant documents in the interval [interval[0], interval[1]], rank positions start from 0."""
+        return (interval[1] - interval[0] + 1) - self.num_relevant(interval)
+
+    def relevant_in(self, interval):
+        """Rank positions of relevant documents in the interval, as a new array that can be shuffled."""
+        # The rank positions are sorted, the ones in the interval are a slice
+        start, end = self.rel_doc_rank.searchsorted((interval[0], interval[1] + 1)).tolist()
+        return self.rel_doc_rank[start:end].copy()
+
+    def not_relevant_in(self, interval):
+        """Rank positions of not relevant documents in the interval, as a new array that can be shuffled."""
+        start, end = self.notrel_doc_rank.searchsorted((interval[0], interval[1] + 1)).tolist()
+        return self.notrel_doc_rank[start:end].copy()
+
+    def deteriorated_doc_ids(self, permutation, replacements):
+        """Document ids in rank order of a deteriorated ranking.
+
+        Args:
+            permutation: integer array, element i is the original rank position of
+                the document at rank position i
+            replacements: integer array, element i is 0 if the document at rank position i
+                is not replaced, -1 if it is replaced with a fake not relevant document and
+                k > 0 if it is replaced with the k-th relevant document not retrieved.
+                None if no document is replaced
+
+        Returns:
+            doc_ids: numpy array with the document ids in rank order
+        """
+
+        # Move the documents
+        doc_ids = self.doc_ids[permutation]
+
+        # Nothing else to do if no document is replaced
+        if replacements is None:
+            return doc_ids
+
+        # Fake not relevant documents, the id is the one of the replaced document with the prefix 'fake'
+        fake_doc_position = (replacements < 0)
+        if fake_doc_position.any():
+            doc_ids[fake_doc_position] = 'fake' + doc_ids[fake_doc_position]
+
+        # Relevant documents not retrieved
+        rel_doc_position = (replacements > 0)
+        if rel_doc_position.any():
+            rel_doc_not_retrieved = numpy.array(self.rel_doc_not_retrieved, dtype = object)
+            doc_ids[rel_doc_position] = rel_doc_not_retrieved[replacements[rel_doc_position] - 1]
+
+        return doc_ids
+
+    def deteriorated_ranking(self, permutation, replacements):
+        """Dictionary representation of a deteriorated ranking.
+
+        Documents are moved or replaced, while each rank position keeps its original score.
+
+        Args:
+            permutation: see deteriorated_doc_ids
+            replacements: see deteriorated_doc_ids
+
+        Returns:
+            ranking: dictionary, key document ids and values scores
+        """
+        return dict(zip(self.deteriorated_doc_ids(permutation, replacements).tolist(), self.scores.tolist()))
+
+    def deteriorated_labels(self, permutations, replacements):
+        """Relevance labels in rank order of one or many deteriorated rankings.
+
+        Args:
+            permutations: integer array, a permutation (see deteriorated_doc_ids) or a
+                stack of permutations with one row for each deteriorated ranking
+            replacements: integer array with the same shape of permutations, or None
+
+        Returns:
+            labels: numpy array with the same shape of permutations, -1 stands for unjudged
+            documents, fake documents are unjudged
+        """
+        labels = self.assessed_ranking[permutations]
+        if replacements is None:
+            return labels
+
+        labels[replacements < 0] = -1
+        rel_doc_position = (replacements > 0)
+        labels[rel_doc_position] = self.rel_doc_not_retrieved_labels[replacements[rel_doc_position] - 1]
+        return labels
+
+    def doc_id_keys(self):
+        """Integer keys that sort as the document ids that can appear in a deteriorated ranking.
+
+        Returns:
+            keys: numpy array, the first len(self) elements are the keys of doc_ids, the following
+            len(self) are the keys of the fake documents 'fake' + doc_ids and the last ones are
+            the keys of rel_doc_not_retrieved
+        """
+        # Computed once, only for the topics that need to break score ties
+        if self._doc_id_keys is None:
+            doc_ids = numpy.concatenate((self.doc_ids, 'fake' + self.doc_ids, numpy.array(self.rel_doc_not_retrieved, dtype = object)))
+            _, self._doc_id_keys = numpy.unique(doc_ids, return_inverse = True)
+        return self._doc_id_keys
+
+    def deteriorated_doc_keys(self, permutations, replacements):
+        """Keys of the documents in rank order of one or many deteriorated rankings.
+
+        Args:
+            permutations: see deteriorated_labels
+            replacements: see deteriorated_labels
+
+        Returns:
+            doc_keys: integer array with the same shape of permutations, see doc_id_keys
+        """
+        ranking_length = len(self)
+        keys = self.doc_id_keys()
+        doc_keys = keys[permutations]
+        if replacements is not None:
+            fake_doc_position = (replacements < 0)
+            doc_keys[fake_doc_position] = keys[ranking_length + permutations[fake_doc_position]]
+            rel_doc_position = (replacements > 0)
+            doc_keys[rel_doc_position] = keys[2 * ranking_length + replacements[rel_doc_position] - 1]
+        return doc_keys
+
+    def effective_order(self, permutations, replacements):
+        """Rank positions of one or many deteriorated rankings in the order used by trec_eval.
+
+        A deteriorated ranking keeps the original scores in each rank position, but documents
+        with the same score are sorted by doc_id descending by trec_eval, pytrec_eval and
+        repro_eval. Moved and replaced documents can therefore change order within the ties.
+
+        Args:
+            permutations: see deteriorated_labels
+            replacements: see deteriorated_labels
+
+        Returns:
+            order: integer array with the same shape of permutations, element i (of each row)
+            is the rank position of the document ranked i-th by trec_eval
+        """
+        if not self.has_ties:
+            return numpy.broadcast_to(numpy.arange(len(self)), numpy.shape(permutations))
+
+        # Sort by group of tied scores and then by doc_id descending
+        num_keys = len(self.doc_id_keys())
+        doc_keys = self.deteriorated_doc_keys(permutations, replacements)
+        return numpy.argsort(self.score_groups * num_keys + (num_keys - 1 - doc_keys), axis = -1, kind = 'stable')
+
+
+def swap_documents(permutation, first_positions, second_positions):
+    """Swap the documents in two sets of rank positions with a single array operation.
+
+    Args:
+        permutation: integer array, element i is the original rank position of the
+            document at rank position i, modified in place
+        first_positions: rank positions of the documents to swap
+        second_positions: rank positions of the documents to swap with, paired
+            element by element with first_positions
+    """
+    # Fancy indexing on the right-hand side returns copies, so the swap is safe
+    permutation[first_positions], permutation[second_positions] = permutation[second_positions], permutation[first_positions]
+
+
+class PreparedRun(object):
+    """Run and qrels parsed and assessed once, to be deteriorated many times.
+
+    Parsing the run and the qrels, sorting every topic and assessing the rankings
+    does not depend on the deterioration parameters, therefore a sweep over many
+    parameters can prepare the run once and pass it to deteriorate_run.
+
+    Attributes:
+        run_orig: the run as parsed by pytrec_eval, a two level nested dictionary
+            where on the first level keys are topic ids, on the second level keys
+            are document ids and values are scores, or a TrecRun with the same format
+        qrels: the qrels as parsed by pytrec_eval
+        topics: dictionary, key topic id and value PreparedTopic
+    """
+
+    def __init__(self, run_orig, qrels):
+        self.run_orig = run_orig
+        self.qrels = qrels
+        # Dictionaries of the original rankings of a TrecRun, built once, see original_ranking
+        self._original_rankings = {}
+
+        # Sort and assess each topic of the run
+        self.topics = {}
+        for topic_id, docs in run_orig.items():
+            self.topics[topic_id] = PreparedTopic(topic_id, docs, qrels.get(topic_id, {}))
+
+    @classmethod
+    def from_files(cls, run_file_path, qrels_file_path, vocabulary = None):
+        """Parse and prepare a run and a qrels file in TREC format.
+
+        Args:
+            run_file_path: path to the run file in TREC format
+            qrels_file_path: path to the qrels file in TREC format
+            vocabulary: DocVocabulary shared with other runs, None to create a new one
+
+        Returns:
+            prepared_run: a PreparedRun object
+        """
+
+        # Import the run
+        # The run is a nested dictionary with: key: topic ids, value: a dictionary
+        # The nested dictionary has: key: doc ids, value: doc scores
+        # Rankings are stored as arrays of interned doc ids, see TrecRun
+        run_orig = read_run(run_file_path, vocabulary)
+
+        # Import the qrels
+        # The qrels is a nested dictionary with: key: topic ids, value: a dictionary
+        # The nested dictionary has: key: doc ids, value: relevance labels
+        qrels = read_qrels(qrels_file_path)
+
+        return cls(run_orig, qrels)
+
+    def __getitem__(self, topic_id):
+        return self.topics[topic_id]
+
+    def __len__(self):
+        return len(self.topics)
+
+    def original_ranking(self, topic_id):
+        """Original ranking of a topic as a dictionary, the same object at every call.
+
+        Deteriorated runs share this dictionary for the topics which are not modified,
+        so that IncrementalEvaluator recognises them. The rankings of a TrecRun are
+        copied into a dictionary the first time they are requested.
+
+        Args:
+            topic_id: id of the topic
+
+        Returns:
+            ranking: dictionary, key document ids and values scores
+        """
+        ranking = self.run_orig[topic_id]
+        if isinstance(ranking, dict):
+            return ranking
+        if topic_id not in self._original_rankings:
+            self._original_rankings[topic_id] = dict(ranking.items())
+        return self._original_rankings[topic_id]
@@ -0,0 +1,78 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+from itertools import chain
+from operator import itemgetter
+
+import numpy
+
+
+# Modes in the order their quadrants are written: on the axes, where two quadrants share
+# a row or a column, the later mode wins, as in the original nested loops
+QUADRANT_MODES = ('better', 'worse', 'betterworse', 'worsebetter')
+
+
+def build_quadrant_matrix(swaps_replacement_values, results, measure = None, reducer = numpy.mean, run_type = 'baseline'):
+    """Matrix shown in the heatmaps and in the tables, with one quadrant for each mode.
+
+    Rows are swaps, from +max (top) to -max (bottom), columns are replacements, from -max
+    (left) to +max (right): 'better' is the top right quadrant, 'worse' the bottom left,
+    'betterworse' the top left and 'worsebetter' the bottom right.
+
+    The values of all the cells are gathered in a single array with shape
+    (modes, swaps, replacements, keys), reduced over the keys and copied into the
+    quadrants with slices, instead of filling the matrix one cell at a time.
+
+    Args:
+        swaps_replacement_values: array with the values of swaps/replacements to be used
+        results: dictionary, key (number_swaps, number_replacements, mode) and value a
+            dictionary, key run_type and value a dictionary with the per-topic or per-measure values
+        measure: key of the value to show, e.g. a trec_eval measure for RMSE, nRMSE and p-values,
+            None to reduce the values of all the keys, e.g. the topics for KTU and RBO
+        reducer: function reducing an array along axis = -1, used when measure is None
+        run_type: string, baseline or advanced
+
+    Returns:
+        data_base: numpy array with shape (2 * len(swaps_replacement_values) - 1, 2 * len(swaps_replacement_values) - 1)
+    """
+    n_iterations = len(swaps_replacement_values)
+
+    cells = [(number_swaps, number_replacements, mode)
+             for mode in QUADRANT_MODES
+             for number_swaps in swaps_replacement_values
+             for number_replacements in swaps_replacement_values]
+
+    if measure is not None:
+        quadrants = numpy.fromiter((results[cell].get(run_type)[measure] for cell in cells), dtype = float, count = len(cells))
+        quadrants = quadrants.reshape(len(QUADRANT_MODES), n_iterations, n_iterations)
+    else:
+        # Keys of the first cell, e.g. the list of topics, all the values are read in a single pass
+        keys = list(results[cells[0]].get(run_type).keys())
+        get_values = itemgetter(*keys) if len(keys) > 1 else (lambda values: (values[keys[0]], ))
+        values = numpy.fromiter(chain.from_iterable(get_values(results[cell].get(run_type)) for cell in cells),
+                                dtype = float, count = len(cells) * len(keys))
+        quadrants = reducer(values.reshape(len(QUADRANT_MODES), n_iterations, n_iterations, len(keys)), axis = -1)
+    better, worse, betterworse, worsebetter = quadrants
+
+    # Quadrants, indexed by (swap_idx, replacement_idx), mirrored to their position in the matrix
+    size = (n_iterations * 2) - 1
+    data_base = numpy.full((size, size), numpy.nan)
+    data_base[:n_iterations, n_iterations - 1:] = better[::-1, :]
+    data_base[n_iterations - 1:, :n_iterations] = worse[:, ::-1]
+    data_base[:n_iterations, :n_iterations] = betterworse[::-1, ::-1]
+    data_base[n_iterations - 1:, n_iterations - 1:] = worsebetter
+
+    return data_base
@@ -0,0 +1,127 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import numpy
+
+from deterioration_functions import document_order
+from deterioration_functions.deteriorate_run import prepare_intervals, topic_actions, deteriorate_topic
+from deterioration_functions.deteriorated_run import DeterioratedRun
+
+
+class RatioSweep(object):
+    """Deteriorate a run for increasing ratios of topics, deteriorating and evaluating each topic once.
+
+    A single random order of the topics is drawn, ratio r deteriorates the first round(n * r)
+    topics of this order. The run of a larger ratio extends the run of the previous one, only
+    the topics added to the prefix are deteriorated and evaluated, therefore a whole axis of
+    ratios costs about as much as deteriorating all the topics once. With the same random
+    generator, the run of each ratio is the same returned by deteriorate_run with that ratio.
+
+    Attributes:
+        prepared_run: PreparedRun object with the original run
+        evaluator: MeasureEvaluator of the original run
+        source: sorted source interval, rank positions start from 0
+        destination: sorted destination interval, rank positions start from 0
+        mode: tipe of swaps and replacements to be performed {worse, better, betterworse, worsebetter}
+        number_swaps: number of swaps to perform
+        number_replacements: number of replacements to perform
+        topic_ids: topic ids in the random order in which they are deteriorated
+        num_topics_mod: number of topics deteriorated so far
+        topics: dictionary, key topic id and value the actions on the topic, see DeterioratedRun
+        run_score: per-topic scores of the run deteriorated so far, see MeasureEvaluator.evaluate
+        ktu: dictionary, key topic id and value KTU of the run deteriorated so far
+        rbo: dictionary, key topic id and value RBO of the run deteriorated so far
+    """
+
+    def __init__(self, prepared_run, evaluator, source, destination, mode, number_swaps, number_replacements, verbose = False, rng = None):
+        self.prepared_run = prepared_run
+        self.evaluator = evaluator
+        # Sort source and destination and express the rank positions starting from 0
+        self.source, self.destination = prepare_intervals(source, destination)
+        self.mode = mode
+        self.number_swaps = number_swaps
+        self.number_replacements = number_replacements
+        self.verbose = verbose
+        self.rng = rng
+
+        # Random order of the topics, drawn as in deteriorate_run
+        self.topic_ids = numpy.array(list(prepared_run.run_orig.keys()))
+        shuffle = numpy.random.shuffle if rng is None else rng.shuffle
+        shuffle(self.topic_ids)
+        self.num_topics_mod = 0
+
+        # No topic is deteriorated yet: the scores are the ones of the original run
+        self.topics = {topic_id: None for topic_id in self.topic_ids}
+        self.run_score = dict(evaluator.run_orig_score)
+        original_run = DeterioratedRun(prepared_run, self.topics)
+        self.ktu = document_order.ktau_union(original_run)
+        self.rbo = document_order.rbo(original_run)
+
+    def extend(self, ratio):
+        """Deteriorate and evaluate the topics added to the prefix by a larger ratio.
+
+        Args:
+            ratio: float in [0, 1], percentage of topics to deteriorate, not smaller than
+                the ratios of the previous calls
+
+        Returns:
+            deteriorated_run: DeterioratedRun object, the run deteriorated with ratio
+            run_score: per-topic scores of deteriorated_run, see MeasureEvaluator.evaluate
+            ktu: dictionary, key topic id and value KTU
+            rbo: dictionary, key topic id and value RBO
+        """
+        # Check that ratio is a float in [0, 1]
+        if (ratio < 0) or (ratio > 1):
+            print('Ratio should be a number in [0, 1]')
+
+        num_topics_mod = round(numpy.size(self.topic_ids, 0) * ratio)
+        if num_topics_mod < self.num_topics_mod:
+            raise ValueError('Ratios of a ratio sweep should be increasing.')
+
+        for current_topic_id in self.topic_ids[self.num_topics_mod:num_topics_mod]:
+
+            if self.verbose:
+                print('Processing topic: %s - modified' % current_topic_id)
+
+            prepared_topic = self.prepared_run[current_topic_id]
+
+            # Number of swaps and replacements that can be performed on this topic
+            actions = topic_actions(prepared_topic, self.source, self.destination, self.mode,
+                                    self.number_swaps, self.number_replacements, self.verbose)
+            if actions is None:
+                # There is nothing to do, the ranking is not modified
+                continue
+
+            # Swap and replace documents
+            permutation, replacements = deteriorate_topic(prepared_topic, self.source, self.destination, self.mode, *actions, rng = self.rng)
+            # Do not store the replacements if no document is replaced
+            if not replacements.any():
+                replacements = None
+            self.topics[current_topic_id] = (permutation, replacements)
+
+            # Evaluate only this topic, the scores of the other topics do not change
+            permutations = permutation[numpy.newaxis, :]
+            replacements = None if replacements is None else replacements[numpy.newaxis, :]
+            if current_topic_id in self.evaluator.num_rel:
+                topic_score = self.evaluator.evaluate_topic(current_topic_id, permutations, replacements)
+                self.run_score[current_topic_id] = {measure: values[0] for measure, values in topic_score.items()}
+            self.ktu[current_topic_id] = document_order.topic_ktau_union(prepared_topic, permutations, replacements)[0].item()
+            self.rbo[current_topic_id] = document_order.topic_rbo(prepared_topic, permutations, replacements)[0].item()
+
+        self.num_topics_mod = num_topics_mod
+
+        # Copies, the next calls modify the attributes
+        return DeterioratedRun(self.prepared_run, dict(self.topics)), dict(self.run_score), dict(self.ktu), dict(self.rbo)
@@ -0,0 +1,242 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import collections.abc
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy
+
+from deterioration_functions.trec_reader import DocVocabulary, TrecRun, read_run
+
+
+# First bytes of an archive, followed by the position of the header (uint64, little endian)
+MAGIC = b'RUNARCH1'
+PREFIX = struct.Struct('<8sQ')
+DOC_KEY_DTYPE = numpy.dtype('<i4')
+SCORE_DTYPE = numpy.dtype('<f8')
+OFFSET_DTYPE = numpy.dtype('<i8')
+
+
+def _pad(f_out, alignment = 8):
+    # Align the next section, so that it can be read as an array
+    f_out.write(b'\0' * (-f_out.tell() % alignment))
+
+
+def pack_runs(run_file_paths, archive_path, run_names = None):
+    """Pack many runs in TREC format into a single binary archive.
+
+    The archive contains, one after the other: the int32 document keys of all the rankings,
+    the float64 scores of all the rankings, the offsets of each ranking (run, topic) in these
+    two arrays, the document ids vocabulary and a JSON header with the run names, the topic ids
+    and the position of each section. Runs are read one at a time, document keys are written
+    to the archive and scores to a temporary file while reading, so the runs are never all in memory.
+
+    Args:
+        run_file_paths: list of paths of the run files
+        archive_path: path of the archive to write
+        run_names: names of the runs in the archive, None for the names of the run files
+
+    Returns:
+        num_docs: number of (topic, document) pairs written
+    """
+    if run_names is None:
+        run_names = [os.path.basename(path) for path in run_file_paths]
+    if len(set(run_names)) != len(run_names):
+        raise ValueError('Run names in an archive should be unique.')
+
+    vocabulary = DocVocabulary()
+    topic_ids = {}
+    # Offsets of the rankings of each run: dictionary, key topic id and value (start, end)
+    run_offsets = []
+    num_docs = 0
+
+    archive_dir = os.path.dirname(os.path.abspath(archive_path))
+    with open(archive_path, 'wb') as f_out, tempfile.TemporaryFile(dir = archive_dir) as f_scores:
+        f_out.write(PREFIX.pack(MAGIC, 0))
+        _pad(f_out)
+        doc_keys_start = f_out.tell()
+
+        for run_file_path in run_file_paths:
+            run = read_run(run_file_path, vocabulary)
+            topic_offsets = {}
+            for topic_id, doc_keys in run.doc_keys.items():
+                topic_ids.setdefault(topic_id, len(topic_ids))
+                f_out.write(doc_keys.astype(DOC_KEY_DTYPE).tobytes())
+                f_scores.write(run.scores[topic_id].astype(SCORE_DTYPE).tobytes())
+                topic_offsets[topic_id] = (num_docs, num_docs + len(doc_keys))
+                num_docs += len(doc_keys)
+            run_offsets.append(topic_offsets)
+
+        # Scores
+        _pad(f_out)
+        scores_start = f_out.tell()
+        f_scores.seek(0)
+        shutil.copyfileobj(f_scores, f_out)
+
+        # Offsets of the rankings, one row for each run and two columns (start, end) for each topic,
+        # topics which are not in a run have start = end = -1
+        _pad(f_out)
+        offsets_start = f_out.tell()
+        offsets = numpy.full((len(run_names), len(topic_ids), 2), -1, dtype = OFFSET_DTYPE)
+        for run_index, topic_offsets in enumerate(run_offsets):
+            for topic_id, (start, end) in topic_offsets.items():
+                offsets[run_index, topic_ids[topic_id]] = (start, end)
+        f_out.write(offsets.tobytes())
+
+        # Vocabulary: utf-8 document ids one after the other and the offset of each of them
+        encoded = [doc_id.encode('utf-8') for doc_id in vocabulary.doc_ids]
+        vocabulary_offsets = numpy.zeros(len(encoded) + 1, dtype = OFFSET_DTYPE)
+        numpy.cumsum([len(doc_id) for doc_id in encoded], out = vocabulary_offsets[1:])
+        _pad(f_out)
+        vocabulary_offsets_start = f_out.tell()
+        f_out.write(vocabulary_offsets.tobytes())
+        vocabulary_start = f_out.tell()
+        f_out.write(b''.join(encoded))
+
+        # Header
+        header = {'runs': list(run_names),
+                  'topics': list(topic_ids),
+                  'num_docs': num_docs,
+                  'vocabulary_size': len(encoded),
+                  'doc_keys': doc_keys_start,
+                  'scores': scores_start,
+                  'offsets': offsets_start,
+                  'vocabulary_offsets': vocabulary_offsets_start,
+                  'vocabulary': vocabulary_start}
+        header_start = f_out.tell()
+        f_out.write(json.dumps(header).encode('utf-8'))
+        f_out.seek(0)
+        f_out.write(PREFIX.pack(MAGIC, header_start))
+
+    return num_docs
+
+
+class ArchiveVocabulary(object):
+    """Vocabulary of an archive, document ids are decoded from the memory-mapped file when needed.
+
+    Same interface of DocVocabulary, the dictionary from document ids to keys is only
+    built if a ranking is looked up by document id.
+    """
+
+    def __init__(self, buffer, offsets, start):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.start = start
+        self._doc_ids = None
+        self._keys = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def doc_ids(self):
+        if self._doc_ids is None:
+            self._doc_ids = self.lookup(numpy.arange(len(self)))
+        return self._doc_ids
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            self._keys = {doc_id: key for key, doc_id in enumerate(self.doc_ids)}
+        return self._keys
+
+    def lookup(self, keys):
+        """Document ids of many keys, as a list."""
+        if self._doc_ids is not None:
+            doc_ids = self._doc_ids
+            return [doc_ids[key] for key in keys.tolist()]
+        buffer = self.buffer
+        starts = (self.start + self.offsets[keys]).tolist()
+        ends = (self.start + self.offsets[keys + 1]).tolist()
+        return [str(buffer[start:end], 'utf-8') for start, end in zip(starts, ends)]
+
+
+class RunArchive(collections.abc.Mapping):
+    """Memory-mapped archive of many runs written by pack_runs.
+
+    The object is a read-only dictionary, key run name and value a TrecRun whose rankings
+    are slices of the memory-mapped arrays: opening a run does not read or parse any text,
+    pages of the file are loaded by the operating system when the rankings are accessed.
+
+    Attributes:
+        path: path of the archive
+        run_names: list of run names, in the order they were packed
+        topic_ids: list of the topic ids of all the runs
+        vocabulary: ArchiveVocabulary shared by all the runs
+        doc_keys: int32 array with the document keys of all the rankings
+        scores: float64 array with the scores of all the rankings
+        offsets: int64 array with shape (runs, topics, 2), start and end of each ranking
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f_in:
+            magic, header_start = PREFIX.unpack(f_in.read(PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError('%s is not a run archive.' % path)
+            self._mmap = mmap.mmap(f_in.fileno(), 0, access = mmap.ACCESS_READ)
+        header = json.loads(self._mmap[header_start:])
+
+        self.run_names = header['runs']
+        self.topic_ids = header['topics']
+        self._run_index = {run_name: index for index, run_name in enumerate(self.run_names)}
+        num_docs = header['num_docs']
+        vocabulary_size = header['vocabulary_size']
+
+        # Zero-copy views of the sections
+        self.doc_keys = numpy.frombuffer(self._mmap, DOC_KEY_DTYPE, num_docs, header['doc_keys'])
+        self.scores = numpy.frombuffer(self._mmap, SCORE_DTYPE, num_docs, header['scores'])
+        self.offsets = numpy.frombuffer(self._mmap, OFFSET_DTYPE, len(self.run_names) * len(self.topic_ids) * 2,
+                                        header['offsets']).reshape(len(self.run_names), len(self.topic_ids), 2)
+        vocabulary_offsets = numpy.frombuffer(self._mmap, OFFSET_DTYPE, vocabulary_size + 1, header['vocabulary_offsets'])
+        self.vocabulary = ArchiveVocabulary(self._mmap, vocabulary_offsets, header['vocabulary'])
+
+    def close(self):
+        self.doc_keys = self.scores = self.offsets = self.vocabulary = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Runs returned by the archive are still in use, the file is unmapped when they are released
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getitem__(self, run_name):
+        """Run of the archive as a TrecRun, without copying the rankings."""
+        run_offsets = self.offsets[self._run_index[run_name]]
+        doc_keys = {}
+        scores = {}
+        for topic_id, (start, end) in zip(self.topic_ids, run_offsets.tolist()):
+            if start < 0:
+                continue
+            doc_keys[topic_id] = self.doc_keys[start:end]
+            scores[topic_id] = self.scores[start:end]
+        return TrecRun(self.vocabulary, doc_keys, scores)
+
+    def __iter__(self):
+        return iter(self.run_names)
+
+    def __len__(self):
+        return len(self.run_names)
@@ -0,0 +1,391 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import sqlite3
+
+import numpy
+
+
+# Results computed for each cell of a sweep, with the names used for the pickle files
+RESULT_KINDS = ('ktu', 'rbo', 'rmse', 'nrmse', 'pvalue')
+# Results with one value for each topic, the others have one value for each measure
+TOPIC_KINDS = ('ktu', 'rbo')
+# Results of the sweeps are computed for the baseline run
+RUN_TYPE = 'baseline'
+# Standard errors of the results of sweeps with many repetitions of each cell, stored as
+# results of kind 'ktu_se', 'rbo_se', ... next to the means
+STANDARD_ERROR_SUFFIX = '_se'
+STANDARD_ERROR_KINDS = tuple(kind + STANDARD_ERROR_SUFFIX for kind in RESULT_KINDS)
+# Source and destination intervals of the original sweeps, their results are stored with the name of the run
+DEFAULT_PLACEMENT = ((1, 500), (501, 1000))
+
+
+def _is_topic_kind(kind):
+    # KTU and RBO, and their standard errors, have one value for each topic
+    if kind.endswith(STANDARD_ERROR_SUFFIX):
+        kind = kind[:-len(STANDARD_ERROR_SUFFIX)]
+    return kind in TOPIC_KINDS
+
+
+def placement_run_name(run_name, source, destination, ratio = 1):
+    """Name under which the results of a run are stored for a placement of the swaps and replacements.
+
+    Args:
+        run_name: name of the run
+        source: interval where documents are replaced or taken to be swapped, rank positions start from 1
+        destination: interval where documents are moved when swapped, rank positions start from 1
+        ratio: percentage of topics deteriorated
+
+    Returns:
+        run_name: the name of the run for DEFAULT_PLACEMENT, e.g. 'BM25', otherwise the
+        name of the run followed by the intervals, e.g. 'BM25@1-5:6-10'. Ratios
+        smaller than 1 are added at the end, e.g. 'BM25_ratio0.5' or 'BM25@1-5:6-10_ratio0.5'
+    """
+    source, destination = tuple(int(rank) for rank in source), tuple(int(rank) for rank in destination)
+    if (source, destination) != DEFAULT_PLACEMENT:
+        run_name = '%s@%d-%d:%d-%d' % ((run_name, ) + source + destination)
+    if ratio != 1:
+        run_name = '%s_ratio%g' % (run_name, ratio)
+    return run_name
+
+
+class SweepStore(object):
+    """Results of sweeps stored in long format in a SQLite database.
+
+    Each value is a row (run, swaps, replacements, mode, kind, topic, measure, value),
+    where kind is one of RESULT_KINDS, or one of STANDARD_ERROR_KINDS for sweeps with many
+    repetitions of each cell. KTU and RBO have one row for each topic and an empty
+    measure, RMSE, nRMSE and p-values have one row for each measure and an empty topic.
+    Rows are clustered by (run, kind, measure), therefore reading the values for one
+    heatmap reads only the pages of that run, kind and measure.
+
+    Each finished cell, a tuple (number_swaps, number_replacements, mode), is committed
+    to disk: an interrupted sweep can be resumed skipping the cells that are already done,
+    and results can be read while the sweep is still running. The database uses
+    write-ahead logging, readers do not block the sweep. Many runs can share a database.
+    Results of other placements of the swaps and replacements are stored under the run
+    names returned by placement_run_name, see placement.
+
+    Attributes:
+        path: path to the database file
+        run_name: name of the run whose results are read and written
+        connection: sqlite3 connection
+    """
+
+    def __init__(self, path, run_name, connection = None):
+        self.path = path
+        self.run_name = run_name
+        if connection is not None:
+            # Another store of the same database, see placement
+            self.connection = connection
+            return
+        self.connection = sqlite3.connect(path, timeout = 60)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results ('
+                                'run TEXT, kind TEXT, measure TEXT, swaps INTEGER, replacements INTEGER, mode TEXT, topic TEXT, value REAL, '
+                                'PRIMARY KEY (run, kind, measure, swaps, replacements, mode, topic)) WITHOUT ROWID')
+        # Cells whose results are complete
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cells ('
+                                'run TEXT, swaps INTEGER, replacements INTEGER, mode TEXT, '
+                                'PRIMARY KEY (run, swaps, replacements, mode)) WITHOUT ROWID')
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def placement(self, source, destination, ratio = 1):
+        """Store of the results of the same run with another placement, sharing the connection of this store.
+
+        Args:
+            source: interval where documents are replaced or taken to be swapped, rank positions start from 1
+            destination: interval where documents are moved when swapped, rank positions start from 1
+            ratio: percentage of topics deteriorated
+
+        Returns:
+            store: SweepStore object, it is closed with this store
+        """
+        return SweepStore(self.path, placement_run_name(self.run_name, source, destination, ratio), self.connection)
+
+    def done_cells(self):
+        """Set of the cells already stored."""
+        return set(self.connection.execute('SELECT swaps, replacements, mode FROM cells WHERE run = ?', (self.run_name, )))
+
+    def _rows(self, cell, kind, value):
+        # Long format rows of a result, with the format of the values of the pickle files
+        number_swaps, number_replacements, mode = int(cell[0]), int(cell[1]), cell[2]
+        for key, key_value in value[RUN_TYPE].items():
+            topic, measure = (key, '') if _is_topic_kind(kind) else ('', key)
+            yield (self.run_name, kind, measure, number_swaps, number_replacements, mode, topic, float(key_value))
+
+    def add(self, cell, results, commit = True):
+        """Store the results of a cell.
+
+        Args:
+            cell: tuple (number_swaps, number_replacements, mode)
+            results: dictionary, key one of RESULT_KINDS and value the result of the cell,
+                with the same format of the values of the pickle files, and optionally
+                the standard errors with keys in STANDARD_ERROR_KINDS
+            commit: if False, the results are written to disk at the next commit
+        """
+        for kind in RESULT_KINDS + tuple(kind for kind in STANDARD_ERROR_KINDS if kind in results):
+            self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self._rows(cell, kind, results[kind]))
+        self.connection.execute('INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)', (self.run_name, int(cell[0]), int(cell[1]), cell[2]))
+        if commit:
+            self.connection.commit()
+
+    def add_kind(self, kind, measure_score):
+        """Store all the results of a kind, for example read from the pickle files of a previous sweep.
+
+        Cells are not marked as done, unless they are stored with add.
+
+        Args:
+            kind: one of RESULT_KINDS
+            measure_score: dictionary, key (number_swaps, number_replacements, mode) and value
+                the result of the cell, the same dictionary stored in the pickle files
+        """
+        for cell, value in measure_score.items():
+            self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self._rows(cell, kind, value))
+        self.connection.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def load(self, kind, cells = None, measure = None):
+        """Results of a kind for all the cells stored so far.
+
+        Args:
+            kind: one of RESULT_KINDS or STANDARD_ERROR_KINDS
+            cells: if not None, list of the cells expected in the sweep, only these cells are read
+                and the cells that are not stored yet get NaN values, with the same topics or
+                measures of the stored cells, so that partial results can be plotted (NaN are
+                blank in the heatmaps)
+            measure: for RMSE, nRMSE and p-values, read only the values of this measure
+
+        Returns:
+            measure_score: dictionary, key (number_swaps, number_replacements, mode) and value
+            the result of the cell, with the same format of the dictionary stored in the pickle files
+        """
+        if kind not in RESULT_KINDS + STANDARD_ERROR_KINDS:
+            raise ValueError('Result kind %s is not supported.' % kind)
+
+        query = 'SELECT swaps, replacements, mode, topic, measure, value FROM results WHERE run = ? AND kind = ?'
+        parameters = (self.run_name, kind)
+        if (measure is not None) and not _is_topic_kind(kind):
+            query += ' AND measure = ?'
+            parameters += (measure, )
+        if cells is not None:
+            # Read only the rows with the numbers of swaps and replacements of the expected cells
+            for column, values in (('swaps', {int(cell[0]) for cell in cells}), ('replacements', {int(cell[1]) for cell in cells})):
+                query += ' AND %s IN (%s)' % (column, ', '.join('?' * len(values)))
+                parameters += tuple(sorted(values))
+
+        measure_score = {}
+        for number_swaps, number_replacements, mode, topic, row_measure, value in self.connection.execute(query, parameters):
+            cell = (number_swaps, number_replacements, mode)
+            if cell not in measure_score:
+                measure_score[cell] = {RUN_TYPE: {}}
+            # SQLite stores NaN as NULL
+            measure_score[cell][RUN_TYPE][topic if _is_topic_kind(kind) else row_measure] = numpy.nan if value is None else value
+
+        if cells is not None and measure_score:
+            # Same structure of a stored cell, with NaN values
+            missing = {RUN_TYPE: {key: numpy.nan for key in next(iter(measure_score.values()))[RUN_TYPE]}}
+            for cell in cells:
+                if cell not in measure_score:
+                    measure_score[cell] = missing
+
+        return measure_score
+
+    def load_cells(self, cells):
+        """Results of some cells.
+
+        Args:
+            cells: list of stored cells (number_swaps, number_replacements, mode)
+
+        Returns:
+            results: dictionary, key cell and value a dictionary, key one of RESULT_KINDS
+            and value the result of the cell
+        """
+        measure_scores = {kind: self.load(kind, cells) for kind in RESULT_KINDS}
+        return {cell: {kind: measure_scores[kind][cell] for kind in RESULT_KINDS} for cell in cells}
+
+
+class RunningStatistics(object):
+    """Mean and standard error of the results of many repetitions of a cell, updated one repetition at a time.
+
+    Uses Welford's algorithm: only the count, the mean and the sum of squared differences
+    from the mean of each value are kept, not the results of every repetition.
+
+    Attributes:
+        count: number of repetitions added
+        keys: dictionary, key one of RESULT_KINDS and value the list of topics or measures
+        mean: dictionary, key one of RESULT_KINDS and value the numpy array of the means
+        m2: dictionary, key one of RESULT_KINDS and value the numpy array of the sums of squared differences
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.keys = {}
+        self.mean = {}
+        self.m2 = {}
+
+    def add(self, results):
+        """Add the results of a repetition, see SweepStore.add."""
+        self.count += 1
+        for kind in RESULT_KINDS:
+            values = results[kind][RUN_TYPE]
+            if self.count == 1:
+                self.keys[kind] = list(values.keys())
+                self.mean[kind] = numpy.zeros(len(values))
+                self.m2[kind] = numpy.zeros(len(values))
+            x = numpy.fromiter((values[key] for key in self.keys[kind]), dtype = float, count = len(self.keys[kind]))
+            delta = x - self.mean[kind]
+            self.mean[kind] += delta / self.count
+            self.m2[kind] += delta * (x - self.mean[kind])
+
+    def results(self):
+        """Means of the repetitions, with the format of SweepStore.add, and their standard errors, NaN with a single repetition."""
+        results = {kind: {RUN_TYPE: dict(zip(self.keys[kind], self.mean[kind].tolist()))} for kind in RESULT_KINDS}
+        for kind in RESULT_KINDS:
+            if self.count > 1:
+                standard_error = numpy.sqrt(self.m2[kind] / (self.count - 1) / self.count)
+            else:
+                standard_error = numpy.full(len(self.keys[kind]), numpy.nan)
+            results[kind + STANDARD_ERROR_SUFFIX] = {RUN_TYPE: dict(zip(self.keys[kind], standard_error.tolist()))}
+        return results
+
+
+class RepeatedCell(object):
+    """Compute a cell many times and return the mean and the standard error of its results.
+
+    The object can be passed to run_sweep as compute_cell, also with a pool of processes
+    if compute_repetition is a function defined at the top level of a module.
+
+    Attributes:
+        compute_repetition: function taking a cell and the index of a repetition and returning a
+            tuple (cell, results), each repetition should draw from its own random stream, see cell_rng
+        repetitions: number of repetitions of each cell
+    """
+
+    def __init__(self, compute_repetition, repetitions):
+        self.compute_repetition = compute_repetition
+        self.repetitions = repetitions
+
+    def __call__(self, cell):
+        statistics = None
+        for repetition in range(self.repetitions):
+            _, results = self.compute_repetition(cell, repetition)
+            # With a sweep over ratios, results is a list with the results of each ratio, see run_sweep
+            ratio_results = results if isinstance(results, list) else [results]
+            if statistics is None:
+                statistics = [RunningStatistics() for _ in ratio_results]
+            for ratio_statistics, values in zip(statistics, ratio_results):
+                ratio_statistics.add(values)
+        if isinstance(results, list):
+            return cell, [ratio_statistics.results() for ratio_statistics in statistics]
+        return cell, statistics[0].results()
+
+
+def run_sweep(store, cells, compute_cell, pool = None, chunk_size = 16, groups = None, placements = None, ratios = None):
+    """Compute the cells of a sweep which are not in the store yet.
+
+    Args:
+        store: SweepStore object
+        cells: list of tuples (number_swaps, number_replacements, mode)
+        compute_cell: function taking a cell and returning a tuple (cell, results), see SweepStore.add.
+            If placements is not None, it takes and returns a task ((source, destination), cell) instead of a cell.
+            If ratios is not None, it returns a list with the results of each ratio instead of the results
+        pool: multiprocessing.Pool object, None to compute the cells in this process
+        chunk_size: number of cells sent to a worker at once, results are committed to disk after each chunk
+        groups: dictionary returned by plan_cells, only the first cell of each group is computed and
+            its results are stored for all the cells of the group. None to compute every cell.
+            If placements is not None, a list with the groups of each placement
+        placements: list of tuples (source, destination), an axis of the grid: each cell is computed for each
+            placement and stored in store.placement(source, destination). All the placements share the
+            workers, and what they prepared, e.g. the run prepared once. None to compute the cells only once
+        ratios: list of increasing ratios of topics, an axis of the grid computed in a single task, e.g. with
+            RatioSweep: the results of each ratio are stored in store.placement(source, destination, ratio).
+            None if compute_cell deteriorates a single ratio
+
+    Returns:
+        num_computed: number of cells computed
+    """
+
+    if placements is None:
+        stores, placement_groups = [(None, [store])], [groups]
+    else:
+        placements = [(tuple(source), tuple(destination)) for source, destination in placements]
+        stores = [(placement, [store.placement(*placement)]) for placement in placements]
+        placement_groups = groups if groups is not None else [None] * len(placements)
+    if ratios is not None:
+        # One store for each ratio of each placement
+        stores = [(placement, [store.placement(*(placement or DEFAULT_PLACEMENT), ratio) for ratio in ratios])
+                  for placement, _ in stores]
+
+    # Tasks to compute, key the task (the cell, or the placement and the cell) and
+    # value the list of stores and cells where the results of the task are stored
+    tasks = {}
+    num_cells = num_todo = 0
+    for (placement, placement_stores), cell_groups in zip(stores, placement_groups):
+        # Skip the cells computed by a previous, interrupted, sweep, for all the ratios
+        done_cells = set.intersection(*(placement_store.done_cells() for placement_store in placement_stores))
+        todo_cells = [cell for cell in cells if tuple(cell) not in done_cells]
+        num_cells += len(cells)
+        num_todo += len(todo_cells)
+
+        # Cells whose results are stored with the results of each computed cell
+        if cell_groups is None:
+            members = {cell: [cell] for cell in todo_cells}
+        else:
+            todo = set(todo_cells)
+            members = {}
+            for first_cell, group in cell_groups.items():
+                group = [cell for cell in group if cell in todo]
+                if group:
+                    members[first_cell] = group
+
+        for cell, group in members.items():
+            tasks[cell if placement is None else (placement, cell)] = [(placement_stores, member) for member in group]
+
+    if num_todo < num_cells:
+        print('Resuming the sweep: %d cells done, %d to compute' % (num_cells - num_todo, num_todo))
+    if groups is not None:
+        print('Computing %d groups of cells with the same actions for %d cells' % (len(tasks), num_todo))
+
+    if pool is None:
+        results = map(compute_cell, tasks)
+    else:
+        results = pool.imap_unordered(compute_cell, tasks, chunksize = chunk_size)
+
+    num_computed = 0
+    for task, task_results in results:
+        if ratios is None:
+            task_results = [task_results]
+        for placement_stores, member in tasks[task]:
+            for placement_store, ratio_results in zip(placement_stores, task_results):
+                placement_store.add(member, ratio_results, commit = False)
+        num_computed += 1
+        if num_computed % chunk_size == 0:
+            store.commit()
+    store.commit()
+
+    return num_computed
@@ -0,0 +1,174 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import numpy
+
+from deterioration_functions.deteriorate_run import prepare_intervals
+
+
+# Documents swapped by each mode: relevant documents in the source with not relevant documents
+# in the destination (down) or not relevant documents in the source with relevant documents in
+# the destination (up). Documents replaced by each mode: relevant documents in the source with
+# fake documents (fake) or not relevant documents in the source with relevant documents not retrieved (relevant)
+SWAP_DOWN, SWAP_UP = 1, 2
+REPLACE_FAKE, REPLACE_RELEVANT = 1, 2
+MODE_ACTIONS = {'worse': (SWAP_DOWN, REPLACE_FAKE),
+                'better': (SWAP_UP, REPLACE_RELEVANT),
+                'betterworse': (SWAP_UP, REPLACE_FAKE),
+                'worsebetter': (SWAP_DOWN, REPLACE_RELEVANT)}
+
+
+def _ratio_swaps(number_swaps, number_replacements, num_documents):
+    # int(round(number_swaps * num_documents / (number_swaps + number_replacements))), as in topic_actions,
+    # 0 where there is nothing to do (the value is only used where number_swaps + number_replacements > 0)
+    quantity = number_swaps + number_replacements
+    return numpy.round((number_swaps * num_documents) / numpy.maximum(quantity, 1)).astype(int)
+
+
+def effective_actions(prepared_topic, source, destination, mode, number_swaps, number_replacements):
+    """Number of swaps and replacements performed on a topic, for many requested numbers at once.
+
+    Same result of topic_actions for each pair (number_swaps[k], number_replacements[k]),
+    computed with array operations: the numbers of documents in the intervals are counted once.
+
+    Args:
+        prepared_topic: PreparedTopic, sorted and assessed ranking of the topic
+        source: numpy array, sorted source interval with rank positions starting from 0
+        destination: numpy array, sorted destination interval with rank positions starting from 0
+        mode: mode of the swaps and replacements {worse, better, betterworse, worsebetter}
+        number_swaps: integer array, requested numbers of swaps
+        number_replacements: integer array, requested numbers of replacements
+
+    Returns:
+        current_swaps: integer array, numbers of swaps performed
+        current_replacements: integer array, numbers of replacements performed.
+        Both are 0 when topic_actions returns None, the ranking is not modified.
+    """
+    number_swaps = numpy.asarray(number_swaps, dtype = int)
+    number_replacements = numpy.asarray(number_replacements, dtype = int)
+
+    num_relevant_source = prepared_topic.num_relevant(source)
+    num_notrel_source = prepared_topic.num_not_relevant(source)
+    num_relevant_destination = prepared_topic.num_relevant(destination)
+    num_notrel_destination = prepared_topic.num_not_relevant(destination)
+    num_rel_doc_not_retrieved = len(prepared_topic.rel_doc_not_retrieved)
+
+    nothing = (numpy.zeros_like(number_swaps), numpy.zeros_like(number_replacements))
+
+    if (mode == 'worse'):
+        if num_relevant_source <= 0:
+            return nothing
+        current_swaps = numpy.minimum(number_swaps, num_notrel_destination)
+        current_replacements = number_replacements
+        # Not enough relevant documents to move and replace, keep the ratio of swaps/replacements
+        decrease = (num_relevant_source < current_swaps + current_replacements)
+        current_swaps = numpy.where(decrease, numpy.minimum(_ratio_swaps(number_swaps, number_replacements, num_relevant_source),
+                                                            num_notrel_destination), current_swaps)
+        current_replacements = numpy.where(decrease, num_relevant_source - current_swaps, current_replacements)
+
+    elif (mode == 'better'):
+        if num_notrel_source <= 0:
+            return nothing
+        current_swaps = numpy.minimum(number_swaps, num_relevant_destination)
+        current_replacements = numpy.minimum(number_replacements, num_rel_doc_not_retrieved)
+        # Not enough not relevant documents to move and replace, keep the ratio of swaps/replacements
+        decrease = (num_notrel_source < current_swaps + current_replacements)
+        current_swaps = numpy.where(decrease, numpy.minimum(_ratio_swaps(number_swaps, number_replacements, num_notrel_source),
+                                                            num_relevant_destination), current_swaps)
+        current_replacements = numpy.where(decrease, numpy.minimum(num_notrel_source - current_swaps, num_rel_doc_not_retrieved),
+                                           current_replacements)
+
+    elif (mode == 'betterworse'):
+        if not ((num_notrel_source > 0) or (num_relevant_source > 0)):
+            return nothing
+        current_swaps = numpy.minimum(numpy.minimum(number_swaps, num_relevant_destination), num_notrel_source)
+        current_replacements = numpy.minimum(number_replacements, num_relevant_source)
+
+    elif (mode == 'worsebetter'):
+        if not ((num_relevant_source > 0) or (num_notrel_source > 0)):
+            return nothing
+        current_swaps = numpy.minimum(numpy.minimum(number_swaps, num_notrel_destination), num_relevant_source)
+        current_replacements = numpy.minimum(numpy.minimum(number_replacements, num_notrel_source), num_rel_doc_not_retrieved)
+
+    else:
+        return nothing
+
+    return current_swaps, current_replacements
+
+
+def plan_cells(prepared_run, cells, ratio = 1, source = (1, 500), destination = (501, 1000)):
+    """Group the cells of a sweep which deteriorate the run in the same way.
+
+    The numbers of swaps and replacements are decreased on each topic when the intervals
+    do not contain enough documents, therefore past a point many cells perform the same
+    actions on every topic. The actions of a cell on a topic are the type and number of swaps
+    and the type and number of replacements (see MODE_ACTIONS): cells with the same actions on
+    all the topics draw their deteriorated runs from the same distribution, even with different
+    modes, e.g. every cell that performs no action gives the original run. Each group can be
+    deteriorated and evaluated once, with the random stream of its first cell, and its results
+    given to all its cells.
+
+    When ratio < 1 each cell modifies its own random subset of topics, only the cells that
+    perform no action on any topic are grouped.
+
+    Args:
+        prepared_run: PreparedRun object
+        cells: list of tuples (number_swaps, number_replacements, mode)
+        ratio: float in [0, 1], percentage of topics to deteriorate
+        source: interval where documents are replaced or taken to be swapped
+        destination: interval where documents are moved when swapped
+
+    Returns:
+        groups: dictionary, key the first cell of a group (in the order of cells) and value
+        the list of cells of the group, including the first one
+    """
+    if len(cells) == 0:
+        return {}
+    source, destination = prepare_intervals(source, destination)
+
+    cell_modes = numpy.array([mode for _, _, mode in cells])
+    number_swaps = numpy.array([int(cell[0]) for cell in cells])
+    number_replacements = numpy.array([int(cell[1]) for cell in cells])
+
+    # Actions of each cell (row) on each topic: (swap type, swaps, replacement type, replacements)
+    topic_ids = list(prepared_run.run_orig.keys())
+    actions = numpy.zeros((len(cells), len(topic_ids), 4), dtype = int)
+    for mode in numpy.unique(cell_modes):
+        rows = numpy.flatnonzero(cell_modes == mode)
+        if mode not in MODE_ACTIONS:
+            # Unsupported modes do not modify the run, they are not grouped with other cells
+            actions[rows, :, 0] = -1 - rows[:, None]
+            continue
+        swap_type, replacement_type = MODE_ACTIONS[mode]
+        for t, topic_id in enumerate(topic_ids):
+            current_swaps, current_replacements = effective_actions(prepared_run[topic_id], source, destination, mode,
+                                                                    number_swaps[rows], number_replacements[rows])
+            actions[rows, t, 0] = numpy.where(current_swaps > 0, swap_type, 0)
+            actions[rows, t, 1] = current_swaps
+            actions[rows, t, 2] = numpy.where(current_replacements > 0, replacement_type, 0)
+            actions[rows, t, 3] = current_replacements
+    actions = actions.reshape(len(cells), -1)
+
+    if ratio < 1:
+        # Only the cells which do not modify any topic are the same, the others are kept alone
+        modified = actions.any(axis = 1)
+        actions = numpy.where(modified[:, None], numpy.arange(1, len(cells) + 1)[:, None], 0)
+
+    _, first, group_index = numpy.unique(actions, axis = 0, return_index = True, return_inverse = True)
+    groups = {}
+    for cell, index in zip(cells, group_index.reshape(-1).tolist()):
+        groups.setdefault(cells[first[index]], []).append(cell)
+    return groups
@@ -0,0 +1,226 @@
+# Copyright 2020-2021 University of Copenhagen, Denmark
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Author: Maria Maistro (mm@di.ku.dk)
+
+import collections.abc
+
+import numpy
+
+
+class DocVocabulary(object):
+    """Document ids interned to int32 keys, shared by many runs.
+
+    Each document id string is stored once, rankings store the int32 key of their
+    documents. Runs of the same collection, e.g. all the runs of a grid of systems,
+    should share one vocabulary.
+
+    Attributes:
+        keys: dictionary, key document id and value its key
+        doc_ids: list of document ids, element k is the document id with key k
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.doc_ids = []
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def intern(self, doc_ids):
+        """Keys of many document ids, new document ids are added to the vocabulary.
+
+        Args:
+            doc_ids: list of document ids
+
+        Returns:
+            keys: int32 numpy array
+        """
+        keys = self.keys
+        for doc_id in doc_ids:
+            if doc_id not in keys:
+                keys[doc_id] = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+        return numpy.fromiter(map(keys.__getitem__, doc_ids), dtype = numpy.int32, count = len(doc_ids))
+
+    def lookup(self, keys):
+        """Document ids of many keys, as a list."""
+        doc_ids = self.doc_ids
+        return [doc_ids[key] for key in keys.tolist()]
+
+
+class TopicRanking(collections.abc.Mapping):
+    """Read-only dictionary view of the ranking of a topic, key document id and value score.
+
+    The ranking is stored as two contiguous arrays in file order, the int32 keys of the
+    documents and their scores, the view does not copy them. pytrec_eval needs actual
+    dictionaries, use dict(ranking) or TrecRun.to_dict() before passing the ranking to it.
+
+    Attributes:
+        vocabulary: DocVocabulary of the document keys
+        doc_keys: int32 numpy array with the keys of the documents
+        scores: float numpy array with the scores of the documents
+    """
+
+    def __init__(self, vocabulary, doc_keys, scores):
+        self.vocabulary = vocabulary
+        self.doc_keys = doc_keys
+        self.scores = scores
+
+    def __getitem__(self, doc_id):
+        key = self.vocabulary.keys.get(doc_id)
+        if key is not None:
+            position = numpy.flatnonzero(self.doc_keys == key)
+            if len(position) > 0:
+                return self.scores[position[0]].item()
+        raise KeyError(doc_id)
+
+    def __iter__(self):
+        return iter(self.vocabulary.lookup(self.doc_keys))
+
+    def __len__(self):
+        return len(self.doc_keys)
+
+    def items(self):
+        # Faster than looking up each document
+        return zip(self.vocabulary.lookup(self.doc_keys), self.scores.tolist())
+
+    def to_dict(self):
+        """Dictionary with the format of pytrec_eval."""
+        return dict(self.items())
+
+
+class TrecRun(collections.abc.Mapping):
+    """Run stored as arrays of int32 document keys and scores, one pair of arrays for each topic.
+
+    The object is a read-only dictionary-like view with the same format of pytrec_eval.parse_run,
+    whose values are TopicRanking views. It can be passed to PreparedRun instead of a parsed run.
+
+    Attributes:
+        vocabulary: DocVocabulary of the document keys
+        doc_keys: dictionary, key topic id and value the int32 numpy array with the keys of the documents
+        scores: dictionary, key topic id and value the float numpy array with the scores of the documents
+    """
+
+    def __init__(self, vocabulary, doc_keys, scores):
+        self.vocabulary = vocabulary
+        self.doc_keys = doc_keys
+        self.scores = scores
+
+    def __getitem__(self, topic_id):
+        return TopicRanking(self.vocabulary, self.doc_keys[topic_id], self.scores[topic_id])
+
+    def __iter__(self):
+        return iter(self.doc_keys)
+
+    def __len__(self):
+        return len(self.doc_keys)
+
+    def nbytes(self):
+        """Memory used by the arrays of the rankings, the vocabulary is not included."""
+        return sum(keys.nbytes + self.scores[topic_id].nbytes for topic_id, keys in self.doc_keys.items())
+
+    def to_dict(self, topic_ids = None):
+        """Two level nested dictionary with the format of pytrec_eval.
+
+        Args:
+            topic_ids: topics to include, None for all the topics
+
+        Returns:
+            run: on the first level keys are topic ids, on the second level keys are
+            document ids and values are scores
+        """
+        if topic_ids is None:
+            topic_ids = self.doc_keys
+        return {topic_id: self[topic_id].to_dict() for topic_id in topic_ids}
+
+
+def read_run(f_run, vocabulary = None):
+    """Read a run in TREC format line by line.
+
+    Topics are parsed one at a time: the document ids and scores of a topic are kept
+    in a dictionary only until the next topic starts, then they are stored as arrays.
+    As pytrec_eval.parse_run, a document cannot appear twice in the same topic.
+
+    Args:
+        f_run: file object or path of the run
+        vocabulary: DocVocabulary shared with other runs, None to create a new one
+
+    Returns:
+        run: TrecRun object
+    """
+    if isinstance(f_run, str):
+        with open(f_run, 'r') as f:
+            return read_run(f, vocabulary)
+
+    if vocabulary is None:
+        vocabulary = DocVocabulary()
+    doc_keys = {}
+    scores = {}
+
+    def store_topic(topic_id, topic_docs):
+        if topic_id in doc_keys:
+            # The topic already appeared earlier in the file, merge the two parts
+            previous = dict(TopicRanking(vocabulary, doc_keys[topic_id], scores[topic_id]).items())
+            for doc_id in topic_docs:
+                if doc_id in previous:
+                    raise ValueError('Document %s appears twice in topic %s.' % (doc_id, topic_id))
+            previous.update(topic_docs)
+            topic_docs = previous
+        doc_keys[topic_id] = vocabulary.intern(list(topic_docs.keys()))
+        scores[topic_id] = numpy.fromiter(topic_docs.values(), dtype = float, count = len(topic_docs))
+
+    topic_id = None
+    topic_docs = {}
+    for line in f_run:
+        fields = line.split()
+        if len(fields) < 5:
+            continue
+        if fields[0] != topic_id:
+            if topic_id is not None:
+                store_topic(topic_id, topic_docs)
+            topic_id = fields[0]
+            topic_docs = {}
+        if fields[2] in topic_docs:
+            raise ValueError('Document %s appears twice in topic %s.' % (fields[2], topic_id))
+        topic_docs[fields[2]] = float(fields[4])
+    if topic_id is not None:
+        store_topic(topic_id, topic_docs)
+
+    return TrecRun(vocabulary, doc_keys, scores)
+
+
+def read_qrels(f_qrel):
+    """Read a qrels file in TREC format line by line.
+
+    Args:
+        f_qrel: file object or path of the qrels
+
+    Returns:
+        qrels: two level nested dictionary with the format of pytrec_eval.parse_qrel
+    """
+    if isinstance(f_qrel, str):
+        with open(f_qrel, 'r') as f:
+            return read_qrels(f)
+
+    qrels = {}
+    for line in f_qrel:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        topic_qrels = qrels.setdefault(fields[0], {})
+        if fields[2] in topic_qrels:
+            raise ValueError('Document %s appears twice in topic %s.' % (fields[2], fields[0]))
+        topic_qrels[fields[2]] = int(fields[3])
+    return qrels
@@ -1,10 +1,10 @@
 # Import libraries
-import pytrec_eval
 import pickle
 from repro_eval.Evaluator import RpdEvaluator
 import time
 
-from deterioration_functions import deteriorate_run, colormap_ktu, colormap_rbo, colormap_rmse, colormap_n_rmse, colormap_pvalues
+from deterioration_functions import document_order
+from deterioration_functions import PreparedRun, MeasureEvaluator, deteriorate_run, cell_rng, colormap_ktu, colormap_rbo, colormap_rmse, colormap_n_rmse, colormap_pvalues
 
 # Path to input ranking and qrels (here we consider a single topic)
 # Run Name
@@ -33,20 +33,23 @@ destination = [501, 1000]
 # Bolean paramenter
 # True: prints some text output for each topic
 verbose = False
+
+# Seed of the sweep: each (swaps, replacements, mode) cell draws from its own random stream derived from it,
+# so results do not depend on the order in which cells are computed and any cell can be recomputed alone
+seed = 0
 show_plot = True
 
 
-# Import the original run
+# Import the original run and the qrels
 # The run is a nested dictionary with: key: topic ids, value: a dictionary
 # The nested dictionary has: key: doc ids, value: doc scores
-with open(run_file_path, 'r') as f_run:
-    run_orig = pytrec_eval.parse_run(f_run)
+# Rankings are read as arrays of interned doc ids, see TrecRun
+# Sort and assess the original run once, it is shared by all the deteriorated runs
+prepared_run = PreparedRun.from_files(run_file_path, qrels_file_path)
 
-# Import the qrels
-# The qrels is a nested dictionary with: key: topic ids, value: a dictionary
-# The nested dictionary has: key: doc ids, value: relevance labels
-with open(qrels_file_path, 'r') as f_qrel:
-    qrels = pytrec_eval.parse_qrel(f_qrel)
+# Evaluate the original run once with the measures used by heatmaps and tables (P_10, map, ndcg),
+# deteriorated runs re-evaluate only the modified topics
+evaluator = MeasureEvaluator(prepared_run)
 
 
 # Number of iterations: corresponds to the number of swaps
@@ -85,22 +88,18 @@ for number_swaps in swaps_replacement_values:
             print('Number of Swaps: %d, Number of replacements: %d, Mode: %s' % (number_swaps, number_replacements, mode))
             
             # Deteriorate the original run
-            deteriorated_run = deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination,
-                                               mode, number_swaps, number_replacements, verbose)
+            deteriorated_run = deteriorate_run(prepared_run, None, ratio, source, destination,
+                                               mode, number_swaps, number_replacements, verbose, compact = True,
+                                               rng = cell_rng(seed, number_swaps, number_replacements, mode))
             
             # Initialize and rpd object
             rpd_eval = RpdEvaluator()
-            # Set all the field of the rpd object
-            rpd_eval.run_b_orig = run_orig
-            rpd_eval.run_b_rep = deteriorated_run
-            
-            rpd_eval.rel_eval = pytrec_eval.RelevanceEvaluator(qrels, pytrec_eval.supported_measures)
-
-            rpd_eval.trim()
-            rpd_eval.evaluate()
+            # Set the scores of the original and deteriorated run, only the modified topics are re-evaluated
+            rpd_eval.run_b_orig_score = evaluator.run_orig_score
+            rpd_eval.run_b_rep_score = evaluator.evaluate(deteriorated_run)
             
-            ktu[(number_swaps, number_replacements, mode)] = rpd_eval.ktau_union()
-            rbo[(number_swaps, number_replacements, mode)] = rpd_eval.rbo()
+            ktu[(number_swaps, number_replacements, mode)] = {'baseline': document_order.ktau_union(deteriorated_run)}
+            rbo[(number_swaps, number_replacements, mode)] = {'baseline': document_order.rbo(deteriorated_run)}
             rmse[(number_swaps, number_replacements, mode)] = rpd_eval.rmse()
             n_rmse[(number_swaps, number_replacements, mode)] = rpd_eval.nrmse()
             pvalue[(number_swaps, number_replacements, mode)] = rpd_eval.ttest()
@@ -1,11 +1,12 @@
 # Import libraries
-import pytrec_eval
-import pickle
 from repro_eval.Evaluator import RpdEvaluator
 import time
-from multiprocessing import Manager, Pool
+import gc
+from multiprocessing import Pool
 
-from deterioration_functions import deteriorate_run, colormap_ktu, colormap_rbo, colormap_rmse, colormap_n_rmse, colormap_pvalues
+from deterioration_functions import document_order
+from deterioration_functions import SweepStore, RepeatedCell, run_sweep, refine_grid, plan_cells
+from deterioration_functions import PreparedRun, MeasureEvaluator, RatioSweep, deteriorate_run, cell_rng, colormap_ktu, colormap_rbo, colormap_rmse, colormap_n_rmse, colormap_pvalues
 
 # Path to input ranking and qrels (here we consider a single topic)
 # Run Name
@@ -21,6 +22,10 @@ qrels_file_path = './data/real_runs/qrels_common_core_2018.txt'
 # Ratio: percentage of topics we want to modify
 # Float in [0, 1]
 ratio = 1
+# Ratios swept as another axis of the grid, e.g. [0.1, 0.2, ..., 1], None to deteriorate only the ratio above:
+# one random order of the topics is drawn for each cell and each ratio deteriorates a longer prefix of it, so the
+# whole axis costs about as much as ratio = 1. Results of ratio r < 1 are stored with the ratio in the run name, e.g. RM3_ratio0.5
+ratios = None
 
 # Location: on which rank positions we want to replace documents and swap documents
 # Source: we pick a document from the source, [s_1 s_2] (rank positions start from 1)
@@ -30,59 +35,93 @@ source = [1, 500]
 # Documents are replaced in the destination
 # destination = [6, 10]
 destination = [501, 1000]
+# Placements swept as another axis of the grid, list of (source, destination) pairs: the run is prepared and evaluated
+# once for all of them, e.g. [(source, destination), ([1, 5], [6, 10])]. The results of [1, 500], [501, 1000] are stored
+# with the run name, the ones of the other placements with the intervals in the run name, e.g. RM3@1-5:6-10
+placements = [(source, destination)]
 
 # Bolean paramenter
 # True: prints some text output for each topic
 verbose = False
+
+# Seed of the sweep: each (swaps, replacements, mode) cell draws from its own random stream derived from it,
+# so results do not depend on the order in which cells are computed and any cell can be recomputed alone
+seed = 0
+# Number of random draws of each cell: with more than one, the results of a cell are the means over the draws
+# and their standard errors are stored next to them (as results of kind ktu_se, rbo_se, rmse_se, nrmse_se and pvalue_se)
+repetitions = 1
 show_plot = False
 cores = 12
+# Adaptive sweep: start from a grid with a step of initial_step values and refine only the blocks whose corners
+# differ by more than tolerance in mean KTU, mean RBO or RMSE, the other cells are interpolated by plot_heatmap.py
+adaptive = False
+initial_step = 16
+tolerance = 0.01
+# Deteriorate and evaluate once the combinations which perform the same swaps and replacements on every topic,
+# e.g. all the combinations beyond the number of relevant documents in the source, and store the results for all of them
+deduplicate = True
+# Number of combinations sent to a worker at once, results are committed to disk in chunks of the same size
+chunk_size = 16
+
+# State of each worker, set by init_worker
+worker_prepared_run = None
+worker_evaluator = None
+
+
+def init_worker(prepared_run, evaluator):
+    # The prepared run and the evaluator are built once in the main process before the pool is created:
+    # with the fork start method the workers share their memory pages copy-on-write, nothing is
+    # re-read from disk or pickled, and each task only carries the placement and the (swaps, replacements, mode) triple
+    global worker_prepared_run, worker_evaluator
+    worker_prepared_run = prepared_run
+    worker_evaluator = evaluator
+
+
+def cell_results(run_score, ktu, rbo):
+    # Initialize and rpd object
+    rpd_eval = RpdEvaluator()
+    # Set the scores of the original and deteriorated run
+    rpd_eval.run_b_orig_score = worker_evaluator.run_orig_score
+    rpd_eval.run_b_rep_score = run_score
 
-manager = Manager()
+    return {'ktu': {'baseline': ktu},
+            'rbo': {'baseline': rbo},
+            'rmse': rpd_eval.rmse(),
+            'nrmse': rpd_eval.nrmse(),
+            'pvalue': rpd_eval.ttest()}
 
-ktu = manager.dict()
-rbo = manager.dict()
-rmse = manager.dict()
-n_rmse = manager.dict()
-pvalue = manager.dict()
 
+def repro_measures(task, repetition=0):
+    (source, destination), combination = task
+    number_swaps, number_replacements, mode = combination
+    rng = cell_rng(seed, number_swaps, number_replacements, mode, repetition)
 
-def repro_measures(*args):
-    number_swaps = args[0]
-    number_replacements = args[1]
-    mode = args[2]
-    
-    # Deteriorate the original run
-    deteriorated_run = deteriorate_run(run_file_path, qrels_file_path, ratio, source, destination,
-                                    mode, number_swaps, number_replacements, verbose)
-    
-    # Initialize and rpd object
-    rpd_eval = RpdEvaluator()
-    # Set all the field of the rpd object
-    rpd_eval.run_b_orig = run_orig
-    rpd_eval.run_b_rep = deteriorated_run
-    
-    rpd_eval.rel_eval = pytrec_eval.RelevanceEvaluator(qrels, pytrec_eval.supported_measures)
+    # Deteriorate the run for all the ratios, each ratio deteriorates and evaluates only the topics it adds
+    if ratios is not None:
+        ratio_sweep = RatioSweep(worker_prepared_run, worker_evaluator, source, destination,
+                                 mode, number_swaps, number_replacements, verbose, rng = rng)
+        return (task, [cell_results(*ratio_sweep.extend(current_ratio)[1:]) for current_ratio in ratios])
 
-    rpd_eval.trim()
-    rpd_eval.evaluate()
+    # Deteriorate the original run
+    deteriorated_run = deteriorate_run(worker_prepared_run, None, ratio, source, destination,
+                                    mode, number_swaps, number_replacements, verbose, compact = True,
+                                    rng = rng)
     
-    ktu[(number_swaps, number_replacements, mode)] = rpd_eval.ktau_union()
-    rbo[(number_swaps, number_replacements, mode)] = rpd_eval.rbo()
-    rmse[(number_swaps, number_replacements, mode)] = rpd_eval.rmse()
-    n_rmse[(number_swaps, number_replacements, mode)] = rpd_eval.nrmse()
-    pvalue[(number_swaps, number_replacements, mode)] = rpd_eval.ttest()
+    # Results are returned to the main process, which stores them, only the modified topics are re-evaluated
+    return (task, cell_results(worker_evaluator.evaluate(deteriorated_run),
+                               document_order.ktau_union(deteriorated_run),
+                               document_order.rbo(deteriorated_run)))
 
-# Import the original run
+# Import the original run and the qrels
 # The run is a nested dictionary with: key: topic ids, value: a dictionary
 # The nested dictionary has: key: doc ids, value: doc scores
-with open(run_file_path, 'r') as f_run:
-    run_orig = pytrec_eval.parse_run(f_run)
+# Rankings are read as arrays of interned doc ids, see TrecRun
+# Sort and assess the original run once, it is shared by all the deteriorated runs
+prepared_run = PreparedRun.from_files(run_file_path, qrels_file_path)
 
-# Import the qrels
-# The qrels is a nested dictionary with: key: topic ids, value: a dictionary
-# The nested dictionary has: key: doc ids, value: relevance labels
-with open(qrels_file_path, 'r') as f_qrel:
-    qrels = pytrec_eval.parse_qrel(f_qrel)
+# Evaluate the original run once with the measures used by heatmaps and tables (P_10, map, ndcg),
+# deteriorated runs re-evaluate only the modified topics
+evaluator = MeasureEvaluator(prepared_run)
 
 
 # Number of iterations: corresponds to the number of swaps
@@ -112,34 +151,35 @@ for number_swaps in swaps_replacement_values:
             combinations.append((number_swaps, number_replacements, mode))
 
 
+# Each finished cell is committed to this database, shared by all the runs: if the sweep is interrupted, running
+# the script again computes only the missing cells, and plot_heatmap.py can read the results while the sweep is running
+store_path = './measure_scores/measure_scores.sqlite'
+
 start_time = time.time()
 
-with Pool(processes=cores) as pool:
-    pool.starmap(repro_measures, combinations) 
-            
-# Store KTU
-file_name = './measure_scores/' + run_name +'/' + run_name + '_ktu.p'
-with open(file_name, 'wb') as f:
-    pickle.dump(dict(ktu), f)
-    
-# Store RBO
-file_name = './measure_scores/' + run_name +'/' + run_name + '_rbo.p'
-with open(file_name, 'wb') as f:
-    pickle.dump(dict(rbo), f)
-    
-# Store RMSE
-file_name = './measure_scores/' + run_name +'/' + run_name + '_rmse.p'
-with open(file_name, 'wb') as f:
-    pickle.dump(dict(rmse), f)
-    
-# Store nRMSE
-file_name = './measure_scores/' + run_name +'/' + run_name + '_nrmse.p'
-with open(file_name, 'wb') as f:
-    pickle.dump(dict(n_rmse), f)
-    
-# Store p-values
-file_name = './measure_scores/' + run_name +'/' + run_name + '_pvalue.p'
-with open(file_name, 'wb') as f:
-    pickle.dump(dict(pvalue), f)
+# Move the objects created so far out of the garbage collector, so that collections in the
+# workers do not write to (and copy) the pages shared with the main process
+gc.freeze()
+
+# Function computing a cell, repeated with a different random stream for each repetition
+compute_cell = repro_measures if repetitions == 1 else RepeatedCell(repro_measures, repetitions)
+
+# Cells with the same actions on every topic are grouped as with ratio = 1 when sweeping ratios, since every ratio
+# deteriorates a prefix of a random order of the topics
+plan_ratio = ratio if ratios is None else 1
+
+with SweepStore(store_path, run_name) as store:
+    with Pool(processes=cores, initializer=init_worker, initargs=(prepared_run, evaluator)) as pool:
+        if adaptive:
+            # Each placement is refined on its own, on the results of the largest ratio when sweeping ratios
+            for placement in placements:
+                def compute_cells(cells):
+                    groups = [plan_cells(prepared_run, cells, plan_ratio, *placement)] if deduplicate else None
+                    run_sweep(store, cells, compute_cell, pool, chunk_size, groups, [placement], ratios)
+                    return store.placement(*placement, ratios[-1] if ratios is not None else 1).load_cells(cells)
+                refine_grid(swaps_replacement_values, compute_cells, tolerance, initial_step=initial_step)
+        else:
+            groups = [plan_cells(prepared_run, combinations, plan_ratio, *placement) for placement in placements] if deduplicate else None
+            run_sweep(store, combinations, compute_cell, pool, chunk_size, groups, placements, ratios)
 
 print('--- %s minutes ---' % ((time.time() - start_time) / 60))
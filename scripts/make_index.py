@@ -2,15 +2,18 @@ import logging
 import subprocess
 import os
 import json
+import queue
+import threading
+import time
 
 
-def cmd(index_name, index_config):
+def cmd(index_name, index_config, threads=None):
     return ['./anserini/target/appassembler/bin/IndexCollection',
             '-collection', index_config.get('collection'),
             '-input', index_config.get('input'),
             '-index', os.path.join('./anserini/indexes/', index_name),
             '-generator', index_config.get('generator'),
-            '-threads', index_config.get('threads'),
+            '-threads', str(threads) if threads is not None else index_config.get('threads'),
             '-storePositions',
             '-storeDocvectors',
             '-storeRaw',
@@ -19,10 +22,96 @@ def cmd(index_name, index_config):
             '-stemmer', index_config.get('stemmer')]
 
 
+def physical_memory_gb():
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1024 ** 3
+
+
+def build_index(idx_name, idx_cmd, env, log_path, finished):
+    # Log the output of the build in its own file and report the return code when it ends
+    logger = logging.getLogger('idx-log.' + idx_name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = logging.FileHandler(os.path.join(log_path, idx_name))
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(filename)s %(funcName)s - %(message)s'))
+    logger.addHandler(handler)
+
+    start_time = time.time()
+    returncode = None
+    try:
+        with subprocess.Popen(idx_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env) as popen:
+            for stdout_line in iter(popen.stdout.readline, b""):
+                logger.info(stdout_line.strip())
+        returncode = popen.returncode
+    except OSError as error:
+        logger.error(error)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+        finished.put((idx_name, returncode, time.time() - start_time))
+
+
+def schedule(idx_configs, log_path, cpu_budget, memory_budget, memory_per_job, min_threads=1):
+    # Run many index builds at once, within a budget of CPUs and memory (GB). Each job gets
+    # memory_per_job GB of heap and a number of threads sized on the CPUs left when it starts:
+    # the free CPUs are shared among the jobs which can start now, between min_threads and the
+    # threads of the index config, the number of threads the collection can use (1 for core18)
+    if memory_per_job > memory_budget:
+        # Small machine: a single job at a time, with all the memory of the budget (at least 1GB)
+        memory_budget = max(memory_budget, 1)
+        print('Warning: the memory of a job (%dGB) is larger than the memory budget, '
+              'building one index at a time with %dGB' % (memory_per_job, memory_budget))
+        memory_per_job = memory_budget
+
+    pending = list(idx_configs.items())
+    running = {}
+    finished = queue.Queue()
+    free_cpus = cpu_budget
+    free_memory = memory_budget
+    failed = []
+    num_done = 0
+    start_time = time.time()
+
+    while pending or running:
+        # Start as many jobs as the budget allows
+        while pending and free_memory >= memory_per_job and free_cpus >= min(min_threads, cpu_budget):
+            slots = min(len(pending), int(free_memory // memory_per_job))
+            idx_name, idx_config = pending.pop(0)
+            threads = max(min(free_cpus // slots, int(idx_config.get('threads'))), min(min_threads, free_cpus))
+
+            env = dict(os.environ, JAVA_OPTS='-Xmx%dg' % memory_per_job)
+            thread = threading.Thread(target=build_index, args=(idx_name, cmd(idx_name, idx_config, threads), env, log_path, finished),
+                                      daemon=True)
+            thread.start()
+            running[idx_name] = threads
+            free_cpus -= threads
+            free_memory -= memory_per_job
+            print('[%d/%d] Started %s with %d threads, running: %d, free CPUs: %d, free memory: %dGB'
+                  % (num_done, len(idx_configs), idx_name, threads, len(running), free_cpus, free_memory))
+
+        # Wait for a job to finish and give its resources back
+        idx_name, returncode, elapsed = finished.get()
+        free_cpus += running.pop(idx_name)
+        free_memory += memory_per_job
+        num_done += 1
+        if returncode != 0:
+            failed.append(idx_name)
+        print('[%d/%d] %s %s in %.0fs, elapsed: %.0fs'
+              % (num_done, len(idx_configs), 'Built' if returncode == 0 else 'FAILED', idx_name, elapsed, time.time() - start_time))
+
+    if failed:
+        print('Failed indexes (see the logs): %s' % ', '.join(failed))
+    return failed
+
+
 def main():
     os.environ['JAVA_HOME'] = '/usr/lib/jvm/java-11-openjdk-amd64'
     log_path = './log'
     idx_config_path = 'index.config'
+    # Budget of all the builds running at once, memory in GB
+    cpu_budget = os.cpu_count()
+    memory_budget = int(physical_memory_gb() * 0.8)
+    # Heap of each build, in GB
+    memory_per_job = 8
 
     try:
         os.mkdir(log_path)
@@ -33,17 +122,7 @@ def main():
     with open(idx_config_path) as f_in:
         idx_configs = json.loads(f_in.read())
 
-    for idx_name, idx_config in idx_configs.items():
-        idx_cmd = cmd(idx_name, idx_config)
-
-        logging.basicConfig(level=logging.NOTSET,
-                            filename=os.path.join(log_path, idx_name),
-                            format='%(asctime)s %(levelname)s %(filename)s %(funcName)s - %(message)s')
-        logger = logging.getLogger('idx-log')
-
-        with subprocess.Popen(idx_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, ) as popen:
-            for stdout_line in iter(popen.stdout.readline, b""):
-                logger.info(stdout_line.strip())
+    schedule(idx_configs, log_path, cpu_budget, memory_budget, memory_per_job)
 
 
 if __name__ == '__main__':
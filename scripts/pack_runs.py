@@ -0,0 +1,32 @@
+# Pack the runs of each search config, e.g. the BM25 and RM3 parameter grids, into a memory-mapped archive
+import glob
+import os
+import json
+
+from deterioration_functions import pack_runs
+
+archive_extension = '.runarchive'
+
+
+def main():
+    runs_path = './anserini/runs/'
+    search_config_path = 'search.config'
+
+    with open(search_config_path) as f_in:
+        search_configs = json.loads(f_in.read())
+
+    for run_name in search_configs:
+        # SearchCollection writes one run for each combination of parameters, the run name followed by the parameters
+        run_file_paths = sorted(path for path in glob.glob(os.path.join(runs_path, glob.escape(run_name) + '*'))
+                                if not path.endswith(archive_extension))
+        if not run_file_paths:
+            print('No runs found for %s' % run_name)
+            continue
+
+        archive_path = os.path.join(runs_path, run_name + archive_extension)
+        num_docs = pack_runs(run_file_paths, archive_path)
+        print('Packed %d runs (%d documents) in %s' % (len(run_file_paths), num_docs, archive_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+# Import the results of previous sweeps, stored in pickle files, in the database with the results of all the sweeps
+import os
+import glob
+import pickle
+
+from deterioration_functions import SweepStore, RESULT_KINDS
+
+# Directory with the pickle files, e.g. ./measure_scores/BM25/BM25_ktu.p or ./measure_scores/simulated/rb1.0/ideal_ktu.p
+measure_scores_path = './measure_scores/'
+# Database with the results in long format
+store_path = './measure_scores/measure_scores.sqlite'
+
+for kind in RESULT_KINDS:
+    for file_name in sorted(glob.glob(os.path.join(measure_scores_path, '**', '*_' + kind + '.p'), recursive=True)):
+        # Run name: the name of the file without the result kind, prefixed by its directory
+        # when the directory is not named after the run, e.g. BM25 or simulated/rb1.0/ideal
+        directory = os.path.relpath(os.path.dirname(file_name), measure_scores_path)
+        prefix = os.path.basename(file_name)[:-len('_' + kind + '.p')]
+        run_name = prefix if directory == prefix else '/'.join([directory.replace(os.sep, '/'), prefix])
+
+        print('Importing %s as run %s' % (file_name, run_name))
+        with open(file_name, 'rb') as f:
+            measure_score = pickle.load(f)
+        with SweepStore(store_path, run_name) as store:
+            store.add_kind(kind, measure_score)
@@ -1,57 +1,51 @@
-import pickle
-from matplotlib.pyplot import figure
-from deterioration_functions import (colormap_ktu, 
-                                     colormap_rbo, 
-                                     colormap_rmse,
-                                     colormap_n_rmse, 
-                                     colormap_pvalues)
-
-run_name = 'BM25'
-# run_name = 'RM3'
+import time
+
+from deterioration_functions import SweepStore, RESULT_KINDS, interpolate_grid, build_heatmaps, render_heatmaps
+
+# Runs and measures of the figures: all the heatmaps are built first and then rendered in parallel
+# Results of other placements of the swaps and replacements are stored with the intervals in the run name, e.g. 'RM3@1-5:6-10'
+run_names = ['BM25', 'RM3']
+measures = ['ndcg', 'P_10', 'map']
 source = [1, 500]
-show_plot = False
+# Number of rendering processes, None for the number of CPUs
+processes = None
+# True to save the cells of the heatmaps as images inside the pdf files, much faster for large heatmaps
+rasterized = False
 max_n_iterations = round((source[1] - source[0] + 1) / 2)
 iteration_step = 5
 swaps_replacement_values = range(0, (max_n_iterations + 1), iteration_step)
+# True if the sweep was adaptive (see deteriorate_real_run_parallel.py): cells which are not computed are interpolated
+adaptive = False
+initial_step = 16
+# Values of swaps and replacements of the full grid of the adaptive sweep
+sweep_values = range(0, (max_n_iterations + 1), 1)
+cells = [(number_swaps, number_replacements, mode) for number_swaps in swaps_replacement_values
+         for number_replacements in swaps_replacement_values
+         for mode in ['worse', 'better', 'worsebetter', 'betterworse']]
+
+# Results of the sweep, read from the database written by deteriorate_real_run_parallel.py:
+# the sweep can still be running, cells which are not computed yet are blank
+# Results of previous sweeps stored in pickle files can be imported with scripts/pickles_to_store.py
+store_path = 'measure_scores/measure_scores.sqlite'
+
+
+def load(run_name, kind):
+    # Read only the rows of this run and result kind
+    with SweepStore(store_path, run_name) as store:
+        if adaptive:
+            measure_score = interpolate_grid(store.load(kind), sweep_values, initial_step)
+            return {cell: measure_score[cell] for cell in cells}
+        return store.load(kind, cells)
+
+
+start_time = time.time()
+
+# Matrices of all the heatmaps, each result kind of each run is read once
+heatmaps = []
+for run_name in run_names:
+    heatmaps += build_heatmaps(swaps_replacement_values, {run_name: {kind: load(run_name, kind) for kind in RESULT_KINDS}}, measures)
+
+ouput_file_paths = render_heatmaps(heatmaps, swaps_replacement_values, 250, 50, './figure/', processes=processes,
+                                   rasterized=rasterized)
 
-with open('measure_scores/' + run_name + '/' + run_name + '_ktu.p', 'rb') as f_in:
-    ktu = pickle.load(f_in)
-figure()
-colormap_ktu(swaps_replacement_values, 250, 50, ktu, -1, 1, run_name, './figure/', show_plot)
-del ktu 
-
-with open('measure_scores/' + run_name + '/' + run_name + '_rbo.p', 'rb') as f_in:
-    rbo = pickle.load(f_in)
-figure()
-colormap_rbo(swaps_replacement_values, 250, 50, rbo, 0, 1, run_name, './figure/', show_plot)
-del rbo
-
-with open('measure_scores/' + run_name + '/' + run_name + '_rmse.p', 'rb') as f_in:
-    rmse = pickle.load(f_in)
-figure()
-colormap_rmse(swaps_replacement_values, 250, 50, rmse, 0, 1, run_name, 'baseline', 'ndcg', './figure/', show_plot)
-figure()
-colormap_rmse(swaps_replacement_values, 250, 50, rmse, 0, 1, run_name, 'baseline', 'P_10', './figure/', show_plot)
-figure()
-colormap_rmse(swaps_replacement_values, 250, 50, rmse, 0, 1, run_name, 'baseline', 'map', './figure/', show_plot)
-del rmse
-
-with open('measure_scores/' + run_name + '/' + run_name + '_nrmse.p', 'rb') as f_in:
-    n_rmse = pickle.load(f_in)
-figure()
-colormap_n_rmse(swaps_replacement_values, 250, 50, n_rmse, 0, 1, run_name, 'baseline', 'ndcg', './figure/', show_plot)
-figure()
-colormap_n_rmse(swaps_replacement_values, 250, 50, n_rmse, 0, 1, run_name, 'baseline', 'P_10', './figure/', show_plot)
-figure()
-colormap_n_rmse(swaps_replacement_values, 250, 50, n_rmse, 0, 1, run_name, 'baseline', 'map', './figure/', show_plot)
-del n_rmse
-
-with open('measure_scores/' + run_name + '/' + run_name + '_pvalue.p', 'rb') as f_in:
-    pvalue = pickle.load(f_in)
-figure()
-colormap_pvalues(swaps_replacement_values, 250, 50, pvalue, run_name, 'baseline', 'P_10', './figure/', show_plot)
-figure()
-colormap_pvalues(swaps_replacement_values, 250, 50, pvalue, run_name, 'baseline', 'ndcg', './figure/', show_plot)
-figure()
-colormap_pvalues(swaps_replacement_values, 250, 50, pvalue, run_name, 'baseline', 'map', './figure/', show_plot)
-del pvalue
+print('%d figures in %.1f seconds' % (len(ouput_file_paths), time.time() - start_time))
@@ -2,12 +2,92 @@ import logging
 import subprocess
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def done_path(log_path, run_name):
+    return os.path.join(log_path, run_name + '.done')
+
+
+def is_complete(run_name, log_path):
+    # A search is complete if it ended without errors: its marker is removed when the search starts and
+    # written when it ends. Run files are not matched by name, other outputs can start with the same name
+    return os.path.exists(done_path(log_path, run_name))
+
+
+def run_search(run_name, cmd, log_path, retries, retry_delay):
+    # Run a search, logging its output in its own file, and retry it if it fails
+    logger = logging.getLogger('search-log.' + run_name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = logging.FileHandler(os.path.join(log_path, run_name))
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(filename)s %(funcName)s - %(message)s'))
+    logger.addHandler(handler)
+
+    # The runs of a previous search are overwritten, they are not complete until the search ends
+    if os.path.exists(done_path(log_path, run_name)):
+        os.remove(done_path(log_path, run_name))
+
+    try:
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                logger.warning('Attempt %d of %d' % (attempt + 1, retries + 1))
+                time.sleep(retry_delay)
+            try:
+                with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, ) as popen:
+                    for stdout_line in iter(popen.stdout.readline, b""):
+                        logger.info(stdout_line.strip())
+                returncode = popen.returncode
+            except OSError as error:
+                logger.error(error)
+                returncode = None
+            if returncode == 0:
+                with open(done_path(log_path, run_name), 'w'):
+                    pass
+                return True, attempt + 1
+            logger.error('Search failed with return code %s' % returncode)
+        return False, retries + 1
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def schedule(search_configs, log_path, concurrency, retries=2, retry_delay=10):
+    # Run up to concurrency searches at once, searches which are already complete are skipped
+    jobs = {}
+    for run_name, cmd in search_configs.items():
+        if is_complete(run_name, log_path):
+            print('Skipping %s, its runs are complete' % run_name)
+        else:
+            jobs[run_name] = cmd
+
+    failed = []
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(run_search, run_name, cmd, log_path, retries, retry_delay): run_name
+                   for run_name, cmd in jobs.items()}
+        for num_done, future in enumerate(as_completed(futures), 1):
+            run_name = futures[future]
+            success, attempts = future.result()
+            if not success:
+                failed.append(run_name)
+            print('[%d/%d] %s %s after %d attempt(s), elapsed: %.0fs'
+                  % (num_done, len(jobs), 'Done' if success else 'FAILED', run_name, attempts, time.time() - start_time))
+
+    if failed:
+        print('Failed searches (see the logs), run the script again to retry them: %s' % ', '.join(failed))
+    return failed
 
 
 def main():
     os.environ['JAVA_HOME'] = '/usr/lib/jvm/java-11-openjdk-amd64'
     log_path = './log'
     search_config_path = 'search.config'
+    # Number of searches running at once
+    concurrency = 4
+    # Number of times a failed search is run again
+    retries = 2
 
     try:
         os.mkdir(log_path)
@@ -17,16 +97,7 @@ def main():
     with open(search_config_path) as f_in:
         search_configs = json.loads(f_in.read())
 
-    for run_name, cmd in search_configs.items():
-
-        logging.basicConfig(level=logging.NOTSET,
-                            filename=os.path.join(log_path, run_name),
-                            format='%(asctime)s %(levelname)s %(filename)s %(funcName)s - %(message)s')
-        logger = logging.getLogger('idx-log')
-
-        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, ) as popen:
-            for stdout_line in iter(popen.stdout.readline, b""):
-                logger.info(stdout_line.strip())
+    schedule(search_configs, log_path, concurrency, retries)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,35 @@
+import numpy
+import pytest
+
+
+def write_trec_files(path, num_topics = 6, num_docs = 60, seed = 0):
+    # Run with tied scores, unjudged documents, graded relevance labels and
+    # relevant documents which are not retrieved
+    rng = numpy.random.default_rng(seed)
+    run_path, qrels_path = str(path / 'run.txt'), str(path / 'qrels.txt')
+    with open(run_path, 'w') as f_run, open(qrels_path, 'w') as f_qrels:
+        for topic in range(1, num_topics + 1):
+            scores = numpy.sort(numpy.round(rng.uniform(0, 10, num_docs), 0))[::-1]
+            for rank, score in enumerate(scores, 1):
+                doc_id = 'D%d-%d-%d' % (topic, rng.integers(0, 1000), rank)
+                f_run.write('%d Q0 %s %d %s tag\n' % (topic, doc_id, rank, score))
+                # About 20% of the documents are unjudged
+                if rng.random() < 0.8:
+                    f_qrels.write('%d 0 %s %d\n' % (topic, doc_id, rng.choice([0, 0, 1, 2])))
+            for k in range(20):
+                f_qrels.write('%d 0 R%d-%02d %d\n' % (topic, topic, k, rng.choice([1, 2])))
+    return run_path, qrels_path
+
+
+@pytest.fixture
+def trec_files(tmp_path):
+    """Paths of a synthetic run and qrels in TREC format."""
+    return write_trec_files(tmp_path)
+
+
+@pytest.fixture
+def make_trec_files(tmp_path):
+    """Function writing a synthetic run and qrels in TREC format, see write_trec_files."""
+    def make(path = None, **kwargs):
+        return write_trec_files(tmp_path if path is None else path, **kwargs)
+    return make
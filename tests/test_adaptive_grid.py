@@ -0,0 +1,48 @@
+import math
+
+from deterioration_functions import interpolate_grid
+
+
+def corner(pvalue, rmse):
+    return {'baseline': {'P_10': pvalue, 'map': rmse}}
+
+
+def test_interpolate_nan_corner():
+    # Corners of a single block, the p-value of P_10 is NaN in one corner, as read from the store
+    values = [0, 5, 10]
+    measure_score = {(0, 0, 'worse'): corner(float('nan'), 0.0),
+                     (0, 10, 'worse'): corner(0.5, 0.2),
+                     (10, 0, 'worse'): corner(0.1, 0.4),
+                     (10, 10, 'worse'): corner(None, 0.6)}
+
+    full = interpolate_grid(measure_score, values, initial_step = 2, modes = ['worse'])
+
+    assert len(full) == 9
+    center = full[(5, 5, 'worse')]['baseline']
+    assert math.isnan(center['P_10'])
+    assert math.isclose(center['map'], 0.3)
+    assert math.isclose(full[(0, 5, 'worse')]['baseline']['map'], 0.1)
+
+
+def test_interpolate_partial_coarse_grid():
+    # Coarse grid of an interrupted sweep, the corner (10, 10) is not stored yet
+    values = [0, 5, 10]
+    measure_score = {(0, 0, 'worse'): corner(0.1, 0.0),
+                     (0, 10, 'worse'): corner(0.5, 0.2),
+                     (10, 0, 'worse'): corner(0.1, 0.4)}
+
+    full = interpolate_grid(measure_score, values, initial_step = 2, modes = ['worse', 'better'])
+
+    assert full == measure_score
+
+    # Blocks with all their corners are interpolated, the others are left out
+    values = [0, 5, 10, 15, 20]
+    measure_score = {(i, j, 'worse'): corner(0.1, (i + j) / 100) for i in (0, 10, 20) for j in (0, 10, 20)}
+    del measure_score[(20, 20, 'worse')]
+
+    full = interpolate_grid(measure_score, values, initial_step = 2, modes = ['worse'])
+
+    assert math.isclose(full[(5, 5, 'worse')]['baseline']['map'], 0.1)
+    assert math.isclose(full[(15, 5, 'worse')]['baseline']['map'], 0.2)
+    assert (15, 15, 'worse') not in full
+    assert len(full) == 25 - 4
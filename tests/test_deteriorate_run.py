@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import numpy
+
+from deterioration_functions import PreparedRun, deteriorate_run_batch
+from deterioration_functions.deteriorate_run import MODES, prepare_intervals, topic_actions, deteriorate_topic
+from deterioration_functions.deteriorate_run_batch import batch_run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Deteriorate and evaluate cells which replace documents with relevant documents not retrieved
+CELL_SCRIPT = '''
+import sys
+from deterioration_functions import PreparedRun, MeasureEvaluator, deteriorate_run, cell_rng
+prepared_run = PreparedRun.from_files(sys.argv[1], sys.argv[2])
+evaluator = MeasureEvaluator(prepared_run)
+for mode in ('better', 'worsebetter'):
+    deteriorated_run = deteriorate_run(prepared_run, None, 1, [1, 10], [11, 20], mode, 3, 5, False,
+                                       compact = True, rng = cell_rng(0, 3, 5, mode))
+    print(sorted((topic_id, sorted(ranking.items())) for topic_id, ranking in deteriorated_run.to_dict().items()))
+    print(repr(evaluator.evaluate(deteriorated_run)))
+'''
+
+
+def test_cell_independent_of_hash_seed(trec_files):
+    # A cell recomputed in another process gives the same run and scores
+    outputs = []
+    for hash_seed in ('1', '2', '3'):
+        env = dict(os.environ, PYTHONHASHSEED = hash_seed, PYTHONPATH = ROOT)
+        completed = subprocess.run([sys.executable, '-c', CELL_SCRIPT, *trec_files], env = env,
+                                   capture_output = True, text = True, check = True)
+        outputs.append(completed.stdout)
+    assert outputs[0]
+    assert outputs[0] == outputs[1] == outputs[2]
+
+
+class RecordingRng(object):
+    # Generator recording the result of each shuffle
+    def __init__(self, seed):
+        self.rng = numpy.random.default_rng(seed)
+        self.shuffles = []
+
+    def shuffle(self, values):
+        self.rng.shuffle(values)
+        self.shuffles.append(values.copy())
+
+
+class ReplayRng(object):
+    # Generator giving to each array the shuffle recorded for the same values
+    def __init__(self, shuffles):
+        self.shuffles = {tuple(sorted(values.tolist())): values for values in shuffles}
+
+    def shuffle(self, values):
+        values[:] = self.shuffles[tuple(sorted(values.tolist()))]
+
+
+def test_batch_as_deteriorate_topic(trec_files):
+    # Each row of the batch is the topic deteriorated by deteriorate_topic with the same shuffles
+    prepared_run = PreparedRun.from_files(*trec_files)
+    source, destination = prepare_intervals((1, 20), (21, 60))
+    configs = [(number_swaps, number_replacements, mode) for mode in MODES
+               for number_swaps, number_replacements in ((0, 0), (0, 3), (4, 0), (2, 5), (15, 15), (100, 100))]
+
+    rng = RecordingRng(0)
+    modified_topics = deteriorate_run_batch(prepared_run, None, configs, 0.5, (1, 20), (21, 60), rng = rng)
+
+    # The topics are shuffled once, then the 4 arrays of candidates of each modified topic
+    topic_ids = rng.shuffles[0].tolist()
+    assert sorted(modified_topics) == sorted(topic_ids[:round(len(topic_ids) * 0.5)])
+    for t, topic_id in enumerate(topic_ids[:len(modified_topics)]):
+        prepared_topic = prepared_run[topic_id]
+        permutations, replacements = modified_topics[topic_id]
+        for k, (number_swaps, number_replacements, mode) in enumerate(configs):
+            actions = topic_actions(prepared_topic, source, destination, mode, number_swaps, number_replacements)
+            if actions is None:
+                expected_permutation, expected_replacements = numpy.arange(len(prepared_topic)), numpy.zeros(len(prepared_topic))
+            else:
+                expected_permutation, expected_replacements = deteriorate_topic(prepared_topic, source, destination, mode, *actions,
+                                                                                rng = ReplayRng(rng.shuffles[1 + 4 * t:5 + 4 * t]))
+            assert permutations[k].tolist() == expected_permutation.tolist()
+            assert replacements[k].tolist() == expected_replacements.tolist()
+
+        # A run of the batch is the run with the rows of a configuration
+        run = batch_run(prepared_run, modified_topics, len(configs) - 1).to_dict()
+        assert run[topic_id] == prepared_topic.deteriorated_ranking(permutations[-1], replacements[-1])
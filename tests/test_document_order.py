@@ -0,0 +1,44 @@
+import copy
+import itertools
+
+import numpy
+import pytest
+import pytrec_eval
+from repro_eval.Evaluator import RpdEvaluator
+
+from deterioration_functions import PreparedRun, deteriorate_run, cell_rng, document_order
+from deterioration_functions.deteriorate_run import MODES
+
+
+def brute_force_inversions(row):
+    return sum(1 for i, j in itertools.combinations(range(len(row)), 2) if row[i] > row[j])
+
+
+@pytest.mark.parametrize('length', [0, 1, 2, 3, 7, 8, 9, 33])
+def test_count_inversions(length):
+    rng = numpy.random.default_rng(length)
+    # Distinct values, and values with many ties
+    rows = numpy.concatenate([numpy.array([rng.permutation(length) for _ in range(5)]).reshape(5, length),
+                              rng.integers(0, 4, (5, length))])
+    assert document_order.count_inversions(rows).tolist() == [brute_force_inversions(row.tolist()) for row in rows]
+
+
+@pytest.mark.parametrize('num_docs', [60, 1200])
+def test_ktu_rbo_as_repro_eval(make_trec_files, num_docs):
+    # Same values of RpdEvaluator on the runs read by pytrec_eval and trimmed, as the original sweep did
+    run_path, qrels_path = make_trec_files(num_docs = num_docs)
+    prepared_run = PreparedRun.from_files(run_path, qrels_path)
+    with open(run_path) as f_run:
+        run_orig = pytrec_eval.parse_run(f_run)
+
+    for mode in MODES:
+        for number_swaps, number_replacements in ((0, 5), (5, 0), (10, 10), (1000, 1000)):
+            deteriorated_run = deteriorate_run(prepared_run, None, 0.5, [1, 30], [31, 1200], mode, number_swaps, number_replacements, False,
+                                               compact = True, rng = cell_rng(0, number_swaps, number_replacements, mode))
+            rpd_eval = RpdEvaluator()
+            rpd_eval.run_b_orig = copy.deepcopy(run_orig)
+            rpd_eval.run_b_rep = copy.deepcopy(deteriorated_run.to_dict())
+            rpd_eval.trim()
+
+            assert document_order.ktau_union(deteriorated_run) == rpd_eval.ktau_union()['baseline']
+            assert document_order.rbo(deteriorated_run) == rpd_eval.rbo()['baseline']
@@ -0,0 +1,65 @@
+import numpy
+import pytrec_eval
+
+from deterioration_functions import IncrementalEvaluator, PreparedRun, TrecRun, deteriorate_run
+
+NUM_TOPICS = 10
+NUM_DOCS = 20
+
+
+def write_run(tmp_path):
+    # Documents at rank 1, 2 and 3 of every topic are relevant
+    run_path, qrels_path = tmp_path / 'run.txt', tmp_path / 'qrels.txt'
+    with open(run_path, 'w') as f_run, open(qrels_path, 'w') as f_qrels:
+        for topic in range(1, NUM_TOPICS + 1):
+            for rank in range(1, NUM_DOCS + 1):
+                doc_id = 'D%d-%d' % (topic, rank)
+                f_run.write('%d Q0 %s %d %.2f tag\n' % (topic, doc_id, rank, NUM_DOCS - rank + 1))
+                f_qrels.write('%d 0 %s %d\n' % (topic, doc_id, int(rank <= 3)))
+    return PreparedRun.from_files(str(run_path), str(qrels_path))
+
+
+class CountingEvaluator(object):
+    # RelevanceEvaluator counting the topics it evaluates
+    def __init__(self, rel_eval):
+        self.rel_eval = rel_eval
+        self.num_topics = 0
+
+    def evaluate(self, run):
+        self.num_topics += len(run)
+        return self.rel_eval.evaluate(run)
+
+
+def test_evaluate_modified_topics_of_trec_run(tmp_path):
+    prepared_run = write_run(tmp_path)
+    assert isinstance(prepared_run.run_orig, TrecRun)
+
+    evaluator = IncrementalEvaluator(prepared_run.qrels, prepared_run, {'P_10', 'map'})
+    evaluator.rel_eval = CountingEvaluator(evaluator.rel_eval)
+
+    deteriorated_run = deteriorate_run(prepared_run, None, 0.2, [1, 5], [6, 10], 'worse', 2, 1, False,
+                                       rng = numpy.random.default_rng(0))
+    run_score = evaluator.evaluate(deteriorated_run)
+
+    # Only the 2 modified topics are evaluated, with the scores of a full evaluation
+    assert evaluator.rel_eval.num_topics == 2
+    assert len(evaluator.modified_topics(deteriorated_run)) == 2
+    expected = pytrec_eval.RelevanceEvaluator(prepared_run.qrels, {'P_10', 'map'}).evaluate(dict(deteriorated_run))
+    assert run_score == expected
+
+
+def test_evaluate_as_full_evaluation(tmp_path):
+    # Same scores of pytrec_eval on the whole deteriorated run, trimmed as RpdEvaluator.trim() does
+    prepared_run = write_run(tmp_path)
+    evaluator = IncrementalEvaluator(prepared_run.qrels, prepared_run, {'P_10', 'map', 'ndcg'}, trim_thresh = 10)
+    rel_eval = pytrec_eval.RelevanceEvaluator(prepared_run.qrels, {'P_10', 'map', 'ndcg'})
+
+    for ratio in (0, 0.5, 1):
+        for mode in ('worse', 'better', 'betterworse', 'worsebetter'):
+            for compact in (False, True):
+                deteriorated_run = deteriorate_run(prepared_run, None, ratio, [1, 5], [6, 10], mode, 2, 1, False,
+                                                   compact = compact, rng = numpy.random.default_rng(1))
+                run = deteriorated_run.to_dict() if compact else deteriorated_run
+                trimmed_run = {topic_id: dict(sorted(ranking.items(), key = lambda item: (item[1], item[0]), reverse = True)[:10])
+                               for topic_id, ranking in run.items()}
+                assert evaluator.evaluate(deteriorated_run) == rel_eval.evaluate(trimmed_run)
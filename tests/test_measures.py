@@ -0,0 +1,52 @@
+import numpy
+import pytest
+import pytrec_eval
+
+from deterioration_functions import MeasureEvaluator, PreparedRun, deteriorate_run, cell_rng
+from deterioration_functions.deteriorate_run import MODES
+from deterioration_functions.incremental_evaluator import trim_ranking
+from deterioration_functions.measures import precision_at, average_precision, ndcg
+
+MEASURES = {'P_10', 'map', 'ndcg'}
+
+
+def reference_scores(qrels, run, trim_thresh = 1000):
+    # pytrec_eval on the run trimmed as RpdEvaluator.trim() does
+    trimmed_run = {topic_id: trim_ranking(ranking, trim_thresh) for topic_id, ranking in run.items()}
+    return pytrec_eval.RelevanceEvaluator(qrels, MEASURES).evaluate(trimmed_run)
+
+
+def assert_same_scores(run_score, expected):
+    assert run_score.keys() == expected.keys()
+    for topic_id, scores in expected.items():
+        for measure in MEASURES:
+            assert run_score[topic_id][measure] == pytest.approx(scores[measure], abs = 1e-12)
+
+
+@pytest.mark.parametrize('num_docs', [60, 1200])
+def test_scores_as_pytrec_eval(make_trec_files, num_docs):
+    # Tied scores, unjudged documents, and with 1200 documents rankings trimmed to 1000
+    prepared_run = PreparedRun.from_files(*make_trec_files(num_docs = num_docs))
+    evaluator = MeasureEvaluator(prepared_run)
+    assert_same_scores(evaluator.run_orig_score, reference_scores(prepared_run.qrels, prepared_run.run_orig.to_dict()))
+
+    for mode in MODES:
+        for number_swaps, number_replacements in ((0, 5), (5, 0), (10, 10), (1000, 1000)):
+            # Replaced documents are fake (not judged) or relevant documents not retrieved
+            deteriorated_run = deteriorate_run(prepared_run, None, 1, [1, 30], [31, 1200], mode, number_swaps, number_replacements, False,
+                                               compact = True, rng = cell_rng(0, number_swaps, number_replacements, mode))
+            assert_same_scores(evaluator.evaluate(deteriorated_run), reference_scores(prepared_run.qrels, deteriorated_run.to_dict()))
+
+
+def test_measures_of_labels():
+    # Labels in rank order, -1 unjudged, with fewer documents than the cutoff
+    qrels = {'q': {'a': 2, 'b': 0, 'c': 1, 'z': 1}}
+    runs = [{'q': {'a': 4.0, 'b': 3.0, 'x': 2.0, 'c': 1.0}},
+            {'q': {'x': 4.0, 'y': 3.0, 'b': 2.0, 'c': 1.0}}]
+    labels = numpy.array([[2, 0, -1, 1], [-1, -1, 0, 1]], dtype = float)
+    ideal_dcg = 2 / numpy.log2(2) + 1 / numpy.log2(3) + 1 / numpy.log2(4)
+    expected = [pytrec_eval.RelevanceEvaluator(qrels, MEASURES).evaluate(run)['q'] for run in runs]
+
+    numpy.testing.assert_allclose(precision_at(labels, 10), [scores['P_10'] for scores in expected])
+    numpy.testing.assert_allclose(average_precision(labels, 3), [scores['map'] for scores in expected])
+    numpy.testing.assert_allclose(ndcg(labels, ideal_dcg), [scores['ndcg'] for scores in expected])
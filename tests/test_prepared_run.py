@@ -0,0 +1,39 @@
+import numpy
+
+from deterioration_functions import PreparedRun
+
+
+def intervals(ranking_length):
+    # Intervals within the ranking, past its end, of one rank position and empty
+    yield from ((0, 0), (0, ranking_length - 1), (3, 3), (5, 4), (10, 2), (ranking_length - 1, ranking_length + 10),
+                (ranking_length, ranking_length + 5), (ranking_length + 3, ranking_length + 1), (0, 10 * ranking_length))
+    rng = numpy.random.default_rng(ranking_length)
+    for _ in range(200):
+        start, end = rng.integers(0, ranking_length + 10, 2)
+        yield (int(start), int(end))
+
+
+def test_intervals_as_masks(trec_files):
+    # Same results of the boolean masks over the whole ranking
+    prepared_run = PreparedRun.from_files(*trec_files)
+    for topic_id in prepared_run.run_orig:
+        prepared_topic = prepared_run[topic_id]
+        for interval in intervals(len(prepared_topic)):
+            rel_doc_rank, notrel_doc_rank = prepared_topic.rel_doc_rank, prepared_topic.notrel_doc_rank
+            expected_relevant = rel_doc_rank[numpy.logical_and(rel_doc_rank >= interval[0], rel_doc_rank <= interval[1])]
+            expected_not_relevant = notrel_doc_rank[numpy.logical_and(notrel_doc_rank >= interval[0], notrel_doc_rank <= interval[1])]
+
+            assert prepared_topic.num_relevant(interval) == numpy.sum(prepared_topic.rel_doc_position[interval[0]:(interval[1] + 1)])
+            assert prepared_topic.num_not_relevant(interval) == (interval[1] - interval[0] + 1) - len(expected_relevant)
+            assert prepared_topic.relevant_in(interval).tolist() == expected_relevant.tolist()
+            assert prepared_topic.not_relevant_in(interval).tolist() == expected_not_relevant.tolist()
+
+
+def test_intervals_are_copies(trec_files):
+    # The rank positions returned can be shuffled without modifying the topic
+    prepared_topic = PreparedRun.from_files(*trec_files)['1']
+    rel_doc_rank, notrel_doc_rank = prepared_topic.rel_doc_rank.copy(), prepared_topic.notrel_doc_rank.copy()
+    numpy.random.default_rng(0).shuffle(prepared_topic.relevant_in((0, len(prepared_topic))))
+    numpy.random.default_rng(0).shuffle(prepared_topic.not_relevant_in((0, len(prepared_topic))))
+    assert prepared_topic.rel_doc_rank.tolist() == rel_doc_rank.tolist()
+    assert prepared_topic.notrel_doc_rank.tolist() == notrel_doc_rank.tolist()
@@ -0,0 +1,35 @@
+import pytest
+
+from deterioration_functions import MeasureEvaluator, PreparedRun, RatioSweep, deteriorate_run, cell_rng, document_order
+from deterioration_functions.deteriorate_run import MODES
+
+RATIOS = [0, 0.2, 0.5, 0.5, 0.8, 1]
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_ratio_sweep_as_deteriorate_run(trec_files, mode):
+    # Each ratio gives the run and scores of deteriorate_run with the same random stream
+    prepared_run = PreparedRun.from_files(*trec_files)
+    evaluator = MeasureEvaluator(prepared_run)
+    for number_swaps, number_replacements in ((0, 0), (3, 5), (100, 100)):
+        ratio_sweep = RatioSweep(prepared_run, evaluator, [1, 20], [21, 60], mode, number_swaps, number_replacements,
+                                 rng = cell_rng(0, number_swaps, number_replacements, mode))
+        for ratio in RATIOS:
+            deteriorated_run, run_score, ktu, rbo = ratio_sweep.extend(ratio)
+            expected_run = deteriorate_run(prepared_run, None, ratio, [1, 20], [21, 60], mode, number_swaps, number_replacements, False,
+                                           compact = True, rng = cell_rng(0, number_swaps, number_replacements, mode))
+
+            assert deteriorated_run.to_dict() == expected_run.to_dict()
+            assert run_score == evaluator.evaluate(expected_run)
+            assert list(run_score) == list(evaluator.evaluate(expected_run))
+            assert ktu == document_order.ktau_union(expected_run)
+            assert rbo == document_order.rbo(expected_run)
+
+
+def test_ratio_sweep_decreasing(trec_files):
+    prepared_run = PreparedRun.from_files(*trec_files)
+    ratio_sweep = RatioSweep(prepared_run, MeasureEvaluator(prepared_run), [1, 20], [21, 60], 'worse', 3, 5,
+                             rng = cell_rng(0, 3, 5, 'worse'))
+    ratio_sweep.extend(0.5)
+    with pytest.raises(ValueError):
+        ratio_sweep.extend(0.2)
@@ -0,0 +1,34 @@
+import pytrec_eval
+
+from deterioration_functions import RunArchive, pack_runs, read_run
+
+
+def test_pack_runs_round_trip(tmp_path, make_trec_files):
+    # Runs with different topics and documents, sharing the vocabulary of the archive
+    run_file_paths = []
+    for seed, num_topics in ((0, 6), (1, 4), (2, 1)):
+        run_dir = tmp_path / ('run%d' % seed)
+        run_dir.mkdir()
+        run_file_paths.append(make_trec_files(run_dir, num_topics = num_topics, num_docs = 50 + seed, seed = seed)[0])
+    run_names = ['bm25', 'bm25_rm3', 'qld']
+
+    num_docs = pack_runs(run_file_paths, str(tmp_path / 'runs.archive'), run_names)
+
+    assert num_docs == 6 * 50 + 4 * 51 + 52
+    with RunArchive(str(tmp_path / 'runs.archive')) as archive:
+        assert list(archive) == run_names
+        for run_name, run_file_path in zip(run_names, run_file_paths):
+            run = archive[run_name]
+            trec_run = read_run(run_file_path)
+            with open(run_file_path) as f_run:
+                parsed_run = pytrec_eval.parse_run(f_run)
+
+            assert list(run) == list(trec_run)
+            assert run.to_dict() == parsed_run
+            for topic_id in trec_run:
+                # Documents and scores in file order, as read_run
+                assert list(run[topic_id].items()) == list(trec_run[topic_id].items())
+                assert run[topic_id][next(iter(parsed_run[topic_id]))] == next(iter(parsed_run[topic_id].values()))
+                # Rankings are views on the memory-mapped file
+                assert not run.doc_keys[topic_id].flags.owndata
+        del run
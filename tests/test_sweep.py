@@ -0,0 +1,87 @@
+import math
+import os
+
+import numpy
+import pytest
+import scipy.stats
+
+from deterioration_functions import SweepStore, RepeatedCell, placement_run_name
+from deterioration_functions.sweep import RESULT_KINDS, RunningStatistics
+from deterioration_functions.heatmap import heatmap_file_path
+
+
+def test_load_nan_results(tmp_path):
+    # NaN results (e.g. p-values of measures that do not change, KTU of rankings with
+    # less than 2 documents) are read back as NaN, not None
+    cell = (0, 3, 'worse')
+    results = {'ktu': {'baseline': {'301': float('nan'), '302': 0.5}},
+               'rbo': {'baseline': {'301': 1.0, '302': 0.9}},
+               'rmse': {'baseline': {'P_10': 0.0, 'map': 0.1}},
+               'nrmse': {'baseline': {'P_10': 0.0, 'map': 0.2}},
+               'pvalue': {'baseline': {'P_10': float('nan'), 'map': 0.03}}}
+    with SweepStore(str(tmp_path / 'sweep.sqlite'), 'BM25') as store:
+        store.add(cell, results)
+        loaded = store.load_cells([cell])[cell]
+        pvalue = store.load('pvalue', measure = 'P_10')[cell]['baseline']['P_10']
+
+    assert math.isnan(pvalue)
+    for kind, result in results.items():
+        assert loaded[kind]['baseline'].keys() == result['baseline'].keys()
+        for key, value in result['baseline'].items():
+            loaded_value = loaded[kind]['baseline'][key]
+            assert isinstance(loaded_value, float)
+            assert (math.isnan(value) and math.isnan(loaded_value)) or loaded_value == value
+
+
+def test_placement_run_name_file_name(tmp_path):
+    # Names of placements and ratios are used in the file names of the heatmaps
+    assert placement_run_name('BM25', (1, 500), (501, 1000)) == 'BM25'
+    assert placement_run_name('BM25', (1, 500), (501, 1000), 0.5) == 'BM25_ratio0.5'
+    run_name = placement_run_name('BM25', (1, 5), (6, 10), 0.5)
+    assert run_name == 'BM25@1-5:6-10_ratio0.5'
+
+    output_path = str(tmp_path) + os.sep
+    file_path = heatmap_file_path(output_path, 'ktu', run_name, 1000)
+    assert os.path.dirname(file_path) == str(tmp_path)
+    with open(file_path, 'w'):
+        pass
+
+
+def random_results(rng):
+    # Results of a repetition of a cell
+    return {kind: {'baseline': {key: rng.normal() for key in ('301', '302', '303')}} for kind in RESULT_KINDS}
+
+
+@pytest.mark.parametrize('repetitions', [1, 2, 3, 10])
+def test_running_statistics(repetitions):
+    rng = numpy.random.default_rng(repetitions)
+    samples = [random_results(rng) for _ in range(repetitions)]
+    statistics = RunningStatistics()
+    for results in samples:
+        statistics.add(results)
+
+    results = statistics.results()
+    for kind in RESULT_KINDS:
+        for key in ('301', '302', '303'):
+            values = [sample[kind]['baseline'][key] for sample in samples]
+            assert results[kind]['baseline'][key] == pytest.approx(numpy.mean(values), abs = 1e-12)
+            standard_error = results[kind + '_se']['baseline'][key]
+            if repetitions == 1:
+                assert math.isnan(standard_error)
+            else:
+                assert standard_error == pytest.approx(scipy.stats.sem(values), abs = 1e-12)
+
+
+def test_repeated_cell():
+    # Repetitions get their own index, with a sweep over ratios the statistics of each ratio are separate
+    def compute_repetition(cell, repetition):
+        rng = numpy.random.default_rng(repetition)
+        return cell, [random_results(rng), random_results(rng)]
+
+    cell, ratio_results = RepeatedCell(compute_repetition, 4)((1, 2, 'worse'))
+
+    assert cell == (1, 2, 'worse')
+    for index in range(2):
+        values = [compute_repetition(cell, repetition)[1][index]['rmse']['baseline']['301'] for repetition in range(4)]
+        assert ratio_results[index]['rmse']['baseline']['301'] == pytest.approx(numpy.mean(values), abs = 1e-12)
+        assert ratio_results[index]['rmse_se']['baseline']['301'] == pytest.approx(scipy.stats.sem(values), abs = 1e-12)
@@ -0,0 +1,71 @@
+import itertools
+
+import numpy
+
+from deterioration_functions import PreparedRun, plan_cells
+from deterioration_functions.deteriorate_run import MODES, prepare_intervals, topic_actions
+from deterioration_functions.sweep_plan import MODE_ACTIONS, effective_actions
+
+# Numbers of swaps and replacements, up to more than the documents of the intervals
+VALUES = [0, 1, 2, 3, 5, 8, 13, 30, 100]
+SOURCE, DESTINATION = (1, 20), (21, 60)
+
+
+def cell_actions(prepared_run, cell):
+    # Actions of a cell on each topic, computed by topic_actions
+    number_swaps, number_replacements, mode = cell
+    source, destination = prepare_intervals(SOURCE, DESTINATION)
+    swap_type, replacement_type = MODE_ACTIONS[mode]
+    actions = []
+    for topic_id in prepared_run.run_orig:
+        current = topic_actions(prepared_run[topic_id], source, destination, mode, number_swaps, number_replacements) or (0, 0)
+        actions.append((swap_type if current[0] > 0 else 0, current[0], replacement_type if current[1] > 0 else 0, current[1]))
+    return actions
+
+
+def test_effective_actions_as_topic_actions(trec_files):
+    prepared_run = PreparedRun.from_files(*trec_files)
+    source, destination = prepare_intervals(SOURCE, DESTINATION)
+    number_swaps, number_replacements = numpy.array(list(itertools.product(VALUES, VALUES))).T
+    for mode in MODES:
+        for topic_id in prepared_run.run_orig:
+            prepared_topic = prepared_run[topic_id]
+            current_swaps, current_replacements = effective_actions(prepared_topic, source, destination, mode,
+                                                                    number_swaps, number_replacements)
+            for k in range(len(number_swaps)):
+                expected = topic_actions(prepared_topic, source, destination, mode, number_swaps[k], number_replacements[k]) or (0, 0)
+                assert (current_swaps[k], current_replacements[k]) == tuple(expected)
+
+
+def test_plan_cells_groups(trec_files):
+    prepared_run = PreparedRun.from_files(*trec_files)
+    cells = [(number_swaps, number_replacements, mode) for mode in MODES for number_swaps in VALUES for number_replacements in VALUES]
+
+    groups = plan_cells(prepared_run, cells, 1, SOURCE, DESTINATION)
+
+    # Every requested cell is in exactly one group, led by its first cell
+    members = [cell for group in groups.values() for cell in group]
+    assert sorted(members) == sorted(cells)
+    assert all(group[0] == first_cell for first_cell, group in groups.items())
+    assert len(groups) < len(cells)
+
+    # Cells of a group perform the same actions, cells of different groups do not
+    group_actions = {}
+    for first_cell, group in groups.items():
+        actions = cell_actions(prepared_run, first_cell)
+        assert all(cell_actions(prepared_run, cell) == actions for cell in group)
+        group_actions[first_cell] = actions
+    assert len({tuple(actions) for actions in group_actions.values()}) == len(groups)
+
+
+def test_plan_cells_ratio(trec_files):
+    # With ratio < 1 only the cells without any action are grouped
+    prepared_run = PreparedRun.from_files(*trec_files)
+    cells = [(number_swaps, number_replacements, mode) for mode in MODES for number_swaps in VALUES for number_replacements in VALUES]
+
+    groups = plan_cells(prepared_run, cells, 0.5, SOURCE, DESTINATION)
+
+    assert sorted(cell for group in groups.values() for cell in group) == sorted(cells)
+    for group in groups.values():
+        if len(group) > 1:
+            assert all(not any(actions[1] or actions[3] for actions in cell_actions(prepared_run, cell)) for cell in group)